@@ -0,0 +1,499 @@
+"""
+Load test of the serving path with a simulated model
+
+Starts the app from `main.py` in a child process with every model replaced
+by `SimulatedAdapter`, which sleeps and burns CPU for configurable times
+instead of running a model, then drives it over HTTP with a ramp of
+concurrent clients. Everything around the model runs for real: the
+limiters, the model manager, post-processing, the synthesis cache, the
+artifact store and file serving.
+
+    cd backend
+    python -m benchmarks.load --concurrency 1,2,4,8,16 --step-seconds 10
+    python -m benchmarks.load --scenario generate,audio --cpu-ms 20 --output load.json
+    python -m benchmarks.load --url http://localhost:8000 --scenario voices
+
+Each step keeps `concurrency` clients busy for `--step-seconds`, each sending
+its next request as soon as the previous one returns. Per step it reports
+latency percentiles, throughput, the error rate with a count per status, and
+how late the server's event loop woke up (`loopLag`), which is what blocking
+code on the loop shows up as. A table goes to stdout and the JSON to
+`--output`; `--url` targets a running server instead, without lag figures.
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import platform
+import random
+import socket
+import sys
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from tts_adapters import TTSAdapter  # noqa: E402
+
+RESULTS_VERSION = 1
+
+SCENARIOS = ("generate", "cached", "stream", "audio", "voices")
+
+SAMPLE_TEXT = (
+    "The quick brown fox jumps over the lazy dog. She sells seashells by the seashore, "
+    "and the shells she sells are surely seashells. How much wood would a woodchuck chuck "
+    "if a woodchuck could chuck wood? "
+)
+
+LAG_PATH = "/__load/lag"
+
+
+@dataclass
+class Profile:
+    """How SimulatedAdapter behaves; each request costs about the same"""
+
+    # Time spent waiting off the GIL on the inference executor, like native model code
+    synthesis_ms: float = 200.0
+    # Pure-Python busy work on the inference executor, holding the GIL
+    cpu_ms: float = 0.0
+    # Busy work on the event loop itself, before the executor is involved
+    loop_cpu_ms: float = 0.0
+    # Random spread of the times above, seeded by the text so runs repeat
+    jitter: float = 0.0
+    load_ms: float = 0.0
+    # Length of the audio written, from the text length
+    chars_per_second: float = 15.0
+
+
+class SimulatedAdapter(TTSAdapter):
+    """
+    TTS adapter that simulates synthesis instead of running a model
+
+    The voices and settings come from the model's config entry. Output is a
+    tone whose pitch and length depend only on the text, written to
+    `output_dir`.
+    """
+
+    profile = Profile()
+
+    def __init__(self, model_config: Dict[str, Any]):
+        super().__init__(model_config["id"], model_config)
+        self.output_dir = BACKEND_DIR / "temp" / "audio"
+
+    async def initialize(self) -> bool:
+        await asyncio.sleep(self.profile.load_ms / 1000)
+        self.model = self.profile
+        return True
+
+    async def generate(
+        self,
+        text: str,
+        voice_id: str,
+        settings: Dict[str, Any],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Path:
+        scale = self._scale(text)
+        burn(self.profile.loop_cpu_ms * scale / 1000)
+        output_path = await self.run_blocking(self._synthesize, text, scale)
+        if progress is not None:
+            progress(1, 1)
+        return output_path
+
+    def _synthesize(self, text: str, scale: float) -> Path:
+        import soundfile as sf
+
+        time.sleep(self.profile.synthesis_ms * scale / 1000)
+        burn(self.profile.cpu_ms * scale / 1000)
+        seconds = max(0.1, len(text) / self.profile.chars_per_second)
+        frequency = 110 + zlib.crc32(text.encode("utf-8")) % 330
+        t = np.arange(int(seconds * self.sample_rate), dtype=np.float32) / self.sample_rate
+        waveform = 0.3 * np.sin(2 * np.pi * frequency * t)
+
+        output_path = self.output_dir / f"sim_{zlib.crc32(text.encode('utf-8')):08x}_{random.getrandbits(32):08x}.wav"
+        sf.write(str(output_path), waveform, self.sample_rate, subtype="PCM_16")
+        return output_path
+
+    def _scale(self, text: str) -> float:
+        if not self.profile.jitter:
+            return 1.0
+        rng = random.Random(zlib.crc32(text.encode("utf-8")))
+        return max(0.0, 1 + rng.uniform(-self.profile.jitter, self.profile.jitter))
+
+    def get_voices(self) -> List[Dict[str, Any]]:
+        return self.model_config.get("voices", [])
+
+    def get_settings_schema(self) -> Dict[str, Any]:
+        return self.model_config.get("settings", {})
+
+
+def burn(seconds: float):
+    """Keep the CPU busy in Python bytecode, holding the GIL between switches"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class LoopLagMonitor:
+    """How much later than asked the event loop resumes a sleeping task"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def take(self) -> Dict[str, Any]:
+        """Lag statistics in milliseconds since the previous call"""
+        samples, self.samples = self.samples, []
+        return summarize(samples)
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append((time.perf_counter() - started - self.interval) * 1000)
+
+
+def serve(port: int, profile: Profile, workdir: str, log_level: str):
+    """Child process: the app with simulated models, on 127.0.0.1:`port`"""
+    import uvicorn
+
+    logging.basicConfig(level=log_level.upper())
+    import main
+
+    workdir = Path(workdir)
+    main.AUDIO_DIR = workdir / "audio"
+    main.UPLOAD_DIR = workdir / "uploads"
+    adapter_class = type("SimulatedAdapter", (SimulatedAdapter,), {"profile": profile})
+    main.ADAPTER_CLASSES = {model_id: adapter_class for model_id in main.ADAPTER_CLASSES}
+
+    load_config = main.load_config
+
+    def load_isolated_config():
+        load_config()
+        main.server_config = {
+            **main.server_config,
+            "jobs": {**main.server_config.get("jobs", {}), "databasePath": str(workdir / "jobs.sqlite3")},
+            "modelLoading": {**main.server_config.get("modelLoading", {}), "preload": []}
+        }
+
+    main.load_config = load_isolated_config
+    monitor = LoopLagMonitor()
+    lifespan = main.app.router.lifespan_context
+
+    @contextlib.asynccontextmanager
+    async def monitored_lifespan(app):
+        async with lifespan(app):
+            for adapter in main.adapters.values():
+                adapter.output_dir = main.AUDIO_DIR
+            monitor.start()
+            yield
+            await monitor.close()
+
+    async def loop_lag():
+        return monitor.take()
+
+    main.app.router.lifespan_context = monitored_lifespan
+    main.app.add_api_route(LAG_PATH, loop_lag, methods=["GET"])
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level=log_level, access_log=False)
+
+
+@dataclass
+class Outcome:
+    scenario: str
+    latency: float
+    # HTTP status, or the exception's name when there was no response
+    status: Any
+    bytes: int
+
+
+class LoadTest:
+    """Clients that send the configured scenarios in turn to one server"""
+
+    def __init__(self, client: Any, scenarios: List[str], model: str, voice: str, text_chars: int):
+        self.client = client
+        self.scenarios = scenarios
+        self.model = model
+        self.voice = voice
+        self.text_chars = text_chars
+        self.audio_url: Optional[str] = None
+        self._texts = itertools.count()
+
+    def text(self, unique: bool) -> str:
+        suffix = f" Request {next(self._texts)}." if unique else ""
+        repeated = (SAMPLE_TEXT * (self.text_chars // len(SAMPLE_TEXT) + 1))[:self.text_chars]
+        return repeated.strip() + suffix
+
+    def body(self, text: str, cache: bool) -> Dict[str, Any]:
+        return {"text": text, "voice": self.voice, "model": self.model, "cache": cache}
+
+    async def prepare(self):
+        """Load the model and store one file for the `audio` scenario"""
+        response = await self.client.post("/api/generate", json=self.body(self.text(unique=False), cache=True))
+        response.raise_for_status()
+        self.audio_url = response.json()["audioUrl"]
+
+    async def send(self, scenario: str) -> Outcome:
+        started = time.perf_counter()
+        size = 0
+        try:
+            if scenario == "stream":
+                async with self.client.stream(
+                    "POST", "/api/generate/stream", json=self.body(self.text(unique=True), cache=False)
+                ) as response:
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+            else:
+                response = await self.request(scenario)
+                size = len(response.content)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        return Outcome(scenario, time.perf_counter() - started, status, size)
+
+    async def request(self, scenario: str):
+        if scenario == "generate":
+            return await self.client.post("/api/generate", json=self.body(self.text(unique=True), cache=False))
+        if scenario == "cached":
+            return await self.client.post("/api/generate", json=self.body(self.text(unique=False), cache=True))
+        if scenario == "audio":
+            return await self.client.get(self.audio_url)
+        return await self.client.get("/api/voices")
+
+    async def step(self, concurrency: int, seconds: float) -> List[Outcome]:
+        """Keep `concurrency` clients busy for `seconds`; requests in flight at the end still count"""
+        deadline = time.perf_counter() + seconds
+        outcomes: List[Outcome] = []
+        turns = itertools.cycle(self.scenarios)
+
+        async def client_loop():
+            while time.perf_counter() < deadline:
+                outcomes.append(await self.send(next(turns)))
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        return outcomes
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": values[-1] if values else 0.0
+    }
+
+
+def step_report(concurrency: int, outcomes: List[Outcome], elapsed: float) -> Dict[str, Any]:
+    """Latencies in milliseconds; only 2xx responses count as successes"""
+    statuses: Dict[str, int] = {}
+    for outcome in outcomes:
+        statuses[str(outcome.status)] = statuses.get(str(outcome.status), 0) + 1
+    succeeded = [outcome for outcome in outcomes if isinstance(outcome.status, int) and outcome.status < 300]
+    report = {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "requests": len(outcomes),
+        "throughput": len(succeeded) / elapsed if elapsed else 0.0,
+        "errorRate": 1 - len(succeeded) / len(outcomes) if outcomes else 0.0,
+        "statuses": statuses,
+        "bytesPerSecond": sum(outcome.bytes for outcome in succeeded) / elapsed if elapsed else 0.0,
+        "latency": summarize([outcome.latency * 1000 for outcome in succeeded])
+    }
+    scenarios = sorted({outcome.scenario for outcome in outcomes})
+    if len(scenarios) > 1:
+        report["scenarios"] = {
+            scenario: summarize([outcome.latency * 1000 for outcome in succeeded if outcome.scenario == scenario])
+            for scenario in scenarios
+        }
+    return report
+
+
+async def run_load(args, base_url: str, measure_lag: bool) -> List[Dict[str, Any]]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        test = LoadTest(client, args.scenario, args.model, args.voice, args.text_chars)
+        await test.prepare()
+
+        steps = []
+        for concurrency in args.concurrency:
+            print(f"  concurrency {concurrency} ...", file=sys.stderr, flush=True)
+            if measure_lag:
+                await client.get(LAG_PATH)
+            started = time.perf_counter()
+            outcomes = await test.step(concurrency, args.step_seconds)
+            report = step_report(concurrency, outcomes, time.perf_counter() - started)
+            if measure_lag:
+                report["loopLag"] = (await client.get(LAG_PATH)).json()
+            steps.append(report)
+            if args.stop_error_rate is not None and report["errorRate"] > args.stop_error_rate:
+                print(f"  stopping: error rate {report['errorRate']:.1%}", file=sys.stderr)
+                break
+        return steps
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url: str, process: multiprocessing.Process, timeout: float = 60.0):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise RuntimeError(f"Server exited with status {process.exitcode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server did not start within {timeout:.0f}s")
+
+
+def run(args) -> Dict[str, Any]:
+    profile = Profile(
+        synthesis_ms=args.synthesis_ms,
+        cpu_ms=args.cpu_ms,
+        loop_cpu_ms=args.loop_cpu_ms,
+        jitter=args.jitter,
+        load_ms=args.load_ms
+    )
+    parameters = {
+        "target": args.url or "simulated",
+        "scenarios": args.scenario,
+        "model": args.model,
+        "voice": args.voice,
+        "concurrency": args.concurrency,
+        "stepSeconds": args.step_seconds,
+        "textCharacters": args.text_chars
+    }
+
+    if args.url:
+        steps = asyncio.run(run_load(args, args.url.rstrip("/"), measure_lag=False))
+    else:
+        parameters["profile"] = {
+            "synthesisMs": profile.synthesis_ms,
+            "cpuMs": profile.cpu_ms,
+            "loopCpuMs": profile.loop_cpu_ms,
+            "jitter": profile.jitter,
+            "loadMs": profile.load_ms
+        }
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        with tempfile.TemporaryDirectory(prefix="tts-load-") as workdir:
+            # spawn, so the server does not inherit this process's event loop or threads
+            process = multiprocessing.get_context("spawn").Process(
+                target=serve, args=(port, profile, workdir, args.log_level), daemon=True
+            )
+            process.start()
+            try:
+                wait_until_ready(base_url, process)
+                steps = asyncio.run(run_load(args, base_url, measure_lag=True))
+            finally:
+                process.terminate()
+                process.join(10)
+
+    return {
+        "version": RESULTS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": multiprocessing.cpu_count()
+        },
+        "parameters": parameters,
+        "steps": steps
+    }
+
+
+def print_table(results: Dict[str, Any]):
+    print(
+        f"{'clients':>7} {'requests':>8} {'req/s':>8} {'errors':>7} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'lag p99':>8} {'lag max':>8}  statuses"
+    )
+    for step in results["steps"]:
+        latency = step["latency"]
+        lag = step.get("loopLag")
+        lag_columns = f"{lag['p99']:>8.1f} {lag['max']:>8.1f}" if lag else f"{'-':>8} {'-':>8}"
+        statuses = " ".join(f"{status}:{count}" for status, count in sorted(step["statuses"].items()))
+        print(
+            f"{step['concurrency']:>7} {step['requests']:>8} {step['throughput']:>8.1f} {step['errorRate']:>7.1%} "
+            f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f} {lag_columns}  {statuses}"
+        )
+
+
+def integer_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",")]
+
+
+def scenario_list(value: str) -> List[str]:
+    scenarios = [part.strip() for part in value.split(",")]
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario '{scenario}'; one of: {', '.join(SCENARIOS)}")
+    return scenarios
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test of the serving path with a simulated model")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument("--url", help="Test a running server instead of starting one with simulated models")
+    parser.add_argument("--scenario", type=scenario_list, default=["generate"],
+                        help=f"Comma-separated requests to send in turn: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=integer_list, default=[1, 2, 4, 8, 16],
+                        help="Comma-separated numbers of concurrent clients, one step each")
+    parser.add_argument("--step-seconds", type=float, default=10.0, help="Duration of each step")
+    parser.add_argument("--stop-error-rate", type=float, help="End the ramp after a step with a higher error rate")
+    parser.add_argument("--model", default="neutts-air")
+    parser.add_argument("--voice", default="dave")
+    parser.add_argument("--text-chars", type=int, default=200, help="Length of the text of each generation")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Request timeout in seconds")
+    parser.add_argument("--synthesis-ms", type=float, default=200.0, help="Simulated synthesis time off the GIL")
+    parser.add_argument("--cpu-ms", type=float, default=0.0, help="Simulated Python CPU time on the inference executor")
+    parser.add_argument("--loop-cpu-ms", type=float, default=0.0, help="Simulated CPU time blocking the event loop")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Relative spread of the simulated times")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="Simulated model load time")
+    parser.add_argument("--log-level", default="warning", help="Log level of the simulated server")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print_table(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
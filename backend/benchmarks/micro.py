@@ -0,0 +1,439 @@
+"""
+Offline micro-benchmarks for the synthesis hot path
+
+Runs on a CPU-only machine without network access: NeuTTS Air uses the
+stand-ins from `benchmarks.stubs`, documents are generated on the fly and
+the API is driven through FastAPI's TestClient with a temporary audio store.
+
+    cd backend
+    python -m benchmarks.micro --output bench.json
+    python -m benchmarks.micro --compare bench.json --threshold 0.2
+
+Results are JSON: per benchmark the per-call time statistics in
+microseconds. `--compare` reports median changes against an earlier run and
+exits with status 1 when any benchmark regressed beyond the threshold.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.stubs import build_stub_tts  # noqa: E402
+
+RESULTS_VERSION = 1
+
+SAMPLE_TEXT = (
+    "The quick brown fox jumps over the lazy dog. She sells seashells by the seashore, "
+    "and the shells she sells are surely seashells. How much wood would a woodchuck chuck "
+    "if a woodchuck could chuck wood?"
+)
+REFERENCE_TEXT = "So I'm live on radio. And I say, well, my dear friend James here clearly, and a quick fox."
+
+
+class Suite:
+    """Registry of named benchmarks sharing lazily built fixtures"""
+
+    def __init__(self, min_sample_seconds: float, samples: int, name_filter: Optional[str]):
+        self.min_sample_seconds = min_sample_seconds
+        self.samples = samples
+        self.name_filter = name_filter
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def wanted(self, name: str) -> bool:
+        return self.name_filter is None or self.name_filter in name
+
+    def run(self, name: str, func: Callable[[], Any]):
+        """Time `func` and record per-call statistics, or the error it raised"""
+        if not self.wanted(name):
+            return
+        print(f"  {name} ...", file=sys.stderr, flush=True)
+        try:
+            self.results[name] = measure(func, self.min_sample_seconds, self.samples)
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            self.results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+    def skip(self, names: List[str], error: BaseException):
+        for name in names:
+            if self.wanted(name):
+                self.results[name] = {"error": f"{type(error).__name__}: {error}"}
+
+
+def measure(func: Callable[[], Any], min_sample_seconds: float, samples: int) -> Dict[str, Any]:
+    """
+    Per-call timings of `func`
+
+    The call count per sample is calibrated (like timeit's autorange) so a
+    sample lasts at least `min_sample_seconds`; statistics are over samples.
+    """
+    func()  # warm-up: caches, pools, lazy imports
+
+    number = 1
+    while True:
+        elapsed = _time_calls(func, number)
+        if elapsed >= min_sample_seconds:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_sample_seconds / elapsed) + 1))
+
+    per_call = sorted(_time_calls(func, number) / number * 1e6 for _ in range(samples))
+    return {
+        "unit": "us",
+        "samples": samples,
+        "callsPerSample": number,
+        "mean": statistics.fmean(per_call),
+        "median": statistics.median(per_call),
+        "p95": per_call[min(len(per_call) - 1, round(0.95 * (len(per_call) - 1)))],
+        "min": per_call[0],
+        "max": per_call[-1],
+        "stdev": statistics.stdev(per_call) if len(per_call) > 1 else 0.0
+    }
+
+
+def _time_calls(func: Callable[[], Any], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def unique_sentences(prefix: str) -> Callable[[], str]:
+    """Distinct text on every call, to defeat the phoneme cache"""
+    counter = itertools.count()
+    return lambda: f"{prefix} number {next(counter)} keeps the words flowing."
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """Minimal text PDF with one Helvetica line per page"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{3 + 2 * index} 0 R" for index in range(len(pages))), len(pages)
+        )
+    ]
+    font = 3 + 2 * len(pages)
+    for index, text in enumerate(pages):
+        content = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * index} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    out.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1"))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    return out.getvalue()
+
+
+def make_docx(paragraphs: List[str]) -> bytes:
+    import docx
+
+    document = docx.Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def bench_text(suite: Suite):
+    from utils import chunk_text
+
+    document = "\n\n".join(SAMPLE_TEXT for _ in range(500))
+    suite.run("text.chunk_text", lambda: chunk_text(document, 4000))
+
+
+def bench_postprocess(suite: Suite):
+    from utils import parse_chain, run_chain
+
+    # Ten seconds of speech-like noise at the models' rate, with silence around it
+    rng = np.random.default_rng(0)
+    waveform = np.concatenate([
+        np.zeros(12000, dtype=np.float32),
+        (rng.standard_normal(240000) * 0.1).astype(np.float32),
+        np.zeros(12000, dtype=np.float32)
+    ])
+    stages = {
+        "trim": {"trim": True},
+        "normalize": {"normalize": True},
+        "resample_16k": {"resample": {"sampleRate": 16000}},
+        "fade": {"fade": True},
+        "chain": {"trim": True, "normalize": True, "resample": {"sampleRate": 16000}, "fade": True}
+    }
+    for name, options in stages.items():
+        chain = parse_chain(options)
+        suite.run(f"postprocess.{name}_10s", lambda: run_chain(waveform, 24000, chain))
+
+
+def bench_extraction(suite: Suite, pages: int):
+    from utils import extract_text_from_file, configure_extraction_pool, shutdown_extraction_pool
+
+    pdf = make_pdf([f"Page {index}: {SAMPLE_TEXT}" for index in range(pages)])
+    docx_bytes = make_docx([SAMPLE_TEXT for _ in range(pages * 4)])
+    loop = asyncio.new_event_loop()
+    configure_extraction_pool()
+    try:
+        suite.run(
+            f"extraction.pdf_{pages}_pages",
+            lambda: loop.run_until_complete(extract_text_from_file(pdf, "bench.pdf"))
+        )
+        suite.run(
+            f"extraction.docx_{pages * 4}_paragraphs",
+            lambda: loop.run_until_complete(extract_text_from_file(docx_bytes, "bench.docx"))
+        )
+    finally:
+        shutdown_extraction_pool()
+        loop.close()
+
+
+def bench_settings(suite: Suite, models_config: Dict[str, Any]):
+    from tts_adapters import TTSAdapter
+
+    class SchemaAdapter(TTSAdapter):
+        async def initialize(self):
+            return True
+
+        async def generate(self, text, voice_id, settings, progress=None):
+            raise NotImplementedError
+
+        def get_voices(self):
+            return self.model_config.get("voices", [])
+
+        def get_settings_schema(self):
+            return self.model_config.get("settings", {})
+
+    for model_id, model_config in models_config.items():
+        adapter = SchemaAdapter(model_id, model_config)
+        schema = adapter.get_settings_schema()
+        if not schema:
+            continue
+        # Half the keys set (some out of range), half left to defaults
+        settings = {
+            key: config.get("max", config.get("default")) * 2 if "max" in config else config.get("default")
+            for index, (key, config) in enumerate(schema.items()) if index % 2 == 0
+        }
+        suite.run(f"settings.validate.{model_id}", lambda: adapter.validate_settings(settings))
+
+
+def bench_neutts(suite: Suite, tts, tokens_per_call: int):
+    ref_codes = np.random.default_rng(0).integers(0, 65536, size=150)
+    ref_prefix_ids = tts._reference_prefix_ids(REFERENCE_TEXT)
+
+    suite.run("neutts.to_phones.cached", lambda: tts._to_phones(SAMPLE_TEXT))
+    next_text = unique_sentences("Phoneme cache miss")
+    suite.run("neutts.to_phones.uncached", lambda: tts._to_phones(next_text()))
+
+    suite.run(
+        "neutts.apply_chat_template",
+        lambda: tts._apply_chat_template(ref_codes, REFERENCE_TEXT, SAMPLE_TEXT, ref_prefix_ids)
+    )
+    next_text = unique_sentences("Template cache miss")
+    suite.run(
+        "neutts.apply_chat_template.uncached",
+        lambda: tts._apply_chat_template(ref_codes, REFERENCE_TEXT, next_text(), ref_prefix_ids)
+    )
+
+    codes = np.random.default_rng(1).integers(0, 65536, size=tokens_per_call)
+    token_ids = np.concatenate([tts._codes_to_token_ids(codes), [tts._speech_gen_end_id]])
+    gguf_text = "".join(f"<|speech_{code}|>" for code in codes)
+    suite.run(f"neutts.decode.token_ids_{tokens_per_call}", lambda: tts._decode(token_ids))
+    suite.run(f"neutts.decode.gguf_text_{tokens_per_call}", lambda: tts._decode(gguf_text))
+
+    suite.run("neutts.infer", lambda: tts.infer(SAMPLE_TEXT, ref_codes, REFERENCE_TEXT))
+
+
+def bench_api(suite: Suite, tts, models_config: Dict[str, Any]):
+    """POST /api/generate against an isolated app state with the stub NeuTTS model"""
+    import main
+    from fastapi.testclient import TestClient
+    from serving import (
+        ArtifactStore, ModelManager, PostProcessor, SynthesisCache, Transcoder, record_stage
+    )
+    from tts_adapters import NeuTTSAdapter
+    from tts_adapters.reference_store import ReferenceCodeStore
+
+    workdir = Path(tempfile.mkdtemp(prefix="tts-bench-"))
+    voice = models_config["neutts-air"]["voices"][0]["id"]
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        main.models_config = models_config
+        main.artifact_store = ArtifactStore(workdir / "audio", max_bytes=1024 ** 3, sweep_interval=0)
+        main.transcoder = Transcoder(main.artifact_store)
+        main.postprocessor = PostProcessor()
+        main.synthesis_cache = SynthesisCache(main.artifact_store)
+
+        adapter = NeuTTSAdapter(models_config["neutts-air"])
+        adapter.output_dir = main.artifact_store.root
+        adapter.reference_store = ReferenceCodeStore(workdir / "reference_codes", namespace="bench")
+        adapter.model = tts
+        tts.stage_hook = record_stage
+        main.adapters = {"neutts-air": adapter}
+        main.model_manager = ModelManager()
+        main.model_manager.register("neutts-air", adapter)
+        yield
+        await adapter.shutdown()
+        await main.transcoder.close()
+        await main.postprocessor.close()
+
+    main.app.router.lifespan_context = lifespan
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    with TestClient(main.app) as client:
+        def generate(text: str, cache: bool):
+            response = client.post(
+                "/api/generate",
+                json={"text": text, "voice": voice, "model": "neutts-air", "cache": cache}
+            )
+            response.raise_for_status()
+
+        adapter = main.adapters["neutts-air"]
+        ref_audio_path, ref_text = adapter._resolve_reference(voice)
+
+        suite.run("api.generate.model_only", lambda: adapter._synthesize(
+            SAMPLE_TEXT, ref_audio_path, ref_text, None
+        ).unlink())
+        suite.run("api.generate.uncached", lambda: generate(SAMPLE_TEXT, cache=False))
+        suite.run("api.generate.cached", lambda: generate(SAMPLE_TEXT, cache=True))
+
+    uncached = suite.results.get("api.generate.uncached", {})
+    model_only = suite.results.get("api.generate.model_only", {})
+    if "median" in uncached and "median" in model_only:
+        suite.results["api.generate.overhead"] = {
+            "unit": "us",
+            "median": uncached["median"] - model_only["median"],
+            "derived": "api.generate.uncached - api.generate.model_only"
+        }
+
+
+def run_suite(args) -> Dict[str, Any]:
+    with open(BACKEND_DIR / "config" / "models_config.json", "r") as f:
+        models_config = json.load(f)["models"]
+
+    suite = Suite(args.min_sample_seconds, args.samples, args.filter)
+    bench_text(suite)
+    bench_postprocess(suite)
+    bench_extraction(suite, args.pages)
+    bench_settings(suite, models_config)
+
+    model_benchmarks = [
+        "neutts.to_phones.cached", "neutts.to_phones.uncached",
+        "neutts.apply_chat_template", "neutts.apply_chat_template.uncached",
+        f"neutts.decode.token_ids_{args.tokens}", f"neutts.decode.gguf_text_{args.tokens}",
+        "neutts.infer", "api.generate.model_only", "api.generate.uncached", "api.generate.cached"
+    ]
+    if any(suite.wanted(name) for name in model_benchmarks):
+        try:
+            # Model loading prints progress; keep stdout for the JSON
+            with contextlib.redirect_stdout(sys.stderr):
+                tts = build_stub_tts(tokens_per_call=args.tokens)
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            suite.skip(model_benchmarks, e)
+        else:
+            try:
+                bench_neutts(suite, tts, args.tokens)
+                with contextlib.redirect_stdout(sys.stderr):
+                    bench_api(suite, tts, models_config)
+            finally:
+                tts.close()
+
+    return {
+        "version": RESULTS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": environment(),
+        "parameters": {
+            "minSampleSeconds": args.min_sample_seconds,
+            "samples": args.samples,
+            "tokensPerCall": args.tokens,
+            "pages": args.pages
+        },
+        "results": suite.results
+    }
+
+
+def environment() -> Dict[str, Any]:
+    import os
+    import torch
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpuCount": os.cpu_count(),
+        "torch": torch.__version__,
+        "torchThreads": torch.get_num_threads(),
+        "numpy": np.__version__
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print median changes against a baseline run; returns the regressed benchmark names"""
+    regressions = []
+    print(f"{'benchmark':<44} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name, {})
+        if "median" not in result or "median" not in before or "derived" in result:
+            continue
+        change = result["median"] / before["median"] - 1 if before["median"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<44} {before['median']:>12.1f} {result['median']:>12.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks for the synthesis hot path")
+    parser.add_argument("--output", type=Path, help="Write results JSON here (default: stdout)")
+    parser.add_argument("--compare", type=Path, help="Baseline results JSON to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative median slowdown counted as a regression")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--samples", type=int, default=15, help="Timed samples per benchmark")
+    parser.add_argument("--min-sample-seconds", type=float, default=0.05, help="Minimum duration of one sample")
+    parser.add_argument("--tokens", type=int, default=100, help="Speech tokens per generation (50 per second of audio)")
+    parser.add_argument("--pages", type=int, default=40, help="Pages in the synthetic PDF")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args)
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+    elif not args.compare:
+        print(payload)
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Tiny stand-ins for the NeuTTS Air backbone and codec
+
+They keep the interfaces NeuTTSAir relies on (a Hugging Face tokenizer with
+the special and speech tokens, `generate()` on the backbone, `decode_code()`
+/ `encode_code()` on the codec) but need no downloads and almost no compute,
+so benchmarks measure the code around the models rather than the models.
+"""
+import string
+import sys
+from pathlib import Path
+
+import torch
+from tokenizers import Regex, Tokenizer, models, pre_tokenizers
+from transformers import PreTrainedTokenizerFast
+
+MONOREPO_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(MONOREPO_ROOT))
+
+SPECIAL_TOKENS = [
+    "<|SPEECH_REPLACE|>",
+    "<|SPEECH_GENERATION_START|>",
+    "<|SPEECH_GENERATION_END|>",
+    "<|TEXT_REPLACE|>",
+    "<|TEXT_PROMPT_START|>",
+    "<|TEXT_PROMPT_END|>",
+]
+
+# Symbols espeak emits for en-us, so phonemized text tokenizes without <unk>
+IPA_SYMBOLS = "ˈˌːəɪʊɹðθʃʒŋæɑɔɛɜɐᵻɾʌɚɡʔɬɒçɣχʁɫɯʏøœɨʉɵɘɞɤɲɳɴʀɭʎʟɰʋɥʍʑʐʂɕʝɟɢʡʢɓɗʄɠʛ̩̃"
+
+CODEC_SAMPLE_RATE = 24_000
+SAMPLES_PER_CODE = 480
+ENCODER_SAMPLE_RATE = 16_000
+ENCODER_HOP = 320
+
+
+def build_tokenizer(num_codes: int = 65536) -> PreTrainedTokenizerFast:
+    """Character-level tokenizer with the NeuTTS special tokens and `<|speech_N|>` codes"""
+    characters = sorted(set(string.printable) | set(IPA_SYMBOLS))
+    vocab = {"<unk>": 0, **{char: index + 1 for index, char in enumerate(characters)}}
+
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Split(Regex("(?m)."), behavior="isolated")
+
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, unk_token="<unk>")
+    tokenizer.add_special_tokens({
+        "additional_special_tokens": SPECIAL_TOKENS + [f"<|speech_{code}|>" for code in range(num_codes)]
+    })
+    return tokenizer
+
+
+class ScriptedBackbone(torch.nn.Module):
+    """
+    Backbone that emits a fixed number of pseudo-random speech tokens
+
+    Output is deterministic for a given prompt length, and generation cost
+    is negligible, so timings are not dominated by sampling.
+    """
+
+    def __init__(self, speech_token_ids: torch.Tensor, end_id: int, tokens_per_call: int = 100):
+        super().__init__()
+        self.register_buffer("speech_token_ids", speech_token_ids)
+        self.end_id = end_id
+        self.tokens_per_call = tokens_per_call
+
+    @property
+    def device(self) -> torch.device:
+        return self.speech_token_ids.device
+
+    def generate(self, input_ids, max_length=None, max_new_tokens=None, **kwargs):
+        count = self.tokens_per_call
+        if max_new_tokens is not None:
+            count = min(count, max_new_tokens - 1)
+        elif max_length is not None:
+            count = min(count, max_length - input_ids.shape[-1] - 1)
+        count = max(count, 1)
+
+        generator = torch.Generator().manual_seed(input_ids.shape[-1])
+        picks = torch.randint(len(self.speech_token_ids), (input_ids.shape[0], count), generator=generator)
+        end = torch.full((input_ids.shape[0], 1), self.end_id, dtype=input_ids.dtype)
+        return torch.cat([input_ids, self.speech_token_ids[picks].to(input_ids.dtype), end], dim=1)
+
+
+class TinyCodec(torch.nn.Module):
+    """Codec with NeuCodec's shapes: 50 codes per second, 24 kHz output, 16 kHz input"""
+
+    def __init__(self, num_codes: int = 65536, dim: int = 8):
+        super().__init__()
+        torch.manual_seed(0)
+        self.num_codes = num_codes
+        self.embedding = torch.nn.Embedding(num_codes, dim)
+        self.synthesis = torch.nn.Linear(dim, SAMPLES_PER_CODE)
+
+    @property
+    def device(self) -> torch.device:
+        return self.embedding.weight.device
+
+    def decode_code(self, codes: torch.Tensor) -> torch.Tensor:
+        """[B, 1, T] codes -> [B, 1, T * 480] waveform"""
+        frames = torch.tanh(self.synthesis(self.embedding(codes[:, 0, :])))
+        return frames.reshape(codes.shape[0], 1, -1)
+
+    def encode_code(self, audio_or_path: torch.Tensor) -> torch.Tensor:
+        """[1, 1, samples] 16 kHz audio -> [1, 1, frames] codes derived from frame energy"""
+        audio = audio_or_path.reshape(-1)
+        usable = len(audio) // ENCODER_HOP * ENCODER_HOP
+        energy = audio[:usable].reshape(-1, ENCODER_HOP).abs().mean(dim=1)
+        codes = (energy * 1e6).long() % self.num_codes
+        return codes[None, None, :]
+
+
+def build_stub_tts(tokens_per_call: int = 100, num_codes: int = 65536, **kwargs):
+    """
+    NeuTTSAir wired to the stand-ins above
+
+    The phonemizer is the real one (espeak must be installed). The prefix
+    cache is off since the scripted backbone has no KV cache; other keyword
+    arguments go to NeuTTSAir.
+    """
+    from neuttsair.neutts import NeuTTSAir
+
+    class StubNeuTTSAir(NeuTTSAir):
+
+        def _load_backbone(self, backbone_repo, backbone_device):
+            self.tokenizer = build_tokenizer(num_codes)
+            self._init_token_ids()
+            speech_ids = torch.from_numpy(self._speech_code_to_id[self._speech_code_to_id >= 0])
+            self.backbone = ScriptedBackbone(speech_ids, self._speech_gen_end_id, tokens_per_call)
+
+        def _load_codec(self, codec_repo, codec_device):
+            self.codec = TinyCodec(num_codes).eval()
+
+    kwargs.setdefault("prefix_cache_mb", 0)
+    return StubNeuTTSAir(backbone_repo="stub", codec_repo="stub", **kwargs)
@@ -1,48 +1,360 @@
 import json
+import os
+import sys
+import time
+import uuid
+import asyncio
 import logging
 from pathlib import Path
-from typing import Dict, Any, Optional
-from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Callable, Tuple, List, Set
+from contextlib import asynccontextmanager, AsyncExitStack
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.requests import HTTPConnection
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+import soundfile as sf
 
 from tts_adapters import HiggsAudioAdapter, NeuTTSAdapter
-from utils import extract_text_from_file
+from serving import (
+    ArtifactStore, CapacityError, DeadlineError, FairShare, client_identity, SynthesisCache, ExtractionCache, JobStore, JobManager,
+    Transcoder, PostProcessor, RangeNotSatisfiable, Chapter, build_audiobook, etag_matches,
+    parse_byte_range, iter_file_range, StageTimings, collect, span, ServingMetrics,
+    MetricFamily, ModelManager, ModelLoadError, WorkerInfo, current_worker, memory_usage,
+    format_memory, serve_forked, ModelRegistry, RegistrySnapshot, CatalogCache, RealtimeSession,
+    SessionClosed, parse_start
+)
+from serving.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utils import (
+    iter_document, collect_document, configure_extraction_pool, shutdown_extraction_pool,
+    spool_upload, UploadTooLarge, wav_stream_header, float_to_pcm16, AUDIO_FORMATS,
+    format_for_file, parse_chain, PhraseBuffer
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 adapters: Dict[str, Any] = {}
 models_config: Dict[str, Any] = {}
+server_config: Dict[str, Any] = {}
+model_registry: Optional[ModelRegistry] = None
+catalog_cache = CatalogCache()
+artifact_store: Optional[ArtifactStore] = None
+synthesis_cache: Optional[SynthesisCache] = None
+transcoder: Optional[Transcoder] = None
+postprocessor: Optional[PostProcessor] = None
+extraction_cache: Optional[ExtractionCache] = None
+job_manager: Optional[JobManager] = None
+model_manager: Optional[ModelManager] = None
+fair_share: Optional[FairShare] = None
+# Models whose weights the parent preloaded for the forked workers
+shared_models: Set[str] = set()
+metrics = ServingMetrics()
+
+ADAPTER_CLASSES = {
+    "higgs-audio-v2": HiggsAudioAdapter,
+    "neutts-air": NeuTTSAdapter
+}
+
+AUDIO_DIR = Path(__file__).parent / "temp" / "audio"
+UPLOAD_DIR = Path(__file__).parent / "temp" / "uploads"
+
+DISCONNECT_POLL_SECONDS = 0.5
+
+async def run_until_disconnected(http_request: Request, coro):
+    """Await a generation, cancelling it if the client disconnects first"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                logger.info("Client disconnected, generation cancelled")
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+def runtime_metrics() -> List[MetricFamily]:
+    """Queue depths and cache counters read from the running components at scrape time"""
+    queue_depth = MetricFamily("tts_queue_depth", "gauge", "Requests waiting for a generation slot")
+    queue_clients = MetricFamily("tts_queue_clients", "gauge", "Clients with requests waiting for a slot")
+    active = MetricFamily("tts_active_generations", "gauge", "Generations holding a slot")
+    expired = MetricFamily("tts_deadline_drops_total", "counter", "Requests dropped because they could not meet their deadline")
+    evicted = MetricFamily("tts_queue_evictions_total", "counter", "Queued requests dropped to make room for other clients")
+    for model_id, adapter in adapters.items():
+        stats = adapter.limiter.stats()
+        queue_depth.add(stats["waiting"], model=model_id)
+        queue_clients.add(stats["waitingClients"], model=model_id)
+        active.add(stats["active"], model=model_id)
+        expired.add(stats["expired"], model=model_id)
+        evicted.add(stats["evicted"], model=model_id)
+    families = [queue_depth, queue_clients, active, expired, evicted]
+    
+    if job_manager is not None:
+        families.append(
+            MetricFamily("tts_jobs_pending", "gauge", "Queued and running generation jobs")
+            .add(job_manager.stats()["pending"])
+        )
+    
+    caches = {}
+    if synthesis_cache is not None:
+        caches["synthesis"] = synthesis_cache.stats()
+    if extraction_cache is not None:
+        caches["extraction"] = extraction_cache.stats()
+    for model_id, adapter in adapters.items():
+        for name, stats in adapter.cache_stats().items():
+            caches[f"{model_id}:{name}"] = stats
+    
+    hits = MetricFamily("tts_cache_hits_total", "counter", "Cache hits")
+    misses = MetricFamily("tts_cache_misses_total", "counter", "Cache misses")
+    hit_ratio = MetricFamily("tts_cache_hit_ratio", "gauge", "Hits per lookup since startup")
+    for name, stats in caches.items():
+        hits.add(stats["hits"], cache=name)
+        misses.add(stats["misses"], cache=name)
+        lookups = stats["hits"] + stats["misses"]
+        if lookups:
+            hit_ratio.add(stats["hits"] / lookups, cache=name)
+    families += [hits, misses, hit_ratio]
+    
+    if artifact_store is not None:
+        families.append(
+            MetricFamily("tts_artifact_store_bytes", "gauge", "Bytes of generated audio on disk")
+            .add(artifact_store.stats()["bytes"])
+        )
+    
+    usage = memory_usage()
+    if usage is not None:
+        worker_memory = MetricFamily(
+            "tts_worker_memory_bytes", "gauge", "Memory of the worker process serving the scrape"
+        )
+        for kind, value in usage.items():
+            worker_memory.add(value, worker=str(current_worker().index), kind=kind)
+        families.append(worker_memory)
+    
+    if model_manager is not None:
+        stats = model_manager.stats()
+        loaded = MetricFamily("tts_model_loaded", "gauge", "Whether the model is resident")
+        loads = MetricFamily("tts_model_loads_total", "counter", "Times the model was loaded")
+        for model_id, model_stats in stats["models"].items():
+            loaded.add(1 if model_stats["state"] == "loaded" else 0, model=model_id)
+            loads.add(model_stats["loads"], model=model_id)
+        families += [
+            loaded,
+            loads,
+            MetricFamily("tts_model_unloads_total", "counter", "Models unloaded by the memory budget or idle TTL")
+            .add(stats["unloads"]),
+            MetricFamily("tts_model_resident_bytes", "gauge", "Declared memory of loaded models")
+            .add(stats["residentBytes"])
+        ]
+    return families
+
+metrics.registry.add_collector(runtime_metrics)
+
+def capacity_exceeded(model_id: str, error: CapacityError) -> HTTPException:
+    detail = str(error) if isinstance(error, DeadlineError) else f"Model {model_id} is at capacity: {error}"
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def rejection_outcome(error: Exception) -> str:
+    return "expired" if isinstance(error, DeadlineError) else "rejected"
+
+def request_client(connection: HTTPConnection) -> str:
+    """Who a request or WebSocket counts against in the fair-share scheduler"""
+    return client_identity(
+        connection.headers,
+        connection.client.host if connection.client else None,
+        server_config.get("scheduling", {}).get("clientHeaders", ["X-API-Key", "Authorization"])
+    )
+
+def request_deadline(request: "GenerateRequest") -> Optional[float]:
+    """The request's deadline as a time.monotonic() value"""
+    if request.deadline is None:
+        return None
+    if request.deadline <= 0:
+        raise HTTPException(status_code=400, detail="Deadline must be a positive number of seconds")
+    return time.monotonic() + request.deadline
+
+def model_unavailable(error: ModelLoadError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error))
+
+def load_config():
+    """Read models_config.json and server_config.json into the module globals"""
+    global models_config, server_config, model_registry
+    
+    server_config_path = Path(__file__).parent / "config" / "server_config.json"
+    if server_config_path.exists():
+        with open(server_config_path, "r") as f:
+            server_config = json.load(f)
+    
+    model_registry = ModelRegistry(
+        Path(__file__).parent / "config" / "models_config.json",
+        reload_interval=server_config.get("catalog", {}).get("reloadIntervalSeconds", 2)
+    )
+    model_registry.on_reload(apply_models_config)
+    models_config = model_registry.models
+
+def apply_models_config(old: RegistrySnapshot, new: RegistrySnapshot):
+    """Hand a reloaded models_config.json to the module globals and the adapters"""
+    global models_config
+    
+    reloaded = dict(new.models)
+    for model_id, adapter in adapters.items():
+        config = reloaded.get(model_id)
+        if config is None:
+            logger.warning(f"{model_id} was removed from models_config.json; it stays until restart")
+            reloaded[model_id] = models_config[model_id]
+            continue
+        # Which models are served is decided at startup
+        status = models_config[model_id]["status"]
+        if config["status"] != status:
+            logger.warning(f"Status of {model_id} changes to '{config['status']}' after a restart")
+            reloaded[model_id] = config = {**config, "status": status}
+        adapter.update_config(config)
+    models_config = reloaded
+
+def catalog_response(http_request: Request, key: str, build: Callable[[], Any]) -> Response:
+    """A catalog payload with ETag and Cache-Control, or 304 if the client's copy is current"""
+    version = (model_registry.generation, tuple(adapter.voices_version() for adapter in adapters.values()))
+    body, etag = catalog_cache.get(key, version, build)
+    
+    max_age = server_config.get("catalog", {}).get("maxAgeSeconds", 0)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"max-age={max_age}, must-revalidate" if max_age else "no-cache"
+    }
+    if etag_matches(http_request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def preload_shared_weights():
+    """Load weights in the parent process so forked workers share them"""
+    for model_id in server_config.get("workers", {}).get("preload", []):
+        if model_id not in ADAPTER_CLASSES:
+            logger.warning(f"Cannot preload unknown model {model_id}")
+            continue
+        try:
+            preloaded = ADAPTER_CLASSES[model_id].preload_weights(models_config[model_id])
+        except Exception as e:
+            # Workers then load their own copy on first use
+            logger.error(f"❌ Failed to preload {model_id}: {e}")
+            continue
+        if preloaded:
+            shared_models.add(model_id)
+            logger.info(f"Preloaded {model_id}: {', '.join(preloaded)}")
+
+def init_worker(worker: WorkerInfo):
+    """Split the CPU threads for model inference between the workers"""
+    threads = server_config.get("workers", {}).get("threadsPerWorker")
+    threads = threads or max(1, (os.cpu_count() or 1) // worker.count)
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
-    global adapters, models_config
+    global adapters, artifact_store, synthesis_cache, transcoder, postprocessor
+    global extraction_cache, job_manager, model_manager, fair_share
     
     logger.info("Starting TTS backend server...")
+    load_config()
+    worker = current_worker()
     
-    config_path = Path(__file__).parent / "config" / "models_config.json"
-    with open(config_path, "r") as f:
-        models_config = json.load(f)["models"]
+    store_config = server_config.get("artifactStore", {})
+    artifact_store = ArtifactStore(
+        AUDIO_DIR,
+        max_bytes=store_config.get("maxBytes", 2 * 1024 ** 3),
+        ttl_seconds=store_config.get("ttlSeconds", 7 * 24 * 3600),
+        sweep_interval=store_config.get("sweepIntervalSeconds", 300),
+        recover=worker.primary,
+        worker=worker.index,
+        workers=worker.count
+    )
+    await artifact_store.start()
+    transcoder = Transcoder(
+        artifact_store,
+        max_workers=server_config.get("transcoding", {}).get("maxWorkers", 2)
+    )
+    postprocessor = PostProcessor(
+        max_workers=server_config.get("postprocessing", {}).get("maxWorkers", 2)
+    )
+    
+    extraction_config = server_config.get("extraction", {})
+    configure_extraction_pool(
+        processes=extraction_config.get("processes", 0),
+        pages_per_task=extraction_config.get("pagesPerTask", 8)
+    )
+    extraction_cache = ExtractionCache(max_chars=extraction_config.get("cacheMaxCharacters", 50_000_000))
+    
+    cache_config = server_config.get("synthesisCache", {})
+    if cache_config.get("enabled", True):
+        synthesis_cache = SynthesisCache(artifact_store)
     
-    adapters["higgs-audio-v2"] = HiggsAudioAdapter(models_config["higgs-audio-v2"])
-    adapters["neutts-air"] = NeuTTSAdapter(models_config["neutts-air"])
+    # One ledger for all models, so heavy use of one model counts on the others too
+    fair_share = FairShare(half_life=server_config.get("scheduling", {}).get("usageHalfLifeSeconds", 60))
+    for model_id, adapter_class in ADAPTER_CLASSES.items():
+        adapters[model_id] = adapter_class(models_config[model_id])
+        adapters[model_id].limiter.shares = fair_share
     
+    # Models load on first use; preloading runs in the background
+    loading_config = server_config.get("modelLoading", {})
+    budget_mb = loading_config.get("memoryBudgetMB")
+    model_manager = ModelManager(
+        budget_bytes=int(budget_mb * 1024 ** 2) if budget_mb else None,
+        idle_ttl=loading_config.get("idleTTLSeconds", 0),
+        sweep_interval=loading_config.get("sweepIntervalSeconds", 60)
+    )
     for model_id, adapter in adapters.items():
         if models_config[model_id]["status"] == "active":
-            try:
-                await adapter.initialize()
-                logger.info(f"✅ Initialized {model_id}")
-            except Exception as e:
-                logger.error(f"❌ Failed to initialize {model_id}: {e}")
+            model_manager.register(
+                model_id,
+                adapter,
+                memory_bytes=int(models_config[model_id].get("memoryMB", 0) * 1024 ** 2),
+                # Unloading frees nothing while the parent holds the shared weights
+                pinned=model_id in shared_models
+            )
+    await model_manager.start(preload=loading_config.get("preload", []))
+    await model_registry.start()
+    
+    jobs_config = server_config.get("jobs", {})
+    if jobs_config.get("enabled", True):
+        job_manager = JobManager(
+            JobStore(Path(__file__).parent / jobs_config.get("databasePath", "temp/jobs.sqlite3")),
+            execute=execute_job,
+            max_concurrent=jobs_config.get("maxConcurrent", 2),
+            max_pending=jobs_config.get("maxPending", 1000),
+            cancel_poll_interval=jobs_config.get("cancelPollSeconds", 1.0)
+        )
+        # Every worker would otherwise take the others' running jobs for interrupted ones
+        await job_manager.start(resume=worker.primary)
+    
+    if worker.count > 1:
+        logger.info(f"Worker {worker.index} of {worker.count} (pid {os.getpid()}): {format_memory(memory_usage())}")
     
     yield
     
     logger.info("Shutting down TTS backend server...")
+    await model_registry.close()
+    if job_manager is not None:
+        await job_manager.close()
+    await model_manager.close()
+    for model_id, adapter in adapters.items():
+        try:
+            await adapter.shutdown()
+        except Exception as e:
+            logger.error(f"Failed to shut down {model_id}: {e}")
+    
+    await transcoder.close()
+    await postprocessor.close()
+    shutdown_extraction_pool()
+    await artifact_store.close()
 
 app = FastAPI(
     title="TTS Voice Generation API",
@@ -71,6 +383,31 @@ class GenerateRequest(BaseModel):
     voice: str
     model: str
     settings: Optional[Dict[str, Any]] = None
+    seed: Optional[int] = None
+    cache: bool = True
+    format: str = "wav"
+    postprocess: Optional[Dict[str, Any]] = None
+    # Seconds the client will wait; requests that cannot finish in time are dropped
+    deadline: Optional[float] = None
+
+class StreamGenerateRequest(GenerateRequest):
+    format: str = "wav"
+
+class AudiobookChapter(BaseModel):
+    title: str
+    text: str
+
+class AudiobookRequest(BaseModel):
+    voice: str
+    model: str
+    text: Optional[str] = None
+    chapters: Optional[List[AudiobookChapter]] = None
+    title: Optional[str] = None
+    settings: Optional[Dict[str, Any]] = None
+    seed: Optional[int] = None
+    cache: bool = True
+    format: str = "wav"
+    postprocess: Optional[Dict[str, Any]] = None
 
 class GenerateResponse(BaseModel):
     success: bool
@@ -79,6 +416,252 @@ class GenerateResponse(BaseModel):
     format: str = "wav"
     model: str
     voice: str
+    cached: bool = False
+
+class JobProgress(BaseModel):
+    segmentsDone: int
+    segmentsTotal: int
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    model: str
+    voice: str
+    progress: JobProgress
+    audioUrl: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    createdAt: float
+    updatedAt: float
+
+def job_response(job: Dict[str, Any]) -> JobResponse:
+    return JobResponse(
+        id=job["id"],
+        status=job["status"],
+        model=job["request"]["model"],
+        voice=job["request"]["voice"],
+        progress=JobProgress(
+            segmentsDone=job["segments_done"],
+            segmentsTotal=job["segments_total"]
+        ),
+        audioUrl=f"/api/audio/{job['audio_file']}" if job["audio_file"] else None,
+        cached=job["cached"],
+        error=job["error"],
+        result=job["result"],
+        createdAt=job["created_at"],
+        updatedAt=job["updated_at"]
+    )
+
+def resolve_adapter(request: GenerateRequest):
+    """Validate a generation request and return the adapter that serves it"""
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    
+    adapter = model_adapter(request.model, request.voice)
+    check_settings(adapter, request)
+    return adapter
+
+def check_settings(adapter, request: BaseModel):
+    """Reject settings the model cannot use before any work is queued"""
+    try:
+        adapter.validate_settings(request_settings(request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def request_settings(request: BaseModel) -> Dict[str, Any]:
+    """Model settings of a request, with its top-level seed merged in"""
+    settings = dict(request.settings or {})
+    if request.seed is not None:
+        settings["seed"] = request.seed
+    return settings
+
+def model_adapter(model_id: str, voice_id: str):
+    """Adapter for an active model, checking that it offers the voice"""
+    if model_id not in adapters:
+        raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
+    
+    adapter = adapters[model_id]
+    
+    if model_id not in model_manager:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model {model_id} is not active"
+        )
+    
+    if not adapter.validate_voice(voice_id):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Voice {voice_id} not available for model {model_id}"
+        )
+    
+    return adapter
+
+def audiobook_chapters(request: AudiobookRequest) -> List[Chapter]:
+    if request.chapters:
+        return [
+            Chapter(chapter.title, chapter.text)
+            for chapter in request.chapters if chapter.text.strip()
+        ]
+    if request.text and request.text.strip():
+        return [Chapter(request.title or "Chapter 1", request.text)]
+    return []
+
+def check_output_format(request: BaseModel):
+    if request.format not in AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Format must be one of: {', '.join(AUDIO_FORMATS)}"
+        )
+
+def postprocess_chain(options: Optional[Dict[str, Any]]):
+    """Parsed post-processing chain of a request, or of the server defaults if it sets none"""
+    if options is None:
+        options = server_config.get("postprocessing", {}).get("defaults", {})
+    try:
+        return parse_chain(options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def synthesize(
+    request: GenerateRequest,
+    progress: Optional[Callable[[int, int], None]] = None,
+    timings: Optional[StageTimings] = None,
+    client: str = "",
+    deadline: Optional[float] = None
+) -> Tuple[Path, bool]:
+    """
+    Run a generation through the model limiter and the synthesis cache,
+    then encode it in the requested format
+    
+    Args:
+        request: Validated generation request
+        progress: Called with (segments done, segments total)
+        timings: Collects the per-stage timings of this request
+        client: Who the generation counts against in the fair-share scheduler
+        deadline: time.monotonic() by which the generation must be able to finish
+    
+    Returns:
+        Output path and whether it was served without a new generation
+    """
+    adapter = adapters[request.model]
+    timings = timings if timings is not None else StageTimings()
+    chain = postprocess_chain(request.postprocess)
+    
+    settings = request_settings(request)
+    
+    cost = adapter.estimate_cost(request.text, settings)
+    
+    async def run_generation():
+        # Loaded before taking a slot, so the limiter times and charges only synthesis
+        async with model_manager.use(request.model):
+            queued = time.perf_counter()
+            async with adapter.limiter.slot(client=client, cost=cost, deadline=deadline):
+                timings.add("queue", time.perf_counter() - queued)
+                with span("synthesis"):
+                    output_path = await adapter.generate(
+                        text=request.text,
+                        voice_id=request.voice,
+                        settings=settings,
+                        progress=progress
+                    )
+                watermark = adapter.watermarker()
+        # After the slot is released, so the next generation overlaps with it
+        return await postprocessor.process_file(output_path, chain, watermark)
+    
+    with collect(timings):
+        try:
+            if synthesis_cache is not None and request.cache:
+                cache_key = SynthesisCache.make_key(
+                    model=request.model,
+                    voice=request.voice,
+                    text=request.text,
+                    settings=adapter.validate_settings(settings),
+                    seed=request.seed,
+                    postprocess=chain
+                )
+                output_path, cached = await synthesis_cache.get_or_generate(request.model, cache_key, run_generation)
+            else:
+                output_path, cached = artifact_store.add(await run_generation()).path, False
+            
+            with span("transcode"):
+                artifact = await transcoder.variant(output_path.name, request.format)
+        except (CapacityError, ModelLoadError) as e:
+            metrics.observe_outcome(request.model, rejection_outcome(e))
+            raise
+        except Exception:
+            metrics.observe_outcome(request.model, "failed")
+            raise
+    
+    if cached:
+        metrics.observe_outcome(request.model, "cached")
+    else:
+        # Only a header read, but file I/O all the same, so it stays off the event loop
+        info = await asyncio.to_thread(sf.info, str(output_path))
+        metrics.observe_generation(request.model, timings, info.duration)
+    return artifact.path, cached
+
+async def execute_job(
+    request_data: Dict[str, Any],
+    progress: Callable[[int, int], None]
+) -> Tuple[Path, bool, Optional[Dict[str, Any]]]:
+    """Run a stored job request through the same path as /api/generate"""
+    if request_data.get("kind") == "audiobook":
+        return await execute_audiobook(AudiobookRequest(**request_data), progress, request_data.get("client", ""))
+    
+    request = GenerateRequest(**request_data)
+    try:
+        resolve_adapter(request)
+    except HTTPException as e:
+        raise ValueError(e.detail)
+    output_path, cached = await synthesize(request, progress, client=request_data.get("client", ""))
+    return output_path, cached, None
+
+async def execute_audiobook(
+    request: AudiobookRequest,
+    progress: Callable[[int, int], None],
+    client: str = ""
+) -> Tuple[Path, bool, Dict[str, Any]]:
+    """Synthesize a document chunk by chunk across the model's capacity and stitch it"""
+    try:
+        adapter = model_adapter(request.model, request.voice)
+    except HTTPException as e:
+        raise ValueError(e.detail)
+    
+    chunk_request = GenerateRequest(
+        text="",
+        voice=request.voice,
+        model=request.model,
+        settings=request.settings,
+        seed=request.seed,
+        cache=request.cache,
+        postprocess=request.postprocess
+    )
+    uncached_chunks = []
+    
+    async def synthesize_chunk(text: str) -> Path:
+        output_path, _ = await synthesize(chunk_request.model_copy(update={"text": text}), client=client)
+        if not request.cache:
+            uncached_chunks.append(output_path.name)
+        return output_path
+    
+    output_path = AUDIO_DIR / f"book_{uuid.uuid4().hex[:8]}.wav"
+    try:
+        timeline = await build_audiobook(
+            audiobook_chapters(request),
+            synthesize_chunk,
+            output_path,
+            max_chars=models_config[request.model]["maxCharacters"],
+            concurrency=adapter.limiter.max_concurrent,
+            progress=progress
+        )
+    finally:
+        for name in uncached_chunks:
+            artifact_store.remove(name)
+    
+    artifact = artifact_store.add(output_path)
+    artifact = await transcoder.variant(artifact.name, request.format)
+    return artifact.path, False, timeline
 
 @app.get("/")
 async def root():
@@ -94,9 +677,9 @@ async def root():
     }
 
 @app.get("/api/models")
-async def list_models():
+async def list_models(http_request: Request):
     """List all available models"""
-    return {
+    return catalog_response(http_request, "models", lambda: {
         "models": [
             {
                 "id": model_id,
@@ -111,81 +694,127 @@ async def list_models():
             }
             for model_id, config in models_config.items()
         ]
-    }
+    })
 
 @app.get("/api/models/{model_id}/voices")
-async def list_model_voices(model_id: str):
+async def list_model_voices(model_id: str, http_request: Request):
     """List voices for a specific model"""
     if model_id not in models_config:
         raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
     
     if model_id not in adapters:
-        return {"voices": []}
+        return catalog_response(http_request, f"voices:{model_id}", lambda: {"voices": []})
     
     adapter = adapters[model_id]
-    return {"voices": adapter.get_voices()}
+    return catalog_response(http_request, f"voices:{model_id}", lambda: {"voices": adapter.get_voices()})
 
 @app.get("/api/models/{model_id}/settings")
-async def get_model_settings(model_id: str):
+async def get_model_settings(model_id: str, http_request: Request):
     """Get settings schema for a specific model"""
     if model_id not in models_config:
         raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
     
     if model_id not in adapters:
-        return {"settings": {}}
+        return catalog_response(http_request, f"settings:{model_id}", lambda: {"settings": {}})
     
     adapter = adapters[model_id]
-    return {"settings": adapter.get_settings_schema()}
+    return catalog_response(
+        http_request, f"settings:{model_id}", lambda: {"settings": adapter.get_settings_schema()}
+    )
 
 @app.get("/api/voices")
-async def list_all_voices():
+async def list_all_voices(http_request: Request):
     """List all available voices across all models"""
-    all_voices = []
-    
-    for model_id, adapter in adapters.items():
-        if models_config[model_id]["status"] == "active":
-            voices = adapter.get_voices()
-            for voice in voices:
-                all_voices.append({
-                    **voice,
-                    "model": model_id,
-                    "modelName": models_config[model_id]["name"]
-                })
+    def build():
+        all_voices = []
+        
+        for model_id, adapter in adapters.items():
+            if models_config[model_id]["status"] == "active":
+                voices = adapter.get_voices()
+                for voice in voices:
+                    all_voices.append({
+                        **voice,
+                        "model": model_id,
+                        "modelName": models_config[model_id]["name"]
+                    })
+        
+        return {"voices": all_voices}
     
-    return {"voices": all_voices}
+    return catalog_response(http_request, "voices", build)
 
-@app.post("/api/generate", response_model=GenerateResponse)
-async def generate_voice(request: GenerateRequest):
-    """Generate voice from text"""
+@app.post("/api/voices")
+async def enroll_voice(
+    file: UploadFile = File(...),
+    transcript: str = Form(...),
+    voice_id: str = Form(...),
+    model: str = Form("neutts-air"),
+    name: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    gender: Optional[str] = Form(None),
+    language: Optional[str] = Form(None)
+):
+    """Enroll a new voice from a reference recording and its transcript"""
     
-    if not request.text.strip():
-        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    if model not in adapters:
+        raise HTTPException(status_code=404, detail=f"Model {model} not found")
     
-    if request.model not in adapters:
-        raise HTTPException(status_code=404, detail=f"Model {request.model} not found")
+    if Path(file.filename or "").suffix.lower() != ".wav":
+        raise HTTPException(status_code=400, detail="Reference audio must be a WAV file")
     
-    adapter = adapters[request.model]
+    if model not in model_manager:
+        raise HTTPException(status_code=503, detail=f"Model {model} is not active")
     
-    if not adapter.is_initialized():
-        raise HTTPException(
-            status_code=503,
-            detail=f"Model {request.model} is not initialized"
-        )
+    try:
+        content = await file.read()
+        async with model_manager.use(model) as adapter:
+            voice = await adapter.add_voice(
+                voice_id=voice_id,
+                audio_bytes=content,
+                transcript=transcript,
+                metadata={
+                    "name": name,
+                    "description": description,
+                    "gender": gender,
+                    "language": language
+                }
+            )
+    except CapacityError as e:
+        raise capacity_exceeded(model, e)
+    except ModelLoadError as e:
+        raise model_unavailable(e)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Voice enrollment error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Voice enrollment failed: {str(e)}")
     
-    if not adapter.validate_voice(request.voice):
-        raise HTTPException(
-            status_code=400,
-            detail=f"Voice {request.voice} not available for model {request.model}"
-        )
+    return {
+        "success": True,
+        "voice": {
+            **voice,
+            "model": model,
+            "modelName": models_config[model]["name"]
+        }
+    }
+
+@app.post("/api/generate", response_model=GenerateResponse)
+async def generate_voice(request: GenerateRequest, http_request: Request, response: Response):
+    """Generate voice from text"""
+    
+    resolve_adapter(request)
+    check_output_format(request)
+    postprocess_chain(request.postprocess)
+    deadline = request_deadline(request)
     
+    timings = StageTimings()
     try:
-        settings = request.settings or {}
-        
-        output_path = await adapter.generate(
-            text=request.text,
-            voice_id=request.voice,
-            settings=settings
+        output_path, cached = await run_until_disconnected(
+            http_request,
+            synthesize(request, timings=timings, client=request_client(http_request), deadline=deadline)
         )
+        response.headers["Server-Timing"] = timings.server_timing(cache="hit" if cached else "miss")
         
         audio_filename = output_path.name
         audio_url = f"/api/audio/{audio_filename}"
@@ -193,18 +822,270 @@ async def generate_voice(request: GenerateRequest):
         return GenerateResponse(
             success=True,
             audioUrl=audio_url,
-            format="wav",
+            format=request.format,
             model=request.model,
-            voice=request.voice
+            voice=request.voice,
+            cached=cached
         )
     
+    except HTTPException:
+        raise
+    except CapacityError as e:
+        raise capacity_exceeded(request.model, e)
+    except ModelLoadError as e:
+        raise model_unavailable(e)
     except Exception as e:
         logger.error(f"Generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: GenerateRequest, http_request: Request):
+    """Queue a generation and return its job id without waiting for the audio"""
+    
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="Job API is disabled")
+    
+    resolve_adapter(request)
+    check_output_format(request)
+    postprocess_chain(request.postprocess)
+    if request.deadline is not None:
+        raise HTTPException(status_code=400, detail="Deadlines apply to /api/generate and /api/generate/stream, not jobs")
+    
+    try:
+        job = await job_manager.submit({**request.model_dump(), "client": request_client(http_request)})
+    except CapacityError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    return job_response(job)
+
+@app.post("/api/audiobooks", response_model=JobResponse, status_code=202)
+async def create_audiobook(request: AudiobookRequest, http_request: Request):
+    """Queue a whole document for synthesis into one audio file with a chapter timeline"""
+    
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="Job API is disabled")
+    
+    if not audiobook_chapters(request):
+        raise HTTPException(status_code=400, detail="Document has no text to synthesize")
+    
+    check_settings(model_adapter(request.model, request.voice), request)
+    check_output_format(request)
+    postprocess_chain(request.postprocess)
+    
+    try:
+        job = await job_manager.submit({
+            **request.model_dump(),
+            "kind": "audiobook",
+            "client": request_client(http_request)
+        })
+    except CapacityError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    return job_response(job)
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Job status, progress and, once completed, the audio URL"""
+    
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="Job API is disabled")
+    
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    return job_response(job)
+
+@app.delete("/api/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="Job API is disabled")
+    
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    return job_response(job)
+
+@app.post("/api/generate/stream")
+async def generate_voice_stream(request: StreamGenerateRequest, http_request: Request):
+    """Stream generated speech as 16-bit PCM while it is synthesized"""
+    
+    if request.format not in ("wav", "pcm"):
+        raise HTTPException(status_code=400, detail="Stream format must be 'wav' or 'pcm'")
+    if request.postprocess:
+        raise HTTPException(status_code=400, detail="Post-processing is not available for streams")
+    
+    adapter = resolve_adapter(request)
+    deadline = request_deadline(request)
+    settings = request_settings(request)
+    timings = StageTimings()
+    
+    # Claim the slot and load the model before responding so failures are still a proper 503
+    slot = AsyncExitStack()
+    try:
+        with collect(timings):
+            await slot.enter_async_context(model_manager.use(request.model))
+            with span("queue"):
+                await slot.enter_async_context(adapter.limiter.slot(
+                    client=request_client(http_request),
+                    cost=adapter.estimate_cost(request.text, settings),
+                    deadline=deadline
+                ))
+    except CapacityError as e:
+        await slot.aclose()
+        metrics.observe_outcome(request.model, rejection_outcome(e))
+        raise capacity_exceeded(request.model, e)
+    except ModelLoadError as e:
+        await slot.aclose()
+        metrics.observe_outcome(request.model, "rejected")
+        raise model_unavailable(e)
+    
+    async def audio_frames():
+        samples = 0
+        try:
+            if request.format == "wav":
+                yield wav_stream_header(adapter.sample_rate)
+            watermark = adapter.watermarker()
+            with collect(timings), span("synthesis"):
+                async for waveform in adapter.generate_stream(
+                    text=request.text,
+                    voice_id=request.voice,
+                    settings=settings
+                ):
+                    # The next segment keeps generating while this one is watermarked
+                    waveform, _ = await postprocessor.process(waveform, adapter.sample_rate, [], watermark)
+                    if samples == 0:
+                        timings.add("first_audio", timings.elapsed())
+                    samples += len(waveform)
+                    yield float_to_pcm16(waveform)
+            metrics.observe_generation(request.model, timings, samples / adapter.sample_rate)
+        except Exception as e:
+            metrics.observe_outcome(request.model, "failed")
+            logger.error(f"Streaming generation error: {str(e)}")
+        finally:
+            await slot.aclose()
+    
+    if request.format == "wav":
+        media_type = "audio/wav"
+    else:
+        media_type = f"audio/L16;rate={adapter.sample_rate};channels=1"
+    
+    # Headers go out before synthesis, so they carry only the queue wait
+    return StreamingResponse(
+        audio_frames(),
+        media_type=media_type,
+        headers={
+            "X-Sample-Rate": str(adapter.sample_rate),
+            "Server-Timing": timings.server_timing()
+        }
+    )
+
+@app.websocket("/ws/tts")
+async def realtime_tts(websocket: WebSocket):
+    """
+    Speak text that arrives in deltas, e.g. from an LLM, phrase by phrase
+    
+    The first message is `{"type": "start", "model", "voice", "settings"}`;
+    the protocol is described in serving/realtime.py and the README.
+    """
+    await websocket.accept()
+    try:
+        start, error = parse_start(await websocket.receive_text())
+        adapter = None
+        if error is None:
+            try:
+                adapter = model_adapter(start["model"], start["voice"])
+            except HTTPException as e:
+                error = e.detail
+        if error is not None:
+            await websocket.send_text(json.dumps({"type": "error", "message": error}))
+            await websocket.close(code=1008)
+            return
+        
+        model_id = start["model"]
+        settings = start.get("settings") or {}
+        client = request_client(websocket)
+        
+        async def synthesize(index: int, text: str):
+            timings = StageTimings()
+            samples = 0
+            try:
+                async with AsyncExitStack() as slot:
+                    with collect(timings):
+                        await slot.enter_async_context(model_manager.use(model_id))
+                        with span("queue"):
+                            await slot.enter_async_context(adapter.limiter.slot(
+                                client=client,
+                                cost=adapter.estimate_cost(text, settings)
+                            ))
+                    watermark = adapter.watermarker()
+                    with collect(timings), span("synthesis"):
+                        async for waveform in adapter.generate_stream(
+                            text=text,
+                            voice_id=start["voice"],
+                            settings=settings
+                        ):
+                            waveform, _ = await postprocessor.process(waveform, adapter.sample_rate, [], watermark)
+                            if samples == 0:
+                                timings.add("first_audio", timings.elapsed())
+                            samples += len(waveform)
+                            yield waveform
+            except (CapacityError, ModelLoadError) as e:
+                metrics.observe_outcome(model_id, rejection_outcome(e))
+                raise
+            except Exception:
+                metrics.observe_outcome(model_id, "failed")
+                raise
+            metrics.observe_generation(model_id, timings, samples / adapter.sample_rate)
+        
+        realtime_config = server_config.get("realtime", {})
+        phrases = PhraseBuffer(
+            min_chars=realtime_config.get("minPhraseCharacters", 8),
+            clause_chars=realtime_config.get("clausePhraseCharacters", 60),
+            max_chars=min(
+                realtime_config.get("maxPhraseCharacters", 300),
+                models_config[model_id]["maxCharacters"]
+            )
+        )
+        await websocket.send_text(json.dumps({
+            "type": "ready",
+            "sampleRate": adapter.sample_rate,
+            "channels": 1,
+            "encoding": "pcm_s16le"
+        }))
+        session = RealtimeSession(
+            websocket,
+            synthesize,
+            phrases,
+            max_queued=realtime_config.get("maxQueuedPhrases", 32)
+        )
+        await session.run()
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except SessionClosed as e:
+        await websocket.close(code=e.code, reason=e.reason)
+
 @app.post("/api/extract")
-async def extract_file_text(file: UploadFile = File(...)):
-    """Extract text from uploaded file"""
+async def extract_file_text(file: UploadFile = File(...), stream: bool = False):
+    """
+    Extract text from uploaded file
+    
+    With `stream=true` the response is NDJSON: one record per PDF page (or one
+    text record for other formats) as soon as it is extracted, then a `done`
+    record with the metadata.
+    """
     
     allowed_extensions = [".txt", ".pdf", ".docx", ".doc"]
     file_ext = Path(file.filename).suffix.lower()
@@ -215,9 +1096,45 @@ async def extract_file_text(file: UploadFile = File(...)):
             detail=f"Unsupported file format. Allowed: {', '.join(allowed_extensions)}"
         )
     
+    max_bytes = server_config.get("extraction", {}).get("maxUploadBytes", 50 * 1024 * 1024)
     try:
-        content = await file.read()
-        result = await extract_text_from_file(content, file.filename)
+        upload_path, digest = await spool_upload(file, UPLOAD_DIR, max_bytes)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    cache_key = f"{digest}{file_ext}"
+    cached_records = extraction_cache.get(cache_key)
+    
+    async def records():
+        try:
+            if cached_records is not None:
+                for record in cached_records:
+                    if record["type"] == "done":
+                        record = {**record, "metadata": {**record["metadata"], "filename": file.filename}}
+                    yield record
+                return
+            
+            extracted = []
+            async for record in iter_document(upload_path, file.filename):
+                extracted.append(record)
+                yield record
+            extraction_cache.put(cache_key, extracted)
+        finally:
+            upload_path.unlink(missing_ok=True)
+    
+    if stream:
+        async def ndjson():
+            try:
+                async for record in records():
+                    yield json.dumps(record) + "\n"
+            except Exception as e:
+                logger.error(f"File extraction error: {str(e)}")
+                yield json.dumps({"type": "error", "error": f"Extraction failed: {str(e)}"}) + "\n"
+        
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    
+    try:
+        result = collect_document([record async for record in records()])
         
         return {
             "success": True,
@@ -229,36 +1146,119 @@ async def extract_file_text(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
 @app.get("/api/audio/{filename}")
-async def get_audio_file(filename: str):
-    """Serve generated audio file"""
-    audio_dir = Path(__file__).parent / "temp" / "audio"
-    file_path = audio_dir / filename
+async def get_audio_file(filename: str, http_request: Request):
+    """Serve generated audio file, encoding other formats on first request"""
+    artifact = artifact_store.lookup(filename)
+    
+    # `<name>.flac` etc. are encoded from the stored `<name>.wav` on demand
+    format_id = format_for_file(Path(filename))
+    if artifact is None and format_id is not None:
+        source_name = Path(filename).stem + AUDIO_FORMATS["wav"].extension
+        if artifact_store.lookup(source_name, touch=False) is not None:
+            try:
+                artifact = await transcoder.variant(source_name, format_id)
+            except Exception as e:
+                logger.error(f"Transcoding error: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Transcoding failed: {str(e)}")
     
-    if not file_path.exists():
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    
+    # Validators come from the file itself: a cached output regenerated after
+    # eviction keeps its name, but sampled audio does not keep its bytes
+    try:
+        stat = artifact.path.stat()
+    except OSError:
         raise HTTPException(status_code=404, detail="Audio file not found")
+    size = stat.st_size
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+    media_type = AUDIO_FORMATS[format_id].media_type if format_id else "application/octet-stream"
+    
+    if etag_matches(http_request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    
+    # Partial content lets players seek; a stale If-Range gets the full file
+    range_header = http_request.headers.get("range")
+    if_range = http_request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except RangeNotSatisfiable:
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{size}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                iter_file_range(artifact.path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1)
+                }
+            )
     
     return FileResponse(
-        path=file_path,
-        media_type="audio/wav",
-        filename=filename
+        path=artifact.path,
+        media_type=media_type,
+        filename=filename,
+        headers=headers
     )
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: stage latencies, token rate, real-time factor, queues and caches"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    loading = model_manager.stats()
     active_models = {}
     for model_id, adapter in adapters.items():
         active_models[model_id] = {
             "initialized": adapter.is_initialized(),
-            "status": models_config[model_id]["status"]
+            "status": models_config[model_id]["status"],
+            **({"loading": loading["models"][model_id]} if model_id in loading["models"] else {}),
+            **({"runtime": adapter.runtime_info()} if adapter.runtime_info() else {})
         }
     
+    worker = current_worker()
     return {
         "status": "healthy",
-        "models": active_models
+        "models": active_models,
+        "memory": {
+            "budgetBytes": loading["budgetBytes"],
+            "residentBytes": loading["residentBytes"],
+            "unloads": loading["unloads"]
+        },
+        "worker": {
+            "index": worker.index,
+            "count": worker.count,
+            "pid": os.getpid(),
+            "memory": memory_usage()
+        }
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    
+    load_config()
+    worker_count = server_config.get("workers", {}).get("count", 1)
+    if worker_count > 1:
+        serve_forked(
+            app,
+            host="0.0.0.0",
+            port=8000,
+            workers=worker_count,
+            preload=preload_shared_weights,
+            worker_init=init_worker
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
 
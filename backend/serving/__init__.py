@@ -0,0 +1,59 @@
+from .concurrency import InferenceLimiter, CapacityError, DeadlineError, FairShare, client_identity
+from .artifact_store import ArtifactStore, Artifact
+from .synthesis_cache import SynthesisCache
+from .extraction_cache import ExtractionCache
+from .http_cache import etag_matches
+from .http_ranges import RangeNotSatisfiable, parse_byte_range, iter_file_range
+from .transcoder import Transcoder
+from .postprocessor import PostProcessor
+from .jobs import JobStore, JobManager
+from .audiobook import Chapter, build_audiobook
+from .timing import StageTimings, collect, span, record_stage
+from .metrics import MetricsRegistry, MetricFamily, ServingMetrics
+from .model_manager import ModelManager, ModelLoadError
+from .workers import WorkerInfo, current_worker, memory_usage, format_memory, serve_forked
+from .registry import ModelRegistry, RegistrySnapshot, CatalogCache
+from .realtime import RealtimeSession, SessionClosed, FRAME_HEADER, parse_start
+
+__all__ = [
+    "InferenceLimiter",
+    "CapacityError",
+    "DeadlineError",
+    "FairShare",
+    "client_identity",
+    "ArtifactStore",
+    "Artifact",
+    "SynthesisCache",
+    "ExtractionCache",
+    "etag_matches",
+    "RangeNotSatisfiable",
+    "parse_byte_range",
+    "iter_file_range",
+    "Transcoder",
+    "PostProcessor",
+    "JobStore",
+    "JobManager",
+    "Chapter",
+    "build_audiobook",
+    "StageTimings",
+    "collect",
+    "span",
+    "record_stage",
+    "MetricsRegistry",
+    "MetricFamily",
+    "ServingMetrics",
+    "ModelManager",
+    "ModelLoadError",
+    "WorkerInfo",
+    "current_worker",
+    "memory_usage",
+    "format_memory",
+    "serve_forked",
+    "ModelRegistry",
+    "RegistrySnapshot",
+    "CatalogCache",
+    "RealtimeSession",
+    "SessionClosed",
+    "FRAME_HEADER",
+    "parse_start"
+]
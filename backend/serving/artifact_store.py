@@ -0,0 +1,296 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from stat import S_ISREG
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+SHARD_PATTERN = re.compile(r"^[0-9a-f]{2}$")
+INDEX_FILE = "index.json"
+# index.json is worker 0's; the others save theirs as index.<worker>.json
+INDEX_PATTERN = re.compile(r"^index(?:\.(\d+))?\.json$")
+
+
+@dataclass
+class Artifact:
+    name: str
+    path: Path
+    size: int
+    created_at: float
+    last_access: float
+
+
+class ArtifactStore:
+    """
+    Generated audio files with a bounded footprint
+
+    Files live in 256 shard directories (`<root>/<xx>/<name>`, sharded by file
+    stem so encoded variants sit next to their source) and are tracked
+    by an in-memory index of size, creation time and last access, ordered
+    least recently used first. Adapters write outputs into `root` and add()
+    moves them into their shard. Entries idle longer than `ttl_seconds`, and
+    the least recently used ones beyond `max_bytes`, are deleted. The index
+    is saved to `index.json` by the background sweeper and on close().
+
+    Several worker processes can share one root. Each owns the files it
+    stored, saves them to an index file of its own and evicts only those,
+    within an equal share of `max_bytes`. Worker 0 also owns files no
+    worker's index claims. Files stored by the others are tracked once looked
+    up, so they can be served, and are dropped as soon as they disappear.
+    Only one worker should `recover` leftovers of interrupted writes.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int,
+        ttl_seconds: float = 0,
+        sweep_interval: float = 300,
+        recover: bool = True,
+        worker: int = 0,
+        workers: int = 1
+    ):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        # This worker's share of the quota
+        self.max_bytes = max_bytes // max(1, workers)
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self.worker = worker
+        self.workers = max(1, workers)
+        self.index_path = self.root / (INDEX_FILE if worker == 0 else f"index.{worker}.json")
+        # Files this worker owns, least recently used first
+        self._entries: "OrderedDict[str, Artifact]" = OrderedDict()
+        # Files owned by other workers
+        self._shared: Dict[str, Artifact] = {}
+        self._total_bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self.evicted = 0
+        self._load_index(recover)
+
+    @staticmethod
+    def shard_for(name: str) -> str:
+        return hashlib.sha1(Path(name).stem.encode("utf-8")).hexdigest()[:2]
+
+    def path_for(self, name: str) -> Path:
+        return self.root / self.shard_for(name) / name
+
+    async def start(self):
+        """Start the background TTL and quota sweeper"""
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        await self._save_index()
+
+    def add(self, path: Path, name: Optional[str] = None) -> Artifact:
+        """
+        Move a finished output into the store
+
+        Args:
+            path: Output file, usually written by an adapter into `root`
+            name: Name to store it under; defaults to the file's own name
+
+        Returns:
+            The indexed artifact
+        """
+        name = name or path.name
+        target = self.path_for(name)
+        target.parent.mkdir(exist_ok=True)
+        path.replace(target)
+
+        now = time.time()
+        self._forget(name)
+        self._shared.pop(name, None)
+        artifact = Artifact(name, target, target.stat().st_size, now, now)
+        self._remember(artifact)
+        self._evict_over_quota()
+        return artifact
+
+    def lookup(self, name: str, touch: bool = True) -> Optional[Artifact]:
+        """Artifact for a name if its file still exists, marking it as recently used"""
+        artifact = self._entries.get(name) or self._shared.get(name)
+        if artifact is not None and not artifact.path.is_file():
+            # Deleted behind this worker's back, e.g. evicted by the worker owning it
+            self._forget(name)
+            self._shared.pop(name, None)
+            artifact = None
+        if artifact is None:
+            artifact = self._adopt(name)
+        if artifact is not None and touch:
+            artifact.last_access = time.time()
+            if name in self._entries:
+                self._entries.move_to_end(name)
+        return artifact
+
+    def remove(self, name: str):
+        artifact = self._forget(name) or self._shared.pop(name, None)
+        if artifact is not None:
+            artifact.path.unlink(missing_ok=True)
+
+    def names(self) -> Iterator[str]:
+        return iter(list(self._entries) + list(self._shared))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Delete expired artifacts, then enforce the byte quota; returns the number removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        if self.ttl_seconds > 0:
+            cutoff = now - self.ttl_seconds
+            while self._entries:
+                artifact = next(iter(self._entries.values()))
+                if artifact.last_access >= cutoff:
+                    break
+                self._evict(artifact)
+                removed += 1
+        for name, artifact in list(self._shared.items()):
+            if not artifact.path.is_file():
+                del self._shared[name]
+        return removed + self._evict_over_quota()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "sharedEntries": len(self._shared),
+            "bytes": self._total_bytes,
+            "maxBytes": self.max_bytes,
+            "ttlSeconds": self.ttl_seconds,
+            "evicted": self.evicted
+        }
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info(f"Evicted {removed} audio artifacts")
+                await self._save_index()
+            except Exception as e:
+                logger.error(f"Artifact sweep failed: {e}")
+
+    def _adopt(self, name: str) -> Optional[Artifact]:
+        """Track a file another process stored under this root, without owning it"""
+        if Path(name).name != name or name.startswith("."):
+            return None
+        path = self.path_for(name)
+        try:
+            stat = path.stat()
+        except (OSError, ValueError):
+            return None
+        if not S_ISREG(stat.st_mode):
+            return None
+        artifact = Artifact(name, path, stat.st_size, stat.st_mtime, time.time())
+        self._shared[name] = artifact
+        return artifact
+
+    def _remember(self, artifact: Artifact):
+        self._entries[artifact.name] = artifact
+        self._entries.move_to_end(artifact.name)
+        self._total_bytes += artifact.size
+
+    def _forget(self, name: str) -> Optional[Artifact]:
+        artifact = self._entries.pop(name, None)
+        if artifact is not None:
+            self._total_bytes -= artifact.size
+        return artifact
+
+    def _evict(self, artifact: Artifact):
+        self._forget(artifact.name)
+        artifact.path.unlink(missing_ok=True)
+        self.evicted += 1
+        logger.debug(f"Evicted audio artifact {artifact.name}")
+
+    def _evict_over_quota(self) -> int:
+        # Never evict the newest entry, even if it alone exceeds the budget
+        removed = 0
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict(next(iter(self._entries.values())))
+            removed += 1
+        return removed
+
+    async def _save_index(self):
+        records = [
+            {**asdict(artifact), "path": str(artifact.path.relative_to(self.root))}
+            for artifact in self._entries.values()
+        ]
+        await asyncio.to_thread(self._write_index, records)
+
+    def _write_index(self, records: list):
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(records), encoding="utf-8")
+        tmp_path.replace(self.index_path)
+
+    def _read_indexes(self) -> Dict[str, Dict[str, Any]]:
+        """Saved records of every worker's index, by name, with the owning worker"""
+        saved = {}
+        for index_path in sorted(self.root.glob("index*.json")):
+            match = INDEX_PATTERN.match(index_path.name)
+            if match is None:
+                continue
+            owner = int(match.group(1) or 0)
+            try:
+                records = json.loads(index_path.read_text(encoding="utf-8"))
+                for record in records:
+                    saved[record["name"]] = {**record, "owner": owner}
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Ignoring unreadable audio index {index_path.name}: {e}")
+        return saved
+
+    def _owns(self, record: Optional[Dict[str, Any]]) -> bool:
+        # Files of no current worker (unlisted, or from a larger pool) fall to worker 0
+        if record is None or record["owner"] >= self.workers:
+            return self.worker == 0
+        return record["owner"] == self.worker
+
+    def _load_index(self, recover: bool):
+        """Restore the saved indexes, then take on files none of them know about"""
+        saved = self._read_indexes()
+
+        found = []
+        for shard in self.root.iterdir():
+            if not (shard.is_dir() and SHARD_PATTERN.match(shard.name)):
+                continue
+            for path in shard.iterdir():
+                record = saved.get(path.name)
+                if record is not None:
+                    artifact = Artifact(path.name, path, record["size"], record["created_at"], record["last_access"])
+                else:
+                    stat = path.stat()
+                    artifact = Artifact(path.name, path, stat.st_size, stat.st_mtime, max(stat.st_atime, stat.st_mtime))
+                if self._owns(record):
+                    found.append(artifact)
+                else:
+                    self._shared[artifact.name] = artifact
+
+        if recover:
+            found.extend(self._recover())
+
+        for artifact in sorted(found, key=lambda artifact: artifact.last_access):
+            self._remember(artifact)
+        self._evict_over_quota()
+
+    def _recover(self) -> Iterator[Artifact]:
+        # Leftovers from interrupted encodes
+        for path in self.root.glob("*.part"):
+            path.unlink(missing_ok=True)
+
+        # Outputs from before sharding sit directly in the root
+        for path in self.root.glob("*.wav"):
+            stat = path.stat()
+            target = self.path_for(path.name)
+            target.parent.mkdir(exist_ok=True)
+            path.replace(target)
+            yield Artifact(path.name, target, stat.st_size, stat.st_mtime, max(stat.st_atime, stat.st_mtime))
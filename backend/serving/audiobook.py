@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from utils.file_extraction import iter_chunks
+
+from .concurrency import CapacityError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Chapter:
+    title: str
+    text: str
+
+
+def _chunk_plan(chapters: List[Chapter], max_chars: int) -> Iterator[Tuple[int, str]]:
+    """(chapter index, chunk text) for every chunk of the book, produced lazily"""
+    for index, chapter in enumerate(chapters):
+        for chunk in iter_chunks([chapter.text], max_chars):
+            yield index, chunk
+
+
+async def build_audiobook(
+    chapters: List[Chapter],
+    synthesize_chunk: Callable[[str], Awaitable[Path]],
+    output_path: Path,
+    max_chars: int,
+    concurrency: int,
+    chunk_gap: float = 0.25,
+    chapter_gap: float = 1.0,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Synthesize a document chunk by chunk into one WAV file
+
+    Up to `concurrency` chunks are synthesized at once. Finished chunks are
+    appended to the output strictly in order, so only the chunks in that
+    window are held in memory.
+
+    Args:
+        chapters: Titled sections of the document
+        synthesize_chunk: Coroutine producing a WAV file for one chunk of text
+        output_path: Where to write the stitched audio
+        max_chars: Largest chunk the model accepts
+        concurrency: Chunks in flight at once
+        chunk_gap: Silence between chunks, in seconds
+        chapter_gap: Silence before each new chapter, in seconds
+        progress: Called with (chunks done, chunks total)
+
+    Returns:
+        Timeline with the duration and, per chapter, its start/end and the
+        start/end of each segment, in seconds
+    """
+    total = sum(1 for _ in _chunk_plan(chapters, max_chars))
+    if total == 0:
+        raise ValueError("Document has no text to synthesize")
+    if progress is not None:
+        progress(0, total)
+
+    timeline = [
+        {"title": chapter.title, "start": None, "end": None, "segments": []}
+        for chapter in chapters
+    ]
+    plan = _chunk_plan(chapters, max_chars)
+    window: Deque[Tuple[int, str, asyncio.Task]] = deque()
+    writer: Optional[sf.SoundFile] = None
+    sample_rate = 0
+    position = 0
+    previous_chapter = None
+    done = 0
+
+    def fill_window():
+        for chapter_index, chunk in plan:
+            window.append((chapter_index, chunk, asyncio.ensure_future(_with_retry(synthesize_chunk, chunk))))
+            if len(window) >= concurrency:
+                return
+
+    try:
+        fill_window()
+        while window:
+            chapter_index, chunk, task = window.popleft()
+            chunk_path = await task
+            fill_window()
+
+            waveform, rate = await asyncio.to_thread(sf.read, str(chunk_path), dtype="float32", always_2d=True)
+            waveform = waveform.mean(axis=1)
+            if writer is None:
+                sample_rate = rate
+                writer = sf.SoundFile(
+                    str(output_path), "w", samplerate=sample_rate, channels=1,
+                    format="WAV", subtype="PCM_16"
+                )
+            elif rate != sample_rate:
+                raise ValueError(f"Chunk sample rate {rate} does not match {sample_rate}")
+
+            if previous_chapter is not None:
+                gap = chapter_gap if chapter_index != previous_chapter else chunk_gap
+                silence = np.zeros(int(gap * sample_rate), dtype=np.float32)
+                await asyncio.to_thread(writer.write, silence)
+                position += len(silence)
+
+            entry = timeline[chapter_index]
+            start = position / sample_rate
+            await asyncio.to_thread(writer.write, waveform)
+            position += len(waveform)
+            end = position / sample_rate
+            if entry["start"] is None:
+                entry["start"] = start
+            entry["end"] = end
+            entry["segments"].append({
+                "index": len(entry["segments"]),
+                "start": start,
+                "end": end,
+                "characters": len(chunk)
+            })
+            previous_chapter = chapter_index
+
+            done += 1
+            if progress is not None:
+                progress(done, total)
+    except BaseException:
+        for _, _, task in window:
+            task.cancel()
+        if writer is not None:
+            writer.close()
+            writer = None
+        output_path.unlink(missing_ok=True)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return {
+        "duration": position / sample_rate,
+        "sampleRate": sample_rate,
+        "chapters": [entry for entry in timeline if entry["segments"]]
+    }
+
+
+async def _with_retry(synthesize_chunk: Callable[[str], Awaitable[Path]], chunk: str) -> Path:
+    """Wait for model capacity instead of failing the whole book"""
+    while True:
+        try:
+            return await synthesize_chunk(chunk)
+        except CapacityError as e:
+            logger.debug(f"Audiobook chunk waiting {e.retry_after}s for capacity")
+            await asyncio.sleep(e.retry_after)
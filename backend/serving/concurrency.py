@@ -0,0 +1,306 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Any, Iterable, List, Mapping, Optional, Tuple
+
+
+class CapacityError(Exception):
+    """Raised when a model's wait queue is full"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineError(CapacityError):
+    """Raised when a request can no longer finish before its deadline"""
+
+
+class FairShare:
+    """
+    Compute seconds used per client, decaying with a half-life
+
+    One instance can be shared by several limiters, so a client's share is
+    counted across models. Idle clients drift back to zero.
+    """
+
+    def __init__(self, half_life: float = 60.0):
+        self.half_life = half_life
+        self._usage: Dict[str, Tuple[float, float]] = {}
+
+    def usage(self, client: str) -> float:
+        value, updated = self._usage.get(client, (0.0, 0.0))
+        if not value or self.half_life <= 0:
+            return value
+        return value * 0.5 ** ((time.monotonic() - updated) / self.half_life)
+
+    def charge(self, client: str, seconds: float):
+        value = max(0.0, self.usage(client) + seconds)
+        if value < 1e-3:
+            self._usage.pop(client, None)
+        else:
+            self._usage[client] = (value, time.monotonic())
+
+    def clients(self) -> int:
+        return len(self._usage)
+
+
+@dataclass(order=True)
+class _Waiter:
+    cost: float
+    order: int
+    client: str = field(compare=False)
+    deadline: Optional[float] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    timer: Optional[asyncio.TimerHandle] = field(default=None, compare=False)
+    # Estimate charged to the client when it was given a slot
+    charged: float = field(default=0.0, compare=False)
+
+
+class InferenceLimiter:
+    """
+    Per-model concurrency limit with a bounded, fair wait queue
+
+    At most `max_concurrent` generations run at once; up to `max_queue` more
+    may wait for a slot. A freed slot goes to the waiting client that has
+    used the least compute lately (see FairShare), and within that client's
+    queue to its cheapest request, so one client's batch of long texts
+    cannot hold up everyone else's short ones.
+
+    Costs are in arbitrary units (adapters use seconds of speech); the
+    limiter learns the seconds each unit takes from the time generations hold
+    their slot, so callers load the model before taking one.
+    A full queue drops the costliest request of the client with the most
+    queued, unless that is the newcomer's own client, whose request is then
+    rejected. A request with a deadline is dropped once its estimated
+    finish falls past it.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 1,
+        max_queue: int = 8,
+        initial_estimate: float = 5.0,
+        shares: Optional[FairShare] = None
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        # Replaced with one shared instance to count clients across models
+        self.shares = shares or FairShare()
+        self._active = 0
+        self._active_cost = 0.0
+        self._queues: Dict[str, List[_Waiter]] = {}
+        self._waiting = 0
+        self._order = itertools.count()
+        # Seconds per unit of cost
+        self._rate = initial_estimate
+        self.expired = 0
+        self.evicted = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def estimate(self, cost: float) -> float:
+        """Expected generation time in seconds of a request of `cost`"""
+        return cost * self._rate
+
+    def retry_after(self) -> int:
+        """Seconds until a queued request would likely get a slot"""
+        queued = sum(waiter.cost for queue in self._queues.values() for waiter in queue)
+        backlog = self.estimate(queued + self._active_cost)
+        return max(1, math.ceil(backlog / self.max_concurrent))
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        client: str = "",
+        cost: float = 1.0,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold one generation slot, waiting in the fair queue if needed
+
+        Args:
+            client: Whose request this is, for fair sharing
+            cost: Estimated size of the request
+            deadline: time.monotonic() by which the generation should finish
+        """
+        if deadline is not None and time.monotonic() + self.estimate(cost) > deadline:
+            self.expired += 1
+            raise DeadlineError(
+                f"Generation cannot finish within its deadline (about {self.estimate(cost):.1f}s needed)",
+                retry_after=self.retry_after()
+            )
+
+        if self._active < self.max_concurrent and not self._waiting:
+            charged = self._start(client, cost)
+        else:
+            charged = await self._wait(client, cost, deadline)
+
+        started = time.monotonic()
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            elapsed = time.monotonic() - started
+            # Charge what the generation really took instead of the estimate
+            self.shares.charge(client, elapsed - charged)
+            self._active -= 1
+            self._active_cost -= cost
+            if completed and cost > 0:
+                # Exponentially weighted average keeps estimates and Retry-After responsive;
+                # failed or abandoned generations say nothing about how long one takes
+                self._rate = 0.8 * self._rate + 0.2 * elapsed / cost
+            self._dispatch()
+
+    async def _wait(self, client: str, cost: float, deadline: Optional[float]) -> float:
+        if self._waiting >= self.max_queue and not self._evict_for(client):
+            raise CapacityError(
+                f"Generation queue is full ({self._waiting} waiting)",
+                retry_after=self.retry_after()
+            )
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(cost, next(self._order), client, deadline, loop.create_future())
+        heapq.heappush(self._queues.setdefault(client, []), waiter)
+        self._waiting += 1
+        if deadline is not None:
+            expires = loop.time() + deadline - time.monotonic() - self.estimate(cost)
+            waiter.timer = loop.call_at(expires, self._expire, waiter)
+
+        try:
+            await waiter.future
+            return waiter.charged
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # The slot was handed over just as the caller went away
+                self.shares.charge(client, -waiter.charged)
+                self._active -= 1
+                self._active_cost -= cost
+                self._dispatch()
+            else:
+                self._remove(waiter)
+            raise
+        finally:
+            if waiter.timer is not None:
+                waiter.timer.cancel()
+
+    def _start(self, client: str, cost: float) -> float:
+        self._active += 1
+        self._active_cost += cost
+        # Charged up front, so slots freed together are not all given to one client
+        charged = self.estimate(cost)
+        self.shares.charge(client, charged)
+        return charged
+
+    def _dispatch(self):
+        while self._active < self.max_concurrent and self._waiting:
+            client = min(
+                self._queues,
+                key=lambda name: (self.shares.usage(name), self._queues[name][0].order)
+            )
+            waiter = heapq.heappop(self._queues[client])
+            self._forget(waiter)
+            if waiter.future.done():
+                continue
+            if waiter.deadline is not None and time.monotonic() + self.estimate(waiter.cost) > waiter.deadline:
+                self._fail(waiter, DeadlineError(
+                    "Generation can no longer finish within its deadline",
+                    retry_after=self.retry_after()
+                ))
+                self.expired += 1
+                continue
+            waiter.charged = self._start(waiter.client, waiter.cost)
+            waiter.future.set_result(None)
+
+    def _evict_for(self, client: str) -> bool:
+        """Make room by dropping the costliest request of the client with the most queued"""
+        if not self._queues:
+            return False
+        heaviest = max(
+            self._queues,
+            key=lambda name: (len(self._queues[name]), self.shares.usage(name))
+        )
+        if heaviest == client or len(self._queues[heaviest]) <= len(self._queues.get(client, ())) + 1:
+            return False
+        victim = max(self._queues[heaviest])
+        self._remove(victim)
+        self._fail(victim, CapacityError(
+            "Dropped from the generation queue to make room for other clients",
+            retry_after=self.retry_after()
+        ))
+        self.evicted += 1
+        return True
+
+    def _expire(self, waiter: _Waiter):
+        if waiter.future.done():
+            return
+        self._remove(waiter)
+        self._fail(waiter, DeadlineError(
+            "Generation can no longer finish within its deadline",
+            retry_after=self.retry_after()
+        ))
+        self.expired += 1
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.client)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        heapq.heapify(queue)
+        self._forget(waiter)
+
+    def _forget(self, waiter: _Waiter):
+        self._waiting -= 1
+        if not self._queues[waiter.client]:
+            del self._queues[waiter.client]
+
+    @staticmethod
+    def _fail(waiter: _Waiter, error: CapacityError):
+        if waiter.timer is not None:
+            waiter.timer.cancel()
+        if not waiter.future.done():
+            waiter.future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "waitingClients": len(self._queues),
+            "maxConcurrent": self.max_concurrent,
+            "maxQueue": self.max_queue,
+            "secondsPerCost": self._rate,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
+
+
+def client_identity(
+    headers: Mapping[str, str],
+    host: Optional[str],
+    header_names: Iterable[str] = ("X-API-Key", "Authorization")
+) -> str:
+    """
+    Who a request counts against for fair sharing
+
+    The first of `header_names` the request carries, hashed so keys are not
+    kept in memory or logs, or else the client's address.
+    """
+    for name in header_names:
+        value = headers.get(name)
+        if value:
+            if name.lower() == "authorization" and value.lower().startswith("bearer "):
+                value = value[7:]
+            return "key:" + hashlib.sha256(value.strip().encode("utf-8")).hexdigest()[:16]
+    return f"host:{host or 'unknown'}"
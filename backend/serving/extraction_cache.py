@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class ExtractionCache:
+    """
+    Extracted documents keyed by content hash
+
+    Values are the extraction records of a document. The total amount of
+    cached text is bounded by `max_chars`, evicting least recently used first.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_chars = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        records = self._entries.get(key)
+        if records is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return records
+
+    def put(self, key: str, records: List[Dict[str, Any]]):
+        size = sum(len(record.get("text", "")) for record in records)
+        if size > self.max_chars:
+            return
+        if key in self._entries:
+            self._total_chars -= self._sizes[key]
+        self._entries[key] = records
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self._total_chars += size
+        while self._total_chars > self.max_chars:
+            evicted, _ = self._entries.popitem(last=False)
+            self._total_chars -= self._sizes.pop(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "characters": self._total_chars,
+            "maxCharacters": self.max_chars,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .concurrency import CapacityError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+UNFINISHED = (QUEUED, RUNNING)
+
+ProgressCallback = Callable[[int, int], None]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    segments_done INTEGER NOT NULL DEFAULT 0,
+    segments_total INTEGER NOT NULL DEFAULT 0,
+    audio_file TEXT,
+    cached INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+_COLUMNS = {"status", "segments_done", "segments_total", "audio_file", "cached", "error", "result"}
+
+
+class JobStore:
+    """
+    SQLite-backed record of generation jobs
+
+    Each job keeps its original request so queued or interrupted work can be
+    resumed after a restart. Calls are blocking; JobManager runs them on a
+    single writer thread.
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "result" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN result TEXT")
+
+    def create(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, request, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(request), now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def update(
+        self,
+        job_id: str,
+        only_if: Optional[Tuple[str, ...]] = None,
+        **fields
+    ) -> Optional[Dict[str, Any]]:
+        """Set job fields, optionally only while the job is in one of the `only_if` states"""
+        unknown = set(fields) - _COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        query = f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ?"
+        params = [*fields.values(), time.time(), job_id]
+        if only_if:
+            query += f" AND status IN ({', '.join('?' * len(only_if))})"
+            params.extend(only_if)
+        with self._lock, self._conn:
+            self._conn.execute(query, params)
+        return self.get(job_id)
+
+    def claim(self, job_id: str) -> bool:
+        """Mark a queued job running; False if another worker or a cancel got there first"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def list_unfinished(self) -> List[Dict[str, Any]]:
+        """Queued and running jobs, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", UNFINISHED
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["cached"] = bool(job["cached"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+class JobManager:
+    """
+    Runs generation jobs in the background
+
+    Jobs are persisted before they are accepted and executed with at most
+    `max_concurrent` running at a time. `execute` returns the output file,
+    whether it came from cache and an optional JSON-able result. Unfinished jobs are picked up again by
+    start(), so work queued before a restart is not lost. A running job checks
+    its stored status every `cancel_poll_interval` seconds and stops once it
+    reads cancelled, so a cancel made through another worker process stops it too.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        execute: Callable[
+            [Dict[str, Any], ProgressCallback],
+            Awaitable[Tuple[Path, bool, Optional[Dict[str, Any]]]]
+        ],
+        max_concurrent: int = 2,
+        max_pending: int = 1000,
+        cancel_poll_interval: float = 1.0
+    ):
+        self.store = store
+        self.execute = execute
+        self.max_pending = max_pending
+        self.cancel_poll_interval = cancel_poll_interval
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # One writer thread keeps SQLite updates off the event loop and in order
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+
+    async def start(self, resume: bool = True):
+        """
+        Resume jobs left queued or running by a previous process
+
+        With several worker processes sharing the store, only one of them
+        should resume, since the others' running jobs look unfinished too.
+        """
+        if not resume:
+            return
+        for job in await self._call(self.store.list_unfinished):
+            if job["status"] == RUNNING:
+                job = await self._call(self.store.update, job["id"], status=QUEUED)
+            self._launch(job)
+        if self._tasks:
+            logger.info(f"Resumed {len(self._tasks)} unfinished jobs")
+
+    async def close(self):
+        """Stop running jobs without changing their stored status"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._writer.submit(self.store.close)
+        self._writer.shutdown(wait=True)
+
+    async def submit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if len(self._tasks) >= self.max_pending:
+            raise CapacityError(f"Job queue is full ({len(self._tasks)} pending)", retry_after=60)
+        job = await self._call(self.store.create, request)
+        self._launch(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self.store.get, job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job; finished jobs are returned unchanged"""
+        job = await self.get(job_id)
+        if job is None or job["status"] not in UNFINISHED:
+            return job
+        job = await self._call(self.store.update, job_id, only_if=UNFINISHED, status=CANCELLED)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": len(self._tasks), "maxPending": self.max_pending}
+
+    def _launch(self, job: Dict[str, Any]):
+        task = asyncio.ensure_future(self._run(job["id"], job["request"]))
+        self._tasks[job["id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["id"], None))
+
+    async def _run(self, job_id: str, request: Dict[str, Any]):
+        def progress(done: int, total: int):
+            try:
+                self._writer.submit(self.store.update, job_id, segments_done=done, segments_total=total)
+            except RuntimeError:
+                pass  # store already closed during shutdown
+
+        async with self._semaphore:
+            if not await self._call(self.store.claim, job_id):
+                return
+            watcher = asyncio.ensure_future(self._watch_cancel(job_id, asyncio.current_task()))
+            try:
+                await self._execute(job_id, request, progress)
+            finally:
+                watcher.cancel()
+
+    async def _execute(self, job_id: str, request: Dict[str, Any], progress: ProgressCallback):
+        try:
+            while True:
+                try:
+                    output_path, cached, result = await self.execute(request, progress)
+                    break
+                except CapacityError as e:
+                    # Jobs wait for capacity instead of failing
+                    await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            await self._call(
+                self.store.update, job_id, only_if=(RUNNING,), status=FAILED, error=str(e)
+            )
+            return
+
+        job = await self._call(
+            self.store.update, job_id, only_if=(RUNNING,),
+            status=COMPLETED, audio_file=output_path.name, cached=int(cached),
+            result=json.dumps(result) if result is not None else None
+        )
+        if job is not None and job["status"] != COMPLETED:
+            logger.info(f"Job {job_id} was {job['status']} before it finished; result discarded")
+
+    async def _watch_cancel(self, job_id: str, task: asyncio.Task):
+        """Cancel `task` once the stored job is cancelled, possibly by another worker"""
+        while True:
+            await asyncio.sleep(self.cancel_poll_interval)
+            job = await self._call(self.store.get, job_id)
+            if job is None or job["status"] == CANCELLED:
+                task.cancel()
+                return
+
+    async def _call(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, lambda: func(*args, **kwargs))
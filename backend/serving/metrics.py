@@ -0,0 +1,214 @@
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .timing import StageTimings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans phoneme cache hits up to multi-minute Higgs generations
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATE_BUCKETS = (10, 25, 50, 75, 100, 150, 200, 300, 500, 1000)
+RTF_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10)
+
+LabelValues = Tuple[str, ...]
+
+
+@dataclass
+class MetricFamily:
+    name: str
+    type: str
+    help: str
+    samples: List[Tuple[str, Dict[str, str], float]] = field(default_factory=list)
+
+    def add(self, value: float, suffix: str = "", **labels: str) -> "MetricFamily":
+        self.samples.append((self.name + suffix, labels, value))
+        return self
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, "counter", self.help)
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                family.add(value, **dict(zip(self.labelnames, key)))
+        return family
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), sum
+        self._series: Dict[LabelValues, Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._series[key] = (counts, total + value)
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, "histogram", self.help)
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                family.add(cumulative, "_bucket", **labels, le=_format_value(bound))
+            family.add(total, "_sum", **labels)
+            family.add(cumulative, "_count", **labels)
+        return family
+
+
+class MetricsRegistry:
+    """
+    Metrics in the Prometheus text exposition format
+
+    Counters and histograms are updated as events happen; collectors are
+    called at scrape time for values read from other components' stats().
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], Iterable[MetricFamily]]):
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        families = [metric.collect() for metric in self._metrics]
+        for collect in self._collectors:
+            families.extend(collect())
+
+        lines = []
+        for family in families:
+            lines.append(f"# HELP {family.name} {_escape(family.help, quote=False)}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            for name, labels, value in family.samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class ServingMetrics:
+    """The server's generation metrics, fed from each request's StageTimings"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        self.requests = self.registry.counter(
+            "tts_generation_requests_total",
+            "Generation requests by outcome (generated, cached, failed)",
+            ["model", "outcome"]
+        )
+        self.stage_seconds = self.registry.histogram(
+            "tts_stage_duration_seconds",
+            "Wall time per generation stage and request",
+            ["model", "stage"]
+        )
+        self.tokens = self.registry.counter(
+            "tts_generated_tokens_total",
+            "Speech tokens produced by the backbone",
+            ["model"]
+        )
+        self.tokens_per_second = self.registry.histogram(
+            "tts_tokens_per_second",
+            "Speech tokens per second of backbone time, per request",
+            ["model"],
+            RATE_BUCKETS
+        )
+        self.audio_seconds = self.registry.counter(
+            "tts_generated_audio_seconds_total",
+            "Seconds of audio generated",
+            ["model"]
+        )
+        self.real_time_factor = self.registry.histogram(
+            "tts_real_time_factor",
+            "Audio seconds per wall second of synthesis, per request",
+            ["model"],
+            RTF_BUCKETS
+        )
+
+    def observe_generation(self, model: str, timings: StageTimings, audio_seconds: float):
+        """Record a fresh generation's stages, token rate and real-time factor"""
+        self.requests.inc(model=model, outcome="generated")
+        for stage, seconds in timings.stages().items():
+            self.stage_seconds.observe(seconds, model=model, stage=stage)
+
+        tokens = timings.counter("tokens")
+        if tokens:
+            self.tokens.inc(tokens, model=model)
+            backbone_seconds = timings.seconds("backbone")
+            if backbone_seconds > 0:
+                self.tokens_per_second.observe(tokens / backbone_seconds, model=model)
+
+        self.audio_seconds.inc(audio_seconds, model=model)
+        synthesis_seconds = timings.seconds("synthesis")
+        if synthesis_seconds > 0:
+            self.real_time_factor.observe(audio_seconds / synthesis_seconds, model=model)
+
+    def observe_outcome(self, model: str, outcome: str):
+        self.requests.inc(model=model, outcome=outcome)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+def _escape(value: str, quote: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quote else value
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
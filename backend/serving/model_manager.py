@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+
+from .concurrency import CapacityError
+from .timing import span
+
+logger = logging.getLogger(__name__)
+
+UNLOADED = "unloaded"
+LOADING = "loading"
+LOADED = "loaded"
+UNLOADING = "unloading"
+
+# A model that failed to load is not retried for this long; requests fail fast
+LOAD_RETRY_SECONDS = 30
+# Retry-After when every resident model is busy and the budget is exhausted
+MEMORY_RETRY_AFTER = 5
+
+
+class ModelLoadError(Exception):
+    """Raised when a model cannot be loaded"""
+
+
+class _Model:
+    def __init__(self, model_id: str, adapter: Any, memory_bytes: int, pinned: bool = False):
+        self.model_id = model_id
+        self.adapter = adapter
+        self.memory_bytes = memory_bytes
+        self.pinned = pinned
+        self.state = UNLOADED
+        self.users = 0
+        self.last_used = 0.0
+        self.lock = asyncio.Lock()
+        self.error: Optional[str] = None
+        self.failed_at = 0.0
+        self.loads = 0
+
+
+class ModelManager:
+    """
+    Loads adapters on first use and unloads the ones nobody is using
+
+    Each model declares its resident size. Before a model loads, idle models
+    are unloaded, least recently used first, until it fits in `budget_bytes`
+    (None for no limit).
+    A background sweep unloads models idle for longer than `idle_ttl`.
+    Models inside `use()` are never unloaded.
+    Pinned models hold their memory whether loaded or not (e.g. weights
+    preloaded before forking), so they always count against the budget and
+    are never unloaded.
+    """
+
+    def __init__(self, budget_bytes: Optional[int] = None, idle_ttl: float = 0, sweep_interval: float = 60):
+        self.budget_bytes = budget_bytes
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        # Least recently used first
+        self._models: "OrderedDict[str, _Model]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.unloads = 0
+
+    def register(self, model_id: str, adapter: Any, memory_bytes: int = 0, pinned: bool = False):
+        """Manage an adapter; one that is already initialized counts as loaded"""
+        model = _Model(model_id, adapter, memory_bytes, pinned)
+        if adapter.is_initialized():
+            model.state = LOADED
+            model.last_used = time.monotonic()
+        self._models[model_id] = model
+
+    def __contains__(self, model_id: str) -> bool:
+        return model_id in self._models
+
+    async def start(self, preload: Iterable[str] = ()):
+        """Start the idle sweeper and load `preload` models in the background"""
+        if self._sweeper is None and self.idle_ttl > 0 and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+        for model_id in preload:
+            if model_id in self._models:
+                asyncio.create_task(self._preload(model_id))
+
+    async def close(self):
+        """Stop the sweeper; adapters are shut down by their owner"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    @asynccontextmanager
+    async def use(self, model_id: str) -> AsyncIterator[Any]:
+        """Hold a model loaded for the duration of the block, loading it if needed"""
+        model = self._models[model_id]
+        model.users += 1
+        try:
+            await self._ensure_loaded(model)
+            self._touch(model)
+            yield model.adapter
+        finally:
+            model.users -= 1
+            self._touch(model)
+
+    async def unload(self, model_id: str) -> bool:
+        """Unload a model now unless it is in use; returns whether it was unloaded"""
+        model = self._models[model_id]
+        async with model.lock:
+            if model.state != LOADED or model.users > 0 or model.pinned:
+                return False
+            await self._unload(model)
+            return True
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Unload models idle longer than the TTL; returns how many were unloaded"""
+        if self.idle_ttl <= 0:
+            return 0
+        now = time.monotonic() if now is None else now
+        idle = [
+            model for model in self._models.values()
+            if model.state == LOADED and model.users == 0 and not model.pinned
+            and now - model.last_used > self.idle_ttl
+        ]
+        unloaded = 0
+        for model in idle:
+            if await self.unload(model.model_id):
+                logger.info(f"Unloaded {model.model_id} after {self.idle_ttl:g}s idle")
+                unloaded += 1
+        return unloaded
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budgetBytes": self.budget_bytes,
+            "residentBytes": self._resident_bytes(),
+            "unloads": self.unloads,
+            "models": {
+                model.model_id: {
+                    "state": model.state,
+                    "users": model.users,
+                    "memoryBytes": model.memory_bytes,
+                    "pinned": model.pinned,
+                    "loads": model.loads,
+                    "error": model.error
+                }
+                for model in self._models.values()
+            }
+        }
+
+    async def _ensure_loaded(self, model: _Model):
+        # Any other state means a transition may be running; wait for it on the lock
+        if model.state == LOADED:
+            return
+        async with model.lock:
+            if model.state == LOADED:
+                return
+            if model.error is not None and time.monotonic() - model.failed_at < LOAD_RETRY_SECONDS:
+                raise ModelLoadError(f"Model {model.model_id} failed to load: {model.error}")
+
+            # Reserve the memory before loading so concurrent loads see it
+            model.state = LOADING
+            try:
+                await self._make_room(model)
+                started = time.monotonic()
+                with span("load"):
+                    await model.adapter.initialize()
+            except CapacityError:
+                model.state = UNLOADED
+                raise
+            except Exception as e:
+                model.state = UNLOADED
+                model.error = str(e)
+                model.failed_at = time.monotonic()
+                logger.error(f"❌ Failed to load {model.model_id}: {e}")
+                raise ModelLoadError(f"Model {model.model_id} failed to load: {e}") from e
+
+            model.state = LOADED
+            model.error = None
+            model.loads += 1
+            logger.info(f"✅ Loaded {model.model_id} in {time.monotonic() - started:.1f}s")
+
+    async def _make_room(self, model: _Model):
+        """Unload idle models, least recently used first, until `model` fits the budget"""
+        if self.budget_bytes is None:
+            return
+        excess = self._resident_bytes() - self.budget_bytes
+        for other in list(self._models.values()):
+            if excess <= 0:
+                return
+            if other is model or other.state != LOADED or other.users > 0 or other.pinned:
+                continue
+            if await self.unload(other.model_id):
+                logger.info(f"Unloaded {other.model_id} to make room for {model.model_id}")
+                excess -= other.memory_bytes
+        if excess > 0:
+            raise CapacityError(
+                f"Not enough model memory to load {model.model_id}; resident models are busy or pinned",
+                retry_after=MEMORY_RETRY_AFTER
+            )
+
+    async def _unload(self, model: _Model):
+        # Set before awaiting, so use() waits on the lock instead of taking a model being torn down
+        model.state = UNLOADING
+        try:
+            await model.adapter.unload()
+        finally:
+            model.state = UNLOADED
+            self.unloads += 1
+
+    async def _preload(self, model_id: str):
+        try:
+            async with self.use(model_id):
+                pass
+        except Exception as e:
+            logger.error(f"Could not preload {model_id}: {e}")
+
+    def _touch(self, model: _Model):
+        model.last_used = time.monotonic()
+        self._models.move_to_end(model.model_id)
+
+    def _resident_bytes(self) -> int:
+        return sum(
+            model.memory_bytes for model in self._models.values()
+            if model.state != UNLOADED or model.pinned
+        )
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Model sweep failed: {e}")
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import struct
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.phrases import PhraseBuffer
+from utils.audio_stream import float_to_pcm16
+
+logger = logging.getLogger(__name__)
+
+# Binary frames: frame sequence number and phrase index, then 16-bit PCM
+FRAME_HEADER = struct.Struct("<II")
+
+_END = object()
+
+Synthesize = Callable[[int, str], AsyncIterator[np.ndarray]]
+
+
+class SessionClosed(Exception):
+    """Raised to end a session, with the WebSocket close code to use"""
+
+    def __init__(self, code: int, reason: str = ""):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+class RealtimeSession:
+    """
+    Speaks text that arrives over a WebSocket in small deltas
+
+    Incoming `text` deltas are cut into phrases by a PhraseBuffer, and each
+    phrase is synthesized by `synthesize(index, text)` as soon as it is
+    complete, one phrase at a time. Audio goes back as binary frames headed
+    by FRAME_HEADER; sequence numbers increase across the whole session.
+    `flush` speaks the buffered text without waiting for a boundary,
+    `cancel` drops buffered and queued text and stops the phrase being
+    spoken, and `end` finishes the queue and closes.
+    """
+
+    def __init__(
+        self,
+        websocket: Any,
+        synthesize: Synthesize,
+        phrases: PhraseBuffer,
+        max_queued: int = 32
+    ):
+        self.websocket = websocket
+        self.synthesize = synthesize
+        self.phrases = phrases
+        self.max_queued = max_queued
+        self._queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        self._speaking: Optional[asyncio.Task] = None
+        self._next_phrase = 0
+        self._sequence = 0
+
+    async def run(self):
+        """Serve the session until the client ends it or disconnects"""
+        speaker = asyncio.create_task(self._speak_queue())
+        try:
+            await self._read_messages(speaker)
+        finally:
+            speaker.cancel()
+            if self._speaking is not None:
+                self._speaking.cancel()
+            await asyncio.gather(speaker, return_exceptions=True)
+
+    async def _read_messages(self, speaker: asyncio.Task):
+        receiving = None
+        while True:
+            receiving = receiving or asyncio.create_task(self.websocket.receive_text())
+            done, _ = await asyncio.wait({receiving, speaker}, return_when=asyncio.FIRST_COMPLETED)
+            if speaker in done:
+                # `end` was handled and everything has been sent
+                receiving.cancel()
+                speaker.result()
+                return
+            raw = receiving.result()
+            receiving = None
+
+            try:
+                message = json.loads(raw)
+                kind = message["type"]
+            except (ValueError, KeyError, TypeError):
+                await self._send({"type": "error", "message": "Messages must be JSON objects with a 'type'"})
+                continue
+
+            if kind == "text":
+                text = message.get("text")
+                if not isinstance(text, str):
+                    await self._send({"type": "error", "message": "'text' must be a string"})
+                    continue
+                for phrase in self.phrases.push(text):
+                    await self._enqueue(phrase)
+            elif kind == "flush":
+                phrase = self.phrases.flush()
+                if phrase:
+                    await self._enqueue(phrase)
+            elif kind == "cancel":
+                await self._cancel()
+            elif kind == "end":
+                phrase = self.phrases.flush()
+                if phrase:
+                    await self._enqueue(phrase)
+                self._queue.put_nowait(_END)
+            else:
+                await self._send({"type": "error", "message": f"Unknown message type '{kind}'"})
+
+    async def _enqueue(self, text: str):
+        if self._queue.qsize() >= self.max_queued:
+            raise SessionClosed(1008, "Too much text queued ahead of the audio")
+        index = self._next_phrase
+        self._next_phrase += 1
+        self._queue.put_nowait((index, text))
+
+    async def _cancel(self):
+        self.phrases.clear()
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        speaking = self._speaking
+        if speaking is not None and not speaking.done():
+            speaking.cancel()
+            await asyncio.gather(speaking, return_exceptions=True)
+        # Nothing from the dropped phrases is sent after this
+        await self._send({"type": "cancelled", "nextPhrase": self._next_phrase})
+
+    async def _speak_queue(self):
+        while True:
+            item = await self._queue.get()
+            if item is _END:
+                await self._send({"type": "done", "phrases": self._next_phrase})
+                return
+            index, text = item
+            self._speaking = asyncio.create_task(self._speak(index, text))
+            # wait() rather than await, so a cancelled phrase does not end the loop
+            await asyncio.wait({self._speaking})
+            self._speaking = None
+
+    async def _speak(self, index: int, text: str):
+        await self._send({"type": "phrase", "phrase": index, "text": text})
+        samples = 0
+        try:
+            # aclosing() releases the synthesis slot as soon as a cancel lands
+            async with aclosing(self.synthesize(index, text)) as waveforms:
+                async for waveform in waveforms:
+                    pcm = float_to_pcm16(waveform)
+                    await self.websocket.send_bytes(FRAME_HEADER.pack(self._sequence, index) + pcm)
+                    self._sequence += 1
+                    samples += len(pcm) // 2
+        except Exception as e:
+            logger.error(f"Realtime phrase {index} failed: {e}")
+            await self._send({"type": "error", "phrase": index, "message": str(e)})
+            return
+        await self._send({"type": "phraseDone", "phrase": index, "samples": samples})
+
+    async def _send(self, message: Dict[str, Any]):
+        await self.websocket.send_text(json.dumps(message))
+
+
+def parse_start(raw: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """The client's first message, or an error describing what is wrong with it"""
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return {}, "The first message must be JSON"
+    if not isinstance(message, dict) or message.get("type") != "start":
+        return {}, "The first message must have type 'start'"
+    for field in ("model", "voice"):
+        if not isinstance(message.get(field), str):
+            return {}, f"'start' needs a '{field}'"
+    if not isinstance(message.get("settings", {}), dict):
+        return {}, "'settings' must be an object"
+    return message, None
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    """One parsed version of models_config.json"""
+
+    models: Dict[str, Dict[str, Any]]
+    # Content hash of the file, so identical rewrites are not a new version
+    digest: str
+    generation: int
+    # (mtime_ns, size) of the file this was read from
+    stat: Tuple[int, int]
+
+
+class ModelRegistry:
+    """
+    models_config.json, reloaded when the file changes
+
+    A reload parses the whole file before swapping the snapshot in with one
+    assignment, so readers see either the old config or the new one, never a
+    mix. A file that does not parse (e.g. caught mid-write) is ignored and
+    the current snapshot stays until the next check.
+    """
+
+    def __init__(self, path: Path, reload_interval: float = 2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._listeners: List[Callable[[RegistrySnapshot, RegistrySnapshot], None]] = []
+        self._lock = threading.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+        self.reloads = 0
+        # Stat of a version that failed to load, so it is reported once
+        self._failed_stat: Optional[Tuple[int, int]] = None
+        self._snapshot = self._read(generation=1)
+
+    @property
+    def snapshot(self) -> RegistrySnapshot:
+        return self._snapshot
+
+    @property
+    def models(self) -> Dict[str, Dict[str, Any]]:
+        return self._snapshot.models
+
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    def get(self, model_id: str) -> Optional[Dict[str, Any]]:
+        return self._snapshot.models.get(model_id)
+
+    def on_reload(self, listener: Callable[[RegistrySnapshot, RegistrySnapshot], None]):
+        """Call `listener(old, new)` after each reload that changed the config"""
+        self._listeners.append(listener)
+
+    def reload(self) -> bool:
+        """Re-read the file if it changed on disk; returns whether the config changed"""
+        with self._lock:
+            current = self._snapshot
+            try:
+                stat = self.path.stat()
+            except OSError as e:
+                logger.warning(f"Cannot stat {self.path.name}: {e}")
+                return False
+            if (stat.st_mtime_ns, stat.st_size) in (current.stat, self._failed_stat):
+                return False
+            try:
+                snapshot = self._read(current.generation + 1)
+            except (OSError, ValueError, KeyError) as e:
+                self._failed_stat = (stat.st_mtime_ns, stat.st_size)
+                logger.warning(f"Keeping the current models config; {self.path.name} did not load: {e}")
+                return False
+            if snapshot.digest == current.digest:
+                # Touched but unchanged; remember the stat so it is not re-read
+                self._snapshot = RegistrySnapshot(
+                    current.models, current.digest, current.generation, snapshot.stat
+                )
+                return False
+            self._snapshot = snapshot
+            self.reloads += 1
+
+        logger.info(f"Reloaded {self.path.name} (generation {snapshot.generation})")
+        for listener in self._listeners:
+            try:
+                listener(current, snapshot)
+            except Exception:
+                logger.exception("Models config reload listener failed")
+        return True
+
+    async def start(self):
+        """Check the file for changes every `reload_interval` seconds"""
+        if self._watcher is None and self.reload_interval > 0:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def close(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            self.reload()
+
+    def _read(self, generation: int) -> RegistrySnapshot:
+        # Stat before reading, so a write landing in between is picked up next time
+        stat = self.path.stat()
+        raw = self.path.read_bytes()
+        models = json.loads(raw)["models"]
+        if not isinstance(models, dict):
+            raise ValueError("'models' must be an object")
+        return RegistrySnapshot(
+            models=models,
+            digest=hashlib.sha256(raw).hexdigest(),
+            generation=generation,
+            stat=(stat.st_mtime_ns, stat.st_size)
+        )
+
+
+class CatalogCache:
+    """
+    Serialized JSON bodies of catalog responses and their ETags
+
+    Each body is rebuilt only when the `version` passed with it changes, so
+    repeated requests for an unchanged catalog cost a dict lookup.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Hashable, bytes, str]] = {}
+
+    def get(self, key: str, version: Hashable, build: Callable[[], Any]) -> Tuple[bytes, str]:
+        """(body, etag) for `key`, calling `build()` for the payload on a version change"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1], entry[2]
+        body = json.dumps(build(), separators=(",", ":")).encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self._entries[key] = (version, body, etag)
+        return body, etag
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .artifact_store import ArtifactStore
+
+KEY_LENGTH = 32
+CACHE_FILE_PATTERN = re.compile(rf"^[a-z0-9]+_([0-9a-f]{{{KEY_LENGTH}}})\.wav$")
+
+
+class _InFlight:
+    """A generation shared by every concurrent request for the same key"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SynthesisCache:
+    """
+    Content-addressed cache of generated audio
+
+    Outputs are stored in the artifact store as `<prefix>_<key>.wav`, where
+    the prefix comes from the model id and the key hashes the normalized
+    request, so the store's quota and TTL bound their lifetime. Hits are
+    resolved by name in the store, so worker processes sharing its directory
+    share the cache. Concurrent identical requests within a process share a
+    single generation.
+    """
+
+    def __init__(self, store: ArtifactStore):
+        self.store = store
+        self._inflight: Dict[str, _InFlight] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(
+        model: str,
+        voice: str,
+        text: str,
+        settings: Dict[str, Any],
+        seed: Optional[int] = None,
+        postprocess: Optional[List[Any]] = None
+    ) -> str:
+        """Hash a normalized generation request into a cache key"""
+        normalized = {
+            "model": model,
+            "voice": voice,
+            "text": " ".join(text.split()),
+            "settings": settings,
+            "seed": seed
+        }
+        # Only present when used, so keys of unprocessed outputs stay the same
+        if postprocess:
+            normalized["postprocess"] = postprocess
+        payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:KEY_LENGTH]
+
+    @staticmethod
+    def file_name(model: str, key: str) -> str:
+        """Store name of a cached output, e.g. `neutts_<key>.wav` for neutts-air"""
+        prefix = re.sub(r"[^a-z0-9]", "", model.split("-", 1)[0].lower()) or "tts"
+        return f"{prefix}_{key}.wav"
+
+    @staticmethod
+    def key_for_file(path: Path) -> Optional[str]:
+        """Cache key encoded in a file name, or None for uncached outputs"""
+        match = CACHE_FILE_PATTERN.match(path.name)
+        return match.group(1) if match else None
+
+    def lookup(self, model: str, key: str) -> Optional[Path]:
+        artifact = self.store.lookup(self.file_name(model, key))
+        return artifact.path if artifact is not None else None
+
+    async def get_or_generate(
+        self,
+        model: str,
+        key: str,
+        generate: Callable[[], Awaitable[Path]]
+    ) -> Tuple[Path, bool]:
+        """
+        Return the cached output for a key, generating it at most once
+
+        Args:
+            model: Model id the output is generated with
+            key: Cache key from make_key()
+            generate: Coroutine factory producing a fresh output file
+
+        Returns:
+            Output path and whether it was served without a new generation
+        """
+        path = self.lookup(model, key)
+        if path is not None:
+            self.hits += 1
+            return path, True
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            self.misses += 1
+            inflight = _InFlight(asyncio.ensure_future(self._generate_and_store(model, key, generate)))
+            self._inflight[key] = inflight
+            inflight.task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            shared = False
+        else:
+            self.coalesced += 1
+            shared = True
+
+        inflight.waiters += 1
+        try:
+            return await asyncio.shield(inflight.task), shared
+        except asyncio.CancelledError:
+            # Only abandon the generation once nobody is waiting for it
+            if inflight.waiters == 1 and not inflight.task.done():
+                inflight.task.cancel()
+            raise
+        finally:
+            inflight.waiters -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": sum(1 for name in self.store.names() if self.key_for_file(Path(name))),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight)
+        }
+
+    async def _generate_and_store(self, model: str, key: str, generate: Callable[[], Awaitable[Path]]) -> Path:
+        output_path = await generate()
+        artifact = self.store.add(output_path, name=self.file_name(model, key))
+        return artifact.path
@@ -0,0 +1,97 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class StageTimings:
+    """
+    Wall time per stage of one request, plus counters such as generated tokens
+
+    Stages may repeat (one per segment) and may overlap when a model pipelines
+    them, so their sum can exceed the request's total time.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[float, int]] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            total, count = self._stages.get(stage, (0.0, 0))
+            self._stages[stage] = (total + seconds, count + 1)
+
+    def count(self, name: str, amount: float):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + amount
+
+    def seconds(self, stage: str) -> float:
+        return self._stages.get(stage, (0.0, 0))[0]
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, 0.0)
+
+    def stages(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: total for stage, (total, _) in self._stages.items()}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self, **descriptions: str) -> str:
+        """`Server-Timing` header value: one metric per stage plus `total`, in milliseconds"""
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages().items()]
+        parts += [f'{name};desc="{description}"' for name, description in descriptions.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: contextvars.ContextVar[Optional[StageTimings]] = contextvars.ContextVar(
+    "stage_timings", default=None
+)
+
+
+@contextmanager
+def collect(timings: Optional[StageTimings] = None) -> Iterator[StageTimings]:
+    """
+    Gather stage timings for the code inside the block
+
+    Spans recorded in this context, including on executor threads that run in
+    a copy of it (see TTSAdapter.run_blocking), are added to `timings`.
+    """
+    timings = timings if timings is not None else StageTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # an abandoned async generator being closed from another context
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block as `stage` of the current request, if one is collecting"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - start)
+
+
+def record_stage(stage: str, seconds: float, details: Optional[Dict[str, Any]] = None):
+    """Stage hook for model code that times itself, e.g. `NeuTTSAir.stage_hook`"""
+    timings = _current.get()
+    if timings is None:
+        return
+    timings.add(stage, seconds)
+    for name, amount in (details or {}).items():
+        timings.count(name, amount)
@@ -0,0 +1,75 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+from utils.audio_formats import AUDIO_FORMATS, transcode
+
+from .artifact_store import Artifact, ArtifactStore
+
+
+class Transcoder:
+    """
+    Encodes stored audio into other output formats
+
+    Each variant is encoded once on a worker thread and stored in the
+    artifact store next to its source (`<stem>.<ext>` in the same shard).
+    Concurrent requests for the same variant share one encode.
+    """
+
+    def __init__(self, store: ArtifactStore, max_workers: int = 2):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcode")
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.transcoded = 0
+
+    @staticmethod
+    def variant_name(name: str, format_id: str) -> str:
+        return Path(name).stem + AUDIO_FORMATS[format_id].extension
+
+    async def variant(self, name: str, format_id: str) -> Artifact:
+        """
+        Stored artifact `name` in the given format
+
+        Args:
+            name: Source artifact name
+            format_id: Key of AUDIO_FORMATS
+
+        Returns:
+            The source itself when it already has that format, else the variant
+        """
+        source = self.store.lookup(name)
+        if source is None:
+            raise FileNotFoundError(f"Audio file {name} not found")
+
+        variant_name = self.variant_name(name, format_id)
+        if variant_name == name:
+            return source
+
+        existing = self.store.lookup(variant_name)
+        if existing is not None:
+            return existing
+
+        task = self._inflight.get(variant_name)
+        if task is None:
+            task = asyncio.ensure_future(self._transcode(source, variant_name, format_id))
+            self._inflight[variant_name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(variant_name, None))
+        return await asyncio.shield(task)
+
+    async def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"transcoded": self.transcoded, "inflight": len(self._inflight)}
+
+    async def _transcode(self, source: Artifact, variant_name: str, format_id: str) -> Artifact:
+        staging_path = self.store.root / f"{variant_name}.part"
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, transcode, source.path, staging_path, format_id)
+        except BaseException:
+            staging_path.unlink(missing_ok=True)
+            raise
+        self.transcoded += 1
+        return self.store.add(staging_path, name=variant_name)
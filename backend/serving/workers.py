@@ -0,0 +1,174 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks on the workers, and before the first memory report
+POLL_SECONDS = 0.5
+REPORT_DELAY_SECONDS = 10
+# A worker that exits sooner than this after starting is not restarted again
+MIN_UPTIME_SECONDS = 5
+
+_MEMORY_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "private",
+    "Private_Dirty": "private"
+}
+
+
+@dataclass(frozen=True)
+class WorkerInfo:
+    """This process's place among the serving workers"""
+
+    index: int = 0
+    count: int = 1
+    # The primary worker does startup housekeeping such as resuming jobs
+    primary: bool = True
+
+
+_worker = WorkerInfo()
+
+
+def current_worker() -> WorkerInfo:
+    return _worker
+
+
+def memory_usage(pid: Optional[int] = None) -> Optional[Dict[str, int]]:
+    """
+    Resident, proportional, shared and private memory of a process, in bytes
+
+    Shared pages are counted in full by every process mapping them, while
+    `pss` splits them between those processes, so the workers' PSS sums to
+    the memory they really use. None where /proc is not available.
+    """
+    path = Path("/proc") / (str(pid) if pid is not None else "self") / "smaps_rollup"
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return None
+    usage = {"rss": 0, "pss": 0, "shared": 0, "private": 0}
+    for line in lines:
+        field, _, value = line.partition(":")
+        if field in _MEMORY_FIELDS:
+            usage[_MEMORY_FIELDS[field]] += int(value.split()[0]) * 1024
+    return usage
+
+
+def format_memory(usage: Optional[Dict[str, int]]) -> str:
+    if usage is None:
+        return "memory usage unavailable"
+    return ", ".join(f"{name} {value / 1024 ** 2:.0f} MB" for name, value in usage.items())
+
+
+def serve_forked(
+    app: Any,
+    host: str,
+    port: int,
+    workers: int,
+    preload: Callable[[], None],
+    worker_init: Optional[Callable[[WorkerInfo], None]] = None,
+    log_level: str = "info"
+):
+    """
+    Serve `app` from several forked uvicorn workers sharing one listening socket
+
+    `preload` runs in this process before any worker is forked, so whatever it
+    loads (model weights) is shared copy-on-write by all workers instead of
+    being loaded by each. It must not leave threads running. Workers that
+    crash are forked again from the same parent and share the same pages.
+    `worker_init` runs first thing in each worker.
+    """
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    started = time.monotonic()
+    preload()
+    # Keep the garbage collector from writing to preloaded objects' pages
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        f"Preloaded in {time.monotonic() - started:.1f}s; parent {format_memory(memory_usage())}"
+    )
+
+    def run_worker(info: WorkerInfo):
+        global _worker
+        _worker = info
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        if worker_init is not None:
+            worker_init(info)
+        server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+        server.run(sockets=[sock])
+
+    children: Dict[int, WorkerInfo] = {}
+    started_at: Dict[int, float] = {}
+
+    def fork(info: WorkerInfo):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(info)
+            except BaseException:
+                logger.exception(f"Worker {info.index} failed")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = info
+        started_at[pid] = time.monotonic()
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for index in range(workers):
+        fork(WorkerInfo(index=index, count=workers, primary=index == 0))
+    logger.info(f"Serving on http://{host}:{port} with {workers} workers: {', '.join(map(str, children))}")
+
+    report_at = time.monotonic() + REPORT_DELAY_SECONDS
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if report_at is not None and time.monotonic() >= report_at:
+                report_at = None
+                for child, info in children.items():
+                    logger.info(f"Worker {info.index} (pid {child}): {format_memory(memory_usage(child))}")
+            time.sleep(POLL_SECONDS)
+            continue
+
+        info = children.pop(pid)
+        uptime = time.monotonic() - started_at.pop(pid)
+        if stopping:
+            continue
+        logger.error(f"Worker {info.index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}")
+        if uptime < MIN_UPTIME_SECONDS:
+            logger.error(f"Worker {info.index} failed on startup; not restarting it")
+            continue
+        fork(WorkerInfo(index=info.index, count=workers, primary=False))
+
+    sock.close()
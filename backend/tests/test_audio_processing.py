@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from utils.audio_processing import integrated_loudness, normalize_loudness, resample
+
+
+def sine(frequency, seconds, sample_rate, amplitude=1.0):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+@pytest.mark.parametrize("sample_rate", [24000, 44100, 48000])
+def test_full_scale_sine_reads_minus_3_lufs(sample_rate):
+    # BS.1770's reference: a full-scale 997 Hz sine is -3.01 LUFS
+    assert integrated_loudness(sine(997, 3, sample_rate), sample_rate) == pytest.approx(-3.01, abs=0.05)
+
+
+def test_loudness_follows_gain():
+    quiet = integrated_loudness(sine(997, 3, 48000, amplitude=0.1), 48000)
+    assert quiet == pytest.approx(-23.01, abs=0.05)
+
+
+def test_silence_is_gated_out():
+    tone = sine(997, 3, 48000)
+    padded = np.concatenate([tone, np.zeros(3 * 48000, dtype=np.float32)])
+    # An ungated mean would drop by 3 dB
+    assert integrated_loudness(padded, 48000) == pytest.approx(integrated_loudness(tone, 48000), abs=0.5)
+    assert integrated_loudness(np.zeros(48000, dtype=np.float32), 48000) == float("-inf")
+    assert integrated_loudness(np.zeros(0, dtype=np.float32), 48000) == float("-inf")
+
+
+def test_clip_shorter_than_one_block():
+    assert integrated_loudness(sine(997, 0.1, 48000), 48000) == pytest.approx(-3.01, abs=0.2)
+
+
+def test_normalize_reaches_target():
+    output, sample_rate = normalize_loudness(sine(997, 3, 48000, amplitude=0.01), 48000, lufs=-16.0, peakDb=-1.0)
+    assert sample_rate == 48000
+    assert integrated_loudness(output, sample_rate) == pytest.approx(-16.0, abs=0.05)
+
+
+def test_normalize_respects_peak_ceiling():
+    output, _ = normalize_loudness(sine(997, 3, 48000, amplitude=0.01), 48000, lufs=0.0, peakDb=-6.0)
+    assert np.max(np.abs(output)) == pytest.approx(10 ** (-6.0 / 20), rel=1e-3)
+
+
+@pytest.mark.parametrize("source, target", [(24000, 16000), (24000, 48000), (22050, 16000)])
+def test_resample_keeps_length_and_waveform(source, target):
+    output, sample_rate = resample(sine(440, 1, source), source, target)
+    assert sample_rate == target
+    assert output.dtype == np.float32
+    assert len(output) == round(source * target / source)
+    expected = sine(440, 1, target)
+    # Away from the edges the tone is reproduced almost exactly
+    margin = target // 100
+    assert np.max(np.abs(output - expected)[margin:-margin]) < 1e-3
+
+
+def test_resample_removes_content_above_the_new_nyquist():
+    output, _ = resample(sine(10000, 1, 24000), 24000, 16000)
+    assert np.sqrt(np.mean(np.square(output))) < 0.01
+
+
+def test_resample_same_rate_and_empty_input():
+    waveform = sine(440, 0.1, 24000)
+    assert resample(waveform, 24000, 24000)[0] is waveform
+    empty, sample_rate = resample(np.zeros(0, dtype=np.float32), 24000, 16000)
+    assert len(empty) == 0 and sample_rate == 24000
@@ -0,0 +1,245 @@
+import asyncio
+import time
+
+import pytest
+
+from serving.concurrency import CapacityError, DeadlineError, FairShare, InferenceLimiter, client_identity
+
+
+class Harness:
+    """Queues requests on a limiter and releases them one at a time"""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.started = []
+        self.results = {}
+        self._release = {}
+        self._tasks = []
+
+    def submit(self, name, client="", cost=1.0, deadline=None):
+        self._release[name] = asyncio.Event()
+        self._tasks.append(asyncio.create_task(self._run(name, client, cost, deadline)))
+
+    async def _run(self, name, client, cost, deadline):
+        try:
+            async with self.limiter.slot(client=client, cost=cost, deadline=deadline):
+                self.started.append(name)
+                await self._release[name].wait()
+            self.results[name] = "ok"
+        except CapacityError as e:
+            self.results[name] = type(e).__name__
+
+    async def release(self, name):
+        self._release[name].set()
+        await settle()
+
+    async def drain(self):
+        for event in self._release.values():
+            event.set()
+        await asyncio.gather(*self._tasks)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_slot_is_immediate_under_the_limit():
+    async def main():
+        limiter = InferenceLimiter(max_concurrent=2)
+        harness = Harness(limiter)
+        harness.submit("a")
+        harness.submit("b")
+        await settle()
+        assert harness.started == ["a", "b"]
+        assert limiter.active == 2 and limiter.waiting == 0
+        await harness.drain()
+        assert limiter.active == 0
+
+    asyncio.run(main())
+
+
+def test_freed_slot_goes_to_the_lightest_client():
+    async def main():
+        limiter = InferenceLimiter(max_concurrent=1, initial_estimate=0.001)
+        harness = Harness(limiter)
+        harness.submit("batch-0", client="batch")
+        await settle()
+        for i in range(1, 4):
+            harness.submit(f"batch-{i}", client="batch")
+        harness.submit("interactive", client="interactive")
+        await settle()
+
+        # Clients are charged for the time they really held a slot
+        await asyncio.sleep(0.05)
+        await harness.release("batch-0")
+        assert harness.started == ["batch-0", "interactive"]
+        await harness.drain()
+        assert harness.started[2:] == ["batch-1", "batch-2", "batch-3"]
+
+    asyncio.run(main())
+
+
+def test_cheapest_request_of_a_client_goes_first():
+    async def main():
+        limiter = InferenceLimiter(max_concurrent=1)
+        harness = Harness(limiter)
+        harness.submit("running")
+        await settle()
+        harness.submit("long", cost=10)
+        harness.submit("short", cost=1)
+        harness.submit("medium", cost=5)
+        await settle()
+        await harness.drain()
+        assert harness.started == ["running", "short", "medium", "long"]
+
+    asyncio.run(main())
+
+
+def test_full_queue_evicts_from_the_heaviest_client():
+    async def main():
+        limiter = InferenceLimiter(max_concurrent=1, max_queue=3, initial_estimate=0.001)
+        harness = Harness(limiter)
+        harness.submit("running", client="a")
+        await settle()
+        harness.submit("a-small", client="a", cost=1)
+        harness.submit("a-large", client="a", cost=9)
+        harness.submit("a-medium", client="a", cost=5)
+        await settle()
+
+        harness.submit("b", client="b")
+        await settle()
+        assert harness.results == {"a-large": "CapacityError"}
+        assert limiter.evicted == 1 and limiter.waiting == 3
+
+        # The newcomer's own client is the heaviest, so it is turned away instead
+        harness.submit("a-extra", client="a")
+        await settle()
+        assert harness.results["a-extra"] == "CapacityError"
+        assert limiter.evicted == 1
+
+        await asyncio.sleep(0.05)
+        await harness.drain()
+        assert harness.started == ["running", "b", "a-small", "a-medium"]
+
+    asyncio.run(main())
+
+
+def test_deadline_that_cannot_be_met_is_rejected_up_front():
+    async def main():
+        limiter = InferenceLimiter(initial_estimate=2.0)
+        with pytest.raises(DeadlineError) as error:
+            async with limiter.slot(cost=1.0, deadline=time.monotonic() + 1.0):
+                pass
+        assert error.value.retry_after >= 1
+        assert limiter.expired == 1 and limiter.active == 0
+
+    asyncio.run(main())
+
+
+def test_queued_request_expires_at_its_deadline():
+    async def main():
+        limiter = InferenceLimiter(max_concurrent=1, initial_estimate=0.1)
+        harness = Harness(limiter)
+        harness.submit("running")
+        await settle()
+        harness.submit("hurried", deadline=time.monotonic() + 0.15)
+        harness.submit("patient")
+        await settle()
+
+        await asyncio.sleep(0.1)
+        assert harness.results == {"hurried": "DeadlineError"}
+        assert limiter.expired == 1 and limiter.waiting == 1
+        await harness.drain()
+        assert harness.started == ["running", "patient"]
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        limiter = InferenceLimiter(max_concurrent=1)
+        harness = Harness(limiter)
+        harness.submit("running")
+        await settle()
+
+        async def wait():
+            async with limiter.slot():
+                pass
+
+        waiter = asyncio.create_task(wait())
+        await settle()
+        assert limiter.waiting == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert limiter.waiting == 0
+
+        await harness.drain()
+        assert limiter.active == 0 and limiter.stats()["waitingClients"] == 0
+
+    asyncio.run(main())
+
+
+def test_estimate_learns_from_slot_time():
+    async def main():
+        limiter = InferenceLimiter(initial_estimate=10.0)
+        async with limiter.slot(cost=2.0):
+            await asyncio.sleep(0.02)
+        assert limiter.estimate(1.0) < 10.0
+        assert limiter.retry_after() >= 1
+
+    asyncio.run(main())
+
+
+def test_failed_or_cancelled_generations_do_not_move_the_estimate():
+    async def main():
+        limiter = InferenceLimiter(initial_estimate=10.0)
+        with pytest.raises(RuntimeError):
+            async with limiter.slot(cost=1.0):
+                raise RuntimeError("model failed")
+
+        async def abandoned():
+            async with limiter.slot(cost=1.0):
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(abandoned())
+        await settle()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert limiter.estimate(1.0) == 10.0
+        assert limiter.active == 0
+
+    asyncio.run(main())
+
+
+def test_release_refunds_the_estimate_charged_at_acquire():
+    async def main():
+        limiter = InferenceLimiter(max_concurrent=1, initial_estimate=1.0)
+        harness = Harness(limiter)
+        harness.submit("first", client="a", cost=100)
+        await settle()
+        assert limiter.shares.usage("a") == pytest.approx(100, rel=0.01)
+        # The estimate moves while the first request still holds its slot
+        limiter._rate = 0.01
+        await harness.drain()
+        assert limiter.shares.usage("a") < 1.0
+
+    asyncio.run(main())
+
+
+def test_fair_share_decays_and_drops_idle_clients():
+    shares = FairShare(half_life=0.05)
+    shares.charge("a", 4.0)
+    assert shares.usage("a") == pytest.approx(4.0, rel=0.1)
+    time.sleep(0.1)
+    assert shares.usage("a") < 1.5
+    shares.charge("a", -10.0)
+    assert shares.usage("a") == 0.0 and shares.clients() == 0
+
+
+def test_client_identity():
+    assert client_identity({}, "10.0.0.1") == "host:10.0.0.1"
+    assert client_identity({}, None) == "host:unknown"
+    keyed = client_identity({"X-API-Key": "secret"}, "10.0.0.1")
+    assert keyed.startswith("key:") and "secret" not in keyed
+    assert client_identity({"Authorization": "Bearer secret"}, "10.0.0.2") == keyed
@@ -0,0 +1,160 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from tts_adapters.higgs_worker_pool import HiggsWorkerPool, WorkerError
+
+STUB = Path(__file__).resolve().parent.parent / "tts_adapters" / "higgs_stub_worker.py"
+FAILING = [sys.executable, "-c", "import sys; sys.exit(3)"]
+
+
+def make_pool(*stub_args, size=1, job_timeout=10.0):
+    return HiggsWorkerPool(
+        [sys.executable, str(STUB), *stub_args],
+        size=size,
+        job_timeout=job_timeout,
+        startup_timeout=10.0,
+        health_check_interval=0
+    )
+
+
+async def wait_for_idle(pool, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while pool.stats()["idle"] < count:
+        assert time.monotonic() < deadline, pool.stats()
+        await asyncio.sleep(0.02)
+
+
+def test_submit_runs_jobs_on_spawned_workers():
+    async def scenario():
+        pool = make_pool(size=2)
+        await pool.start()
+        try:
+            results = await asyncio.gather(
+                pool.submit({"text": "first"}),
+                pool.submit({"text": "second"})
+            )
+            for header, payload in results:
+                assert header["type"] == "result"
+                assert payload[:4] == b"RIFF"
+            assert pool.stats() == {"size": 2, "alive": 2, "idle": 2, "restarts": 0, "jobs": 2}
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_job_timeout_replaces_worker():
+    async def scenario():
+        pool = make_pool("--job-delay", "2", job_timeout=0.3)
+        await pool.start()
+        try:
+            with pytest.raises(WorkerError, match="timed out"):
+                await pool.submit({"text": "slow"})
+            assert pool.restarts == 1
+            await wait_for_idle(pool, 1)
+            assert pool.stats()["alive"] == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_job_returns_worker_after_it_answers():
+    async def scenario():
+        pool = make_pool("--job-delay", "0.3")
+        await pool.start()
+        try:
+            task = asyncio.create_task(pool.submit({"text": "abandoned"}))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # The worker is still busy with the abandoned job
+            assert pool.stats()["idle"] == 0
+
+            header, _ = await pool.submit({"text": "next"})
+            assert header["type"] == "result"
+            assert pool.restarts == 0
+            assert pool.stats()["jobs"] == 2
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_crashed_worker_is_respawned():
+    async def scenario():
+        pool = make_pool("--crash-after", "1")
+        await pool.start()
+        try:
+            with pytest.raises(WorkerError, match="exited"):
+                await pool.submit({"text": "crash"})
+            assert pool.restarts == 1
+
+            # The replacement also crashes after one job, so only check it came up
+            await wait_for_idle(pool, 1)
+            assert pool.stats()["alive"] == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_respawn_retries_after_backoff():
+    async def scenario():
+        pool = make_pool("--crash-after", "1")
+        working = pool.command
+        await pool.start()
+        try:
+            pool.command = FAILING
+            with pytest.raises(WorkerError):
+                await pool.submit({"text": "crash"})
+            await asyncio.sleep(0.3)
+            assert pool.stats()["alive"] == 0
+
+            # The next attempt comes after the one second backoff
+            pool.command = working
+            started = time.monotonic()
+            await wait_for_idle(pool, 1)
+            assert time.monotonic() - started >= 0.5
+            assert pool.stats()["alive"] == 1
+            assert pool.restarts == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_start_fails_when_no_worker_comes_up():
+    async def scenario():
+        pool = HiggsWorkerPool(FAILING, size=2, startup_timeout=5.0, health_check_interval=0)
+        with pytest.raises(WorkerError, match="could start"):
+            await pool.start()
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_fails_waiting_submits():
+    async def scenario():
+        pool = make_pool("--job-delay", "1")
+        await pool.start()
+        running = asyncio.create_task(pool.submit({"text": "running"}))
+        waiting = [asyncio.create_task(pool.submit({"text": f"waiting {i}"})) for i in range(2)]
+        await asyncio.sleep(0.1)
+
+        await pool.close()
+        for task in waiting:
+            with pytest.raises(WorkerError, match="closed"):
+                await task
+        with pytest.raises(WorkerError):
+            await running
+        with pytest.raises(WorkerError, match="closed"):
+            await pool.submit({"text": "late"})
+        assert pool.stats()["alive"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,65 @@
+from utils.phrases import PhraseBuffer
+
+
+def push_all(buffer, deltas):
+    phrases = []
+    for delta in deltas:
+        phrases.extend(buffer.push(delta))
+    return phrases
+
+
+def test_sentence_waits_for_following_whitespace():
+    buffer = PhraseBuffer()
+    assert buffer.push("The weather is fine.") == []
+    assert buffer.push(" Next") == ["The weather is fine."]
+    assert buffer.flush() == "Next"
+
+
+def test_number_split_across_deltas_is_kept_whole():
+    buffer = PhraseBuffer()
+    assert push_all(buffer, ["Pi is roughly 3.", "14 and ", "a bit. "]) == ["Pi is roughly 3.14 and a bit."]
+
+
+def test_abbreviations_do_not_end_sentences():
+    buffer = PhraseBuffer()
+    phrases = push_all(buffer, ["Dr. Smith met ", "Mr. Jones, e.g. ", "at noon. Then"])
+    assert phrases == ["Dr. Smith met Mr. Jones, e.g. at noon."]
+
+
+def test_short_sentences_are_joined_up_to_min_chars():
+    buffer = PhraseBuffer(min_chars=8)
+    assert buffer.push("Hi. Hello there. ") == ["Hi. Hello there."]
+
+
+def test_line_break_ends_a_phrase():
+    buffer = PhraseBuffer()
+    assert push_all(buffer, ["A heading line", "\n", "Body"]) == ["A heading line"]
+
+
+def test_clause_cut_only_once_long_enough():
+    buffer = PhraseBuffer(clause_chars=20, max_chars=100)
+    assert buffer.push("Well, then ") == []
+    assert buffer.push("we went to the shops; and") == ["Well, then we went to the shops;"]
+    assert buffer.flush() == "and"
+
+
+def test_max_length_cut_at_last_space():
+    buffer = PhraseBuffer(clause_chars=20, max_chars=40)
+    phrases = push_all(buffer, ["one two three four five six ", "seven eight nine ten eleven twelve"])
+    assert phrases == ["one two three four five six seven eight"]
+    assert all(len(phrase) <= 40 for phrase in phrases)
+    assert buffer.flush() == "nine ten eleven twelve"
+
+
+def test_max_length_cut_without_spaces():
+    buffer = PhraseBuffer(max_chars=10)
+    assert buffer.push("abcdefghijklmno") == ["abcdefghij"]
+    assert buffer.flush() == "klmno"
+
+
+def test_clear_and_flush_empty():
+    buffer = PhraseBuffer()
+    buffer.push("Some text")
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.flush() is None
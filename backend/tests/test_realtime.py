@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import numpy as np
+
+from serving.realtime import FRAME_HEADER, RealtimeSession
+from utils.phrases import PhraseBuffer
+
+
+class FakeWebSocket:
+    """Feeds queued client messages and records what the session sends"""
+
+    def __init__(self):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.sent = []
+        self.audio = asyncio.Event()
+
+    async def receive_text(self):
+        return await self.incoming.get()
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        sequence, phrase = FRAME_HEADER.unpack_from(data)
+        self.sent.append({"type": "audio", "sequence": sequence, "phrase": phrase})
+        self.audio.set()
+
+    def client(self, **message):
+        self.incoming.put_nowait(json.dumps(message))
+
+
+def run_session(scenario, synthesize):
+    async def main():
+        websocket = FakeWebSocket()
+        session = RealtimeSession(websocket, synthesize, PhraseBuffer(min_chars=1))
+        await asyncio.wait_for(
+            asyncio.gather(session.run(), scenario(websocket)),
+            timeout=5
+        )
+        return websocket.sent
+
+    return asyncio.run(main())
+
+
+def test_phrases_are_spoken_in_order():
+    async def synthesize(index, text):
+        for _ in range(2):
+            yield np.zeros(160, dtype=np.float32)
+
+    async def scenario(websocket):
+        websocket.client(type="text", text="First one. Second")
+        websocket.client(type="end")
+
+    sent = run_session(scenario, synthesize)
+    assert [m["type"] for m in sent] == [
+        "phrase", "audio", "audio", "phraseDone",
+        "phrase", "audio", "audio", "phraseDone",
+        "done"
+    ]
+    assert [m["sequence"] for m in sent if m["type"] == "audio"] == [0, 1, 2, 3]
+    assert sent[-1] == {"type": "done", "phrases": 2}
+
+
+def test_nothing_from_dropped_phrases_after_cancel():
+    closed = []
+
+    async def synthesize(index, text):
+        try:
+            while True:
+                yield np.zeros(160, dtype=np.float32)
+                await asyncio.sleep(0.01)
+        finally:
+            closed.append(index)
+
+    async def scenario(websocket):
+        websocket.client(type="text", text="Speak this. Queued too. Buffered")
+        await websocket.audio.wait()
+        websocket.client(type="cancel")
+        websocket.client(type="end")
+
+    sent = run_session(scenario, synthesize)
+    cancelled = next(i for i, m in enumerate(sent) if m["type"] == "cancelled")
+    assert sent[cancelled]["nextPhrase"] == 2
+    assert sent[cancelled + 1:] == [{"type": "done", "phrases": 2}]
+    # The phrase being spoken was stopped and its synthesis closed; the queued one never started
+    assert closed == [0]
+    assert all(m["phrase"] == 0 for m in sent[:cancelled] if "phrase" in m)
+    assert not any(m["type"] == "phraseDone" for m in sent)
+
+
+def test_speaking_resumes_after_cancel():
+    async def synthesize(index, text):
+        while True:
+            yield np.zeros(160, dtype=np.float32)
+            if text == "New text.":
+                return
+            await asyncio.sleep(0.01)
+
+    async def scenario(websocket):
+        websocket.client(type="text", text="Old text. ")
+        await websocket.audio.wait()
+        websocket.client(type="cancel")
+        websocket.client(type="text", text="New text. ")
+        websocket.client(type="end")
+
+    sent = run_session(scenario, synthesize)
+    cancelled = next(i for i, m in enumerate(sent) if m["type"] == "cancelled")
+    after = sent[cancelled + 1:]
+    assert after[0] == {"type": "phrase", "phrase": 1, "text": "New text."}
+    assert {m["phrase"] for m in after if "phrase" in m} == {1}
+    assert after[-2:] == [{"type": "phraseDone", "phrase": 1, "samples": 160}, {"type": "done", "phrases": 2}]
+
+
+def test_failed_phrase_reports_error_and_continues():
+    async def synthesize(index, text):
+        if index == 0:
+            raise RuntimeError("boom")
+        yield np.zeros(160, dtype=np.float32)
+
+    async def scenario(websocket):
+        websocket.client(type="text", text="Bad one. Good one.")
+        websocket.client(type="end")
+
+    sent = run_session(scenario, synthesize)
+    assert {"type": "error", "phrase": 0, "message": "boom"} in sent
+    assert {"type": "phraseDone", "phrase": 1, "samples": 160} in sent
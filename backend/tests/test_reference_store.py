@@ -0,0 +1,24 @@
+import os
+
+from tts_adapters.reference_store import ReferenceCodeStore
+
+
+def test_file_keys_are_bounded_and_follow_file_changes(tmp_path):
+    store = ReferenceCodeStore(tmp_path / "codes", max_entries=2)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"voice{i}.wav"
+        path.write_bytes(bytes([i]) * 16)
+        paths.append(path)
+        store.key_for_file(path, "hello")
+    assert len(store._path_keys) == 2
+
+    key = store.key_for_file(paths[2], "hello")
+    paths[2].write_bytes(b"changed")
+    stat = paths[2].stat()
+    os.utime(paths[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    changed = store.key_for_file(paths[2], "hello")
+    assert changed != key
+    assert changed == store.compute_key(b"changed", "hello")
+    assert len(store._path_keys) == 2
@@ -1,6 +1,7 @@
 from .base_adapter import TTSAdapter
 from .higgs_adapter import HiggsAudioAdapter
 from .neutts_adapter import NeuTTSAdapter
+from .reference_store import ReferenceCodeStore
 
-__all__ = ["TTSAdapter", "HiggsAudioAdapter", "NeuTTSAdapter"]
+__all__ = ["TTSAdapter", "HiggsAudioAdapter", "NeuTTSAdapter", "ReferenceCodeStore"]
 
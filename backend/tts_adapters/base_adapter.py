@@ -1,26 +1,84 @@
+import asyncio
+import contextvars
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Any, Optional, List, Callable, AsyncIterator, Iterator
 from pathlib import Path
 
+import numpy as np
+
+from serving import InferenceLimiter
+
+_STREAM_END = object()
+
+# Typical speaking rate, for estimating how much audio a text becomes
+SPEECH_CHARACTERS_PER_SECOND = 15.0
+
 class TTSAdapter(ABC):
     """Base class for all TTS model adapters"""
     
+    sample_rate: int = 24000
+    
     def __init__(self, model_id: str, model_config: Dict[str, Any]):
         self.model_id = model_id
         self.model_config = model_config
         self.model = None
         
+        concurrency = model_config.get("concurrency", {})
+        self.limiter = InferenceLimiter(
+            max_concurrent=concurrency.get("maxConcurrent", 1),
+            max_queue=concurrency.get("maxQueue", 8),
+            # Compute seconds per second of speech until real timings come in
+            initial_estimate=concurrency.get("realTimeFactor", 1.0)
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.limiter.max_concurrent,
+            thread_name_prefix=f"{model_id}-infer"
+        )
+        
+        # Voice id -> voice; voices_generation changes whenever it is rebuilt
+        self._voice_index: Dict[str, Dict[str, Any]] = {}
+        self.voices_generation = 0
+        
     @abstractmethod
     async def initialize(self) -> bool:
         """Initialize the TTS model"""
         pass
     
+    @classmethod
+    def preload_weights(cls, model_config: Dict[str, Any]) -> List[str]:
+        """
+        Load weights that forked worker processes can share copy-on-write
+        
+        Called once in the parent process before workers are forked, so it must
+        not start threads or initialize a GPU. Returns what was preloaded.
+        """
+        return []
+    
+    async def unload(self):
+        """Release the loaded model; initialize() loads it again"""
+        self.model = None
+    
+    async def shutdown(self):
+        """Release model resources and stop the inference executor"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def run_blocking(self, func: Callable, *args, **kwargs):
+        """Run blocking model code on this adapter's inference executor"""
+        loop = asyncio.get_running_loop()
+        # A copy of the caller's context carries request-scoped state such as stage timings
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, partial(context.run, func, *args, **kwargs))
+    
     @abstractmethod
     async def generate(
         self,
         text: str,
         voice_id: str,
-        settings: Dict[str, Any]
+        settings: Dict[str, Any],
+        progress: Optional[Callable[[int, int], None]] = None
     ) -> Path:
         """
         Generate speech from text
@@ -29,12 +87,77 @@ class TTSAdapter(ABC):
             text: Text to convert to speech
             voice_id: Voice identifier
             settings: Model-specific settings
+            progress: Called on the event loop with (segments done, segments total)
             
         Returns:
             Path to generated audio file
         """
         pass
     
+    async def generate_stream(
+        self,
+        text: str,
+        voice_id: str,
+        settings: Dict[str, Any]
+    ) -> AsyncIterator[np.ndarray]:
+        """
+        Generate speech incrementally
+        
+        Adapters that can synthesize segment by segment override this. The
+        default generates the whole file and yields it as a single segment.
+        
+        Yields:
+            Mono float32 waveform segments at `sample_rate`
+        """
+        import soundfile as sf
+        
+        output_path = await self.generate(text=text, voice_id=voice_id, settings=settings)
+        waveform, _ = sf.read(str(output_path), dtype="float32", always_2d=True)
+        yield waveform.mean(axis=1)
+    
+    async def iterate_blocking(
+        self,
+        make_iterator: Callable[[threading.Event], Iterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """
+        Drive a blocking iterator on the inference executor
+        
+        Items are handed to the event loop as they are produced. The iterator
+        factory receives a cancel event that is set when the consumer stops.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancel_event = threading.Event()
+        
+        def publish(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                cancel_event.set()  # event loop already closed
+        
+        def produce():
+            try:
+                for item in make_iterator(cancel_event):
+                    publish(item)
+                    if cancel_event.is_set():
+                        break
+            except Exception as e:
+                publish(e)
+            finally:
+                publish(_STREAM_END)
+        
+        loop.run_in_executor(self.executor, contextvars.copy_context().run, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancel_event.set()
+    
     @abstractmethod
     def get_voices(self) -> List[Dict[str, Any]]:
         """Get available voices for this model"""
@@ -45,14 +168,86 @@ class TTSAdapter(ABC):
         """Get settings schema for this model"""
         pass
     
+    def estimate_cost(self, text: str, settings: Dict[str, Any]) -> float:
+        """
+        Expected seconds of speech a request produces, used to schedule it
+        
+        The limiter learns how long each second takes to generate, so only
+        the relative size of requests needs to be right.
+        """
+        return max(1, len(text.strip())) / SPEECH_CHARACTERS_PER_SECOND
+    
+    def runtime_info(self) -> Dict[str, Any]:
+        """Which weights and runtime the model was loaded with, for /health"""
+        return {}
+    
+    def watermarker(self) -> Optional[Callable[[np.ndarray, int], np.ndarray]]:
+        """
+        The model's output watermark, applied by the server's post-processing
+        
+        Adapters that return one leave it out of generate() and
+        generate_stream(), so it runs off the inference executor.
+        """
+        return None
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit and miss counts of the model's internal caches, by cache name"""
+        return {}
+    
     def is_initialized(self) -> bool:
         """Check if model is initialized"""
         return self.model is not None
     
+    async def add_voice(
+        self,
+        voice_id: str,
+        audio_bytes: bytes,
+        transcript: str,
+        metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Enroll a new voice from a reference recording
+        
+        Args:
+            voice_id: Identifier for the new voice
+            audio_bytes: Reference audio file content
+            transcript: Transcript of the reference audio
+            metadata: Display fields (name, description, gender, language)
+            
+        Returns:
+            The voice entry as listed by get_voices()
+        """
+        raise NotImplementedError(f"Model {self.model_id} does not support voice enrollment")
+    
+    def update_config(self, model_config: Dict[str, Any]):
+        """
+        Switch to a reloaded models_config.json entry
+        
+        Voices and settings take effect at once and the next load reads the
+        new config; executors and concurrency limits keep their startup values.
+        """
+        self.model_config = model_config
+        self._index_voices()
+    
+    def get_voice(self, voice_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a voice by id"""
+        if not self.voices_generation:
+            self._index_voices()
+        return self._voice_index.get(voice_id)
+    
+    def voices_version(self) -> int:
+        """Changes whenever get_voices() would return something different"""
+        if not self.voices_generation:
+            self._index_voices()
+        return self.voices_generation
+    
     def validate_voice(self, voice_id: str) -> bool:
         """Validate if voice is available"""
-        voices = self.get_voices()
-        return any(v["id"] == voice_id for v in voices)
+        return self.get_voice(voice_id) is not None
+    
+    def _index_voices(self):
+        self._voice_index = {voice["id"]: voice for voice in self.get_voices()}
+        self.voices_generation += 1
     
     def validate_settings(self, settings: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and apply defaults to settings"""
@@ -2,15 +2,23 @@ import sys
 import os
 import subprocess
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional
 import uuid
 import asyncio
 
-from .base_adapter import TTSAdapter
+from serving import span
+
+from .base_adapter import TTSAdapter, SPEECH_CHARACTERS_PER_SECOND
+from .higgs_worker_pool import HiggsWorkerPool, WorkerError
 
 # Point to the old working higgs-audio repository
 HIGGS_AUDIO_PATH = Path("/Users/riteshkanjee/Documents/dev/neurotts/higgs-audio")
 
+WORKER_DIR = Path(__file__).parent
+
+# Frame rate of the Higgs audio tokenizer; max_new_tokens caps each chunk's audio
+AUDIO_TOKENS_PER_SECOND = 25
+
 class HiggsAudioAdapter(TTSAdapter):
     """Adapter for Higgs Audio V2 model"""
     
@@ -20,23 +28,51 @@ class HiggsAudioAdapter(TTSAdapter):
         self.generation_script = HIGGS_AUDIO_PATH / "examples" / "generation.py"
         self.output_dir = Path(__file__).parent.parent / "temp" / "audio"
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.pool_config = model_config.get("workerPool", {})
+        self.pool = None
         
     async def initialize(self) -> bool:
-        """Initialize Higgs Audio model"""
-        if not self.venv_python.exists():
-            raise FileNotFoundError(f"Higgs Audio venv not found at {self.venv_python}")
+        """Start the resident Higgs Audio workers"""
+        use_stub = self.pool_config.get("stub", False)
         
-        if not self.generation_script.exists():
-            raise FileNotFoundError(f"Generation script not found at {self.generation_script}")
+        if not use_stub:
+            if not self.venv_python.exists():
+                raise FileNotFoundError(f"Higgs Audio venv not found at {self.venv_python}")
+            
+            if not self.generation_script.exists():
+                raise FileNotFoundError(f"Generation script not found at {self.generation_script}")
+        
+        self.pool = HiggsWorkerPool(
+            command=self._worker_command(use_stub),
+            size=self.pool_config.get("size", 1),
+            cwd=None if use_stub else str(HIGGS_AUDIO_PATH),
+            job_timeout=self.pool_config.get("jobTimeoutSeconds", 600),
+            startup_timeout=self.pool_config.get("startupTimeoutSeconds", 900),
+            health_check_interval=self.pool_config.get("healthCheckIntervalSeconds", 30)
+        )
+        await self.pool.start()
         
-        self.model = True
+        self.model = self.pool
         return True
     
+    async def unload(self):
+        """Stop the resident workers"""
+        if self.pool is not None:
+            await self.pool.close()
+        self.pool = None
+        self.model = None
+    
+    async def shutdown(self):
+        """Stop the resident workers, then the executor"""
+        await self.unload()
+        await super().shutdown()
+    
     async def generate(
         self,
         text: str,
         voice_id: str,
-        settings: Dict[str, Any]
+        settings: Dict[str, Any],
+        progress: Optional[Callable[[int, int], None]] = None
     ) -> Path:
         """Generate speech using Higgs Audio"""
         
@@ -45,50 +81,62 @@ class HiggsAudioAdapter(TTSAdapter):
         output_filename = f"higgs_{uuid.uuid4().hex[:8]}.wav"
         output_path = self.output_dir / output_filename
         
-        temp_input_file = self.output_dir / f"input_{uuid.uuid4().hex[:8]}.txt"
-        temp_input_file.write_text(text, encoding="utf-8")
-        
-        cmd = [
-            str(self.venv_python),
-            str(self.generation_script),
-            "--transcript", str(temp_input_file),
-            "--out_path", str(output_path),
-            "--temperature", str(validated_settings.get("temperature", 0.7)),
-            "--top_k", str(validated_settings.get("top_k", 50)),
-            "--top_p", str(validated_settings.get("top_p", 0.95)),
-            "--max_new_tokens", str(validated_settings.get("max_new_tokens", 1024)),
-        ]
+        job = {
+            "text": text,
+            "temperature": validated_settings.get("temperature", 0.7),
+            "top_k": validated_settings.get("top_k", 50),
+            "top_p": validated_settings.get("top_p", 0.95),
+            "max_new_tokens": validated_settings.get("max_new_tokens", 1024),
+            "chunk_method": validated_settings.get("chunk_method", "word"),
+            "chunk_max_word_num": validated_settings.get("chunk_max_word_num", 100),
+        }
         
         if voice_id != "auto":
-            cmd.extend(["--ref_audio", voice_id])
+            job["ref_audio"] = voice_id
         
-        chunk_method = validated_settings.get("chunk_method", "word")
-        if chunk_method != "none":
-            cmd.extend(["--chunk_method", chunk_method])
-            
-        if chunk_method == "word":
-            cmd.extend(["--chunk_max_word_num", str(validated_settings.get("chunk_max_word_num", 100))])
-        
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=str(HIGGS_AUDIO_PATH)
-        )
-        
-        stdout, stderr = await process.communicate()
+        if settings.get("seed") is not None:
+            job["seed"] = int(settings["seed"])
         
-        temp_input_file.unlink(missing_ok=True)
+        # Chunking happens inside the worker, so the job counts as one segment
+        if progress is not None:
+            progress(0, 1)
         
-        if process.returncode != 0:
-            error_msg = stderr.decode() if stderr else "Unknown error"
-            raise RuntimeError(f"Higgs Audio generation failed: {error_msg}")
+        try:
+            with span("worker"):
+                _, audio = await self.pool.submit(job)
+        except WorkerError as e:
+            raise RuntimeError(f"Higgs Audio generation failed: {str(e)}")
         
-        if not output_path.exists():
+        if not audio:
             raise RuntimeError("Audio file was not generated")
         
+        with span("write"):
+            output_path.write_bytes(audio)
+        
+        if progress is not None:
+            progress(1, 1)
+        
         return output_path
     
+    def estimate_cost(self, text: str, settings: Dict[str, Any]) -> float:
+        """Seconds of speech, with each chunk capped by max_new_tokens"""
+        validated_settings = self.validate_settings(settings)
+        max_new_tokens = validated_settings.get("max_new_tokens", 1024)
+        words = text.split()
+        if validated_settings.get("chunk_method", "word") == "word":
+            chunk_words = validated_settings.get("chunk_max_word_num", 100)
+        else:
+            chunk_words = max(1, len(words))
+        
+        seconds = 0.0
+        for start in range(0, max(1, len(words)), chunk_words):
+            chunk_chars = len(" ".join(words[start:start + chunk_words]))
+            seconds += min(
+                max(1, chunk_chars) / SPEECH_CHARACTERS_PER_SECOND,
+                max_new_tokens / AUDIO_TOKENS_PER_SECOND
+            )
+        return seconds
+    
     def get_voices(self) -> List[Dict[str, Any]]:
         """Get available voices"""
         return self.model_config.get("voices", [])
@@ -97,3 +145,18 @@ class HiggsAudioAdapter(TTSAdapter):
         """Get settings schema"""
         return self.model_config.get("settings", {})
 
+    
+    def _worker_command(self, use_stub: bool) -> List[str]:
+        """Command line for one resident worker process"""
+        if use_stub:
+            return [
+                sys.executable,
+                str(WORKER_DIR / "higgs_stub_worker.py"),
+                *self.pool_config.get("stubArgs", [])
+            ]
+        
+        return [
+            str(self.venv_python),
+            str(WORKER_DIR / "higgs_worker.py"),
+            "--higgs-path", str(HIGGS_AUDIO_PATH),
+        ]
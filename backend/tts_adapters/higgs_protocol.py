@@ -0,0 +1,101 @@
+"""
+Framed message protocol between the backend and resident Higgs Audio workers
+
+Every frame is a 4-byte big-endian header length, a UTF-8 JSON header and
+an optional binary payload whose size is given by the header's
+`payload_size` field. Workers run inside the Higgs Audio virtualenv, so this
+module only uses the standard library.
+"""
+
+import json
+import struct
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+HEADER_PREFIX = struct.Struct(">I")
+MAX_HEADER_SIZE = 1 << 20
+
+
+class ProtocolError(Exception):
+    """Raised when a peer sends a malformed frame"""
+
+
+def encode_frame(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    """Serialize a header and payload into a single frame"""
+    header = {**header, "payload_size": len(payload)}
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return HEADER_PREFIX.pack(len(header_bytes)) + header_bytes + payload
+
+
+def decode_header(header_bytes: bytes) -> Dict[str, Any]:
+    try:
+        header = json.loads(header_bytes.decode("utf-8"))
+    except ValueError as e:
+        raise ProtocolError(f"Invalid frame header: {e}")
+    if not isinstance(header, dict):
+        raise ProtocolError("Frame header must be a JSON object")
+    return header
+
+
+def write_frame(stream: BinaryIO, header: Dict[str, Any], payload: bytes = b""):
+    stream.write(encode_frame(header, payload))
+    stream.flush()
+
+
+def read_frame(stream: BinaryIO) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """Read one frame from a blocking stream, or None at end of stream"""
+    prefix = _read_exact(stream, HEADER_PREFIX.size)
+    if prefix is None:
+        return None
+
+    (header_size,) = HEADER_PREFIX.unpack(prefix)
+    if header_size > MAX_HEADER_SIZE:
+        raise ProtocolError(f"Frame header too large: {header_size} bytes")
+
+    header_bytes = _read_exact(stream, header_size)
+    if header_bytes is None:
+        raise ProtocolError("Stream closed inside a frame header")
+    header = decode_header(header_bytes)
+
+    payload_size = int(header.get("payload_size", 0))
+    payload = _read_exact(stream, payload_size) if payload_size else b""
+    if payload is None:
+        raise ProtocolError("Stream closed inside a frame payload")
+
+    return header, payload
+
+
+async def read_frame_async(reader) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """Read one frame from an asyncio StreamReader, or None at end of stream"""
+    import asyncio
+
+    try:
+        prefix = await reader.readexactly(HEADER_PREFIX.size)
+    except asyncio.IncompleteReadError:
+        return None
+
+    (header_size,) = HEADER_PREFIX.unpack(prefix)
+    if header_size > MAX_HEADER_SIZE:
+        raise ProtocolError(f"Frame header too large: {header_size} bytes")
+
+    try:
+        header = decode_header(await reader.readexactly(header_size))
+        payload_size = int(header.get("payload_size", 0))
+        payload = await reader.readexactly(payload_size) if payload_size else b""
+    except asyncio.IncompleteReadError:
+        raise ProtocolError("Stream closed inside a frame")
+
+    return header, payload
+
+
+def _read_exact(stream: BinaryIO, size: int) -> Optional[bytes]:
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            if remaining == size:
+                return None
+            raise ProtocolError("Stream closed inside a frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
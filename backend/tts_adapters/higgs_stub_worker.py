@@ -0,0 +1,80 @@
+"""
+Model-free stand-in for `higgs_worker.py`
+
+Speaks the same framed protocol and answers every job with a short tone
+whose length follows the input text, so the worker pool can be exercised
+without the Higgs Audio virtualenv or weights.
+"""
+
+import argparse
+import io
+import math
+import os
+import struct
+import sys
+import time
+import wave
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from higgs_protocol import read_frame, write_frame  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stub Higgs Audio worker")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="Simulated model load seconds")
+    parser.add_argument("--job-delay", type=float, default=0.0, help="Simulated seconds per job")
+    parser.add_argument("--sample-rate", type=int, default=24000)
+    parser.add_argument("--crash-after", type=int, default=0, help="Exit after N jobs (0 = never)")
+    return parser.parse_args()
+
+
+def tone_wav(text, sample_rate):
+    """16-bit mono WAV with ~60 ms of 220 Hz tone per input character"""
+    n_samples = max(1, int(sample_rate * 0.06 * len(text)))
+    samples = (
+        int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate)) for i in range(n_samples)
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(struct.pack(f"<{n_samples}h", *samples))
+    return buffer.getvalue()
+
+
+def main():
+    args = parse_args()
+    frame_in = sys.stdin.buffer
+    frame_out = sys.stdout.buffer
+
+    time.sleep(args.load_delay)
+    write_frame(frame_out, {"type": "ready", "pid": os.getpid()})
+
+    jobs_done = 0
+    while True:
+        frame = read_frame(frame_in)
+        if frame is None:
+            break
+        job, _ = frame
+
+        if job.get("type") == "ping":
+            write_frame(frame_out, {"type": "pong", "id": job.get("id")})
+            continue
+
+        time.sleep(args.job_delay)
+        jobs_done += 1
+        if args.crash_after and jobs_done >= args.crash_after:
+            sys.exit(1)
+
+        write_frame(
+            frame_out,
+            {"type": "result", "id": job.get("id"), "format": "wav", "sample_rate": args.sample_rate},
+            tone_wav(job.get("text", ""), args.sample_rate),
+        )
+
+
+if __name__ == "__main__":
+    main()
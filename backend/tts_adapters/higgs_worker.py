@@ -0,0 +1,176 @@
+"""
+Resident Higgs Audio worker
+
+Runs inside the Higgs Audio virtualenv, loads the model once and then serves
+generation jobs framed with `higgs_protocol` over stdin/stdout until stdin
+closes. Anything the model libraries print is redirected to stderr so it
+cannot corrupt the frame stream.
+"""
+
+import argparse
+import inspect
+import io
+import os
+import re
+import sys
+import traceback
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from higgs_protocol import read_frame, write_frame  # noqa: E402
+
+SPEAKER_TAG_PATTERN = re.compile(r"\[(SPEAKER\d+)\]")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resident Higgs Audio generation worker")
+    parser.add_argument("--higgs-path", required=True, help="Path to the higgs-audio repository")
+    parser.add_argument("--model-path", default="bosonai/higgs-audio-v2-generation-3B-base")
+    parser.add_argument("--audio-tokenizer", default="bosonai/higgs-audio-v2-tokenizer")
+    parser.add_argument("--device", default=None, help="Torch device (auto-detected when omitted)")
+    parser.add_argument("--max-new-tokens", type=int, default=2048)
+    return parser.parse_args()
+
+
+def detect_device():
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda:0"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+class HiggsEngine:
+    """Model client and audio tokenizer from the higgs-audio generation example"""
+
+    def __init__(self, args):
+        higgs_path = Path(args.higgs_path)
+        sys.path.insert(0, str(higgs_path))
+        sys.path.insert(0, str(higgs_path / "examples"))
+
+        import generation as higgs_generation
+        from boson_multimodal.audio_processing.higgs_audio_tokenizer import load_higgs_audio_tokenizer
+
+        device = args.device or detect_device()
+        self.generation = higgs_generation
+        self.scene_prompt_path = higgs_path / "examples" / "scene_prompts" / "quiet_indoor.txt"
+        self.audio_tokenizer = load_higgs_audio_tokenizer(args.audio_tokenizer, device=device)
+        self.client = higgs_generation.HiggsAudioModelClient(
+            model_path=args.model_path,
+            audio_tokenizer=self.audio_tokenizer,
+            device=device,
+            max_new_tokens=args.max_new_tokens,
+        )
+
+    def generate(self, job):
+        text = job["text"]
+        chunk_method = job.get("chunk_method", "word")
+        scene_prompt = None
+        if self.scene_prompt_path.exists():
+            scene_prompt = self.scene_prompt_path.read_text(encoding="utf-8").strip()
+
+        messages, audio_ids = self.generation.prepare_generation_context(
+            scene_prompt=scene_prompt,
+            ref_audio=job.get("ref_audio"),
+            ref_audio_in_system_message=False,
+            audio_tokenizer=self.audio_tokenizer,
+            speaker_tags=sorted(set(SPEAKER_TAG_PATTERN.findall(text))),
+        )
+        chunked_text = self.generation.prepare_chunk_text(
+            text,
+            chunk_method=None if chunk_method == "none" else chunk_method,
+            chunk_max_word_num=job.get("chunk_max_word_num", 100),
+            chunk_max_num_turns=1,
+        )
+
+        budget = token_budget(self.client, job.get("max_new_tokens", 1024))
+        waveform, sample_rate, _ = self.client.generate(
+            messages=messages,
+            audio_ids=audio_ids,
+            chunked_text=chunked_text,
+            generation_chunk_buffer_size=None,
+            temperature=job.get("temperature", 0.7),
+            top_k=job.get("top_k", 50),
+            top_p=job.get("top_p", 0.95),
+            ras_win_len=7,
+            ras_win_max_num_repeat=2,
+            seed=job.get("seed"),
+            **budget,
+        )
+        return waveform, sample_rate
+
+
+def token_budget(client, max_new_tokens):
+    """
+    Apply a per-job `max_new_tokens` to a HiggsAudioModelClient
+
+    The upstream client takes the budget in its constructor only and reads it
+    from the private `_max_new_tokens` on every generate() call. This is the
+    one place that relies on that. It passes the budget to generate() if a
+    newer client accepts it, and fails loudly if the attribute is gone rather
+    than silently ignoring the budget. Returns extra generate() arguments.
+    """
+    if "max_new_tokens" in inspect.signature(client.generate).parameters:
+        return {"max_new_tokens": max_new_tokens}
+    if not hasattr(client, "_max_new_tokens"):
+        raise RuntimeError(
+            "This higgs-audio version's client has no per-call token budget; update token_budget()"
+        )
+    client._max_new_tokens = max_new_tokens
+    return {}
+
+
+def to_wav_bytes(waveform, sample_rate):
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, waveform, sample_rate, format="WAV")
+    return buffer.getvalue()
+
+
+def main():
+    args = parse_args()
+
+    # Keep the real stdout for frames and send stray prints to stderr
+    frame_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    frame_in = sys.stdin.buffer
+
+    try:
+        engine = HiggsEngine(args)
+    except Exception as e:
+        write_frame(frame_out, {"type": "error", "id": None, "message": f"Model load failed: {e}"})
+        raise
+
+    write_frame(frame_out, {"type": "ready", "pid": os.getpid()})
+
+    while True:
+        frame = read_frame(frame_in)
+        if frame is None:
+            break
+        job, _ = frame
+
+        if job.get("type") == "ping":
+            write_frame(frame_out, {"type": "pong", "id": job.get("id")})
+            continue
+
+        try:
+            waveform, sample_rate = engine.generate(job)
+            audio = to_wav_bytes(waveform, sample_rate)
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            write_frame(frame_out, {"type": "error", "id": job.get("id"), "message": str(e)})
+            continue
+
+        write_frame(
+            frame_out,
+            {"type": "result", "id": job.get("id"), "format": "wav", "sample_rate": sample_rate},
+            audio,
+        )
+
+
+if __name__ == "__main__":
+    main()
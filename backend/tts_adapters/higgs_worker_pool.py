@@ -0,0 +1,266 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .higgs_protocol import ProtocolError, encode_frame, read_frame_async
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerError(RuntimeError):
+    """Raised when a worker crashes, times out or reports a failure"""
+
+
+class _Worker:
+    """One resident worker process and its frame streams"""
+
+    def __init__(self, slot: int, process: asyncio.subprocess.Process):
+        self.slot = slot
+        self.process = process
+        self.started_at = time.monotonic()
+        self.jobs_done = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def send(self, header: Dict[str, Any], payload: bytes = b""):
+        self.process.stdin.write(encode_frame(header, payload))
+        await self.process.stdin.drain()
+
+    async def receive(self) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        return await read_frame_async(self.process.stdout)
+
+    async def kill(self):
+        if self.alive:
+            self.process.kill()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning(f"Higgs worker {self.slot} (pid {self.process.pid}) did not exit")
+
+
+class HiggsWorkerPool:
+    """
+    Pool of resident generation workers that keep the model loaded
+
+    Jobs are dispatched to idle workers over the framed stdin/stdout protocol
+    in `higgs_protocol`. Workers that crash, time out or fail a health check
+    are killed and replaced in the background.
+    """
+
+    def __init__(
+        self,
+        command: List[str],
+        size: int = 1,
+        cwd: Optional[str] = None,
+        job_timeout: float = 600.0,
+        startup_timeout: float = 900.0,
+        health_check_interval: float = 30.0,
+        ping_timeout: float = 10.0
+    ):
+        self.command = command
+        self.size = max(1, size)
+        self.cwd = cwd
+        self.job_timeout = job_timeout
+        self.startup_timeout = startup_timeout
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+
+        # Holds idle workers, and None once closed to wake anyone still waiting
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._workers: Dict[int, _Worker] = {}
+        self._background: set = set()
+        self._health_task: Optional[asyncio.Task] = None
+        self._job_ids = itertools.count(1)
+        self._closed = False
+        self.restarts = 0
+
+    async def start(self):
+        """Spawn all workers and wait until each has loaded the model"""
+        self._closed = False
+        results = await asyncio.gather(
+            *(self._spawn(slot) for slot in range(self.size)),
+            return_exceptions=True
+        )
+
+        failures = [r for r in results if isinstance(r, Exception)]
+        if len(failures) == self.size:
+            raise WorkerError(f"No Higgs Audio worker could start: {failures[0]}")
+        for slot, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"Higgs worker {slot} failed to start: {result}")
+                self._schedule_replacement(slot)
+            else:
+                self._idle.put_nowait(result)
+
+        if self.health_check_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def submit(self, job: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        """
+        Run one job on the next idle worker
+
+        Args:
+            job: JSON-serializable job header
+
+        Returns:
+            Result header and audio payload
+        """
+        if self._closed:
+            raise WorkerError("Worker pool is closed")
+
+        # A busy worker frees up within a job timeout and a replacement starts within a startup timeout
+        wait = max(self.job_timeout, self.startup_timeout)
+        try:
+            worker = await asyncio.wait_for(self._idle.get(), timeout=wait)
+        except asyncio.TimeoutError:
+            raise WorkerError(f"No Higgs Audio worker became available within {wait:g}s")
+        if worker is None:
+            # Pass the wake-up on to the next waiter
+            self._idle.put_nowait(None)
+            raise WorkerError("Worker pool is closed")
+
+        job = {**job, "type": "generate", "id": next(self._job_ids)}
+
+        response = asyncio.ensure_future(self._await_response(worker))
+        try:
+            await worker.send(job)
+            frame = await asyncio.wait_for(asyncio.shield(response), timeout=self.job_timeout)
+        except asyncio.CancelledError:
+            # The worker is still busy with this job; reclaim it once it answers
+            self._track(asyncio.create_task(self._release_after(worker, response)))
+            raise
+        except asyncio.TimeoutError:
+            response.cancel()
+            await self._replace(worker, reason=f"job exceeded {self.job_timeout:g}s")
+            raise WorkerError(f"Higgs Audio job timed out after {self.job_timeout:g}s")
+        except (ConnectionError, ProtocolError, WorkerError) as e:
+            response.cancel()
+            await self._replace(worker, reason=str(e))
+            raise WorkerError(f"Higgs Audio worker failed: {e}")
+
+        header, payload = frame
+        worker.jobs_done += 1
+        self._idle.put_nowait(worker)
+
+        if header.get("type") == "error":
+            raise WorkerError(header.get("message", "Unknown worker error"))
+        return header, payload
+
+    async def close(self):
+        """Stop health checks and terminate every worker"""
+        self._closed = True
+        self._idle.put_nowait(None)
+        if self._health_task:
+            self._health_task.cancel()
+        for task in list(self._background):
+            task.cancel()
+        for worker in list(self._workers.values()):
+            if worker.alive:
+                worker.process.stdin.close()
+            await worker.kill()
+        self._workers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "alive": sum(1 for w in self._workers.values() if w.alive),
+            "idle": self._idle.qsize(),
+            "restarts": self.restarts,
+            "jobs": sum(w.jobs_done for w in self._workers.values())
+        }
+
+    async def _spawn(self, slot: int) -> _Worker:
+        process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            cwd=self.cwd
+        )
+        worker = _Worker(slot, process)
+
+        try:
+            frame = await asyncio.wait_for(worker.receive(), timeout=self.startup_timeout)
+        except (asyncio.TimeoutError, ProtocolError) as e:
+            await worker.kill()
+            raise WorkerError(f"worker did not become ready: {e or 'timeout'}")
+
+        if frame is None or frame[0].get("type") != "ready":
+            message = frame[0].get("message") if frame else "exited during startup"
+            await worker.kill()
+            raise WorkerError(f"worker did not become ready: {message}")
+
+        self._workers[slot] = worker
+        logger.info(f"Higgs worker {slot} ready (pid {process.pid})")
+        return worker
+
+    async def _await_response(self, worker: _Worker) -> Tuple[Dict[str, Any], bytes]:
+        frame = await worker.receive()
+        if frame is None:
+            raise WorkerError(f"worker exited with code {await worker.process.wait()}")
+        return frame
+
+    async def _release_after(self, worker: _Worker, response: asyncio.Future):
+        try:
+            await asyncio.wait_for(response, timeout=self.job_timeout)
+        except Exception as e:
+            await self._replace(worker, reason=f"abandoned job did not finish: {e}")
+            return
+        worker.jobs_done += 1
+        self._idle.put_nowait(worker)
+
+    async def _replace(self, worker: _Worker, reason: str):
+        logger.warning(f"Restarting Higgs worker {worker.slot}: {reason}")
+        self._workers.pop(worker.slot, None)
+        await worker.kill()
+        self.restarts += 1
+        self._schedule_replacement(worker.slot)
+
+    def _schedule_replacement(self, slot: int):
+        if not self._closed:
+            self._track(asyncio.create_task(self._respawn(slot)))
+
+    async def _respawn(self, slot: int):
+        delay = 1.0
+        while not self._closed:
+            try:
+                worker = await self._spawn(slot)
+            except Exception as e:
+                logger.error(f"Higgs worker {slot} restart failed: {e}; retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60.0)
+                continue
+            self._idle.put_nowait(worker)
+            return
+
+    async def _health_loop(self):
+        while not self._closed:
+            await asyncio.sleep(self.health_check_interval)
+
+            # Only idle workers are probed; busy ones are covered by job timeouts
+            idle = []
+            while not self._idle.empty():
+                idle.append(self._idle.get_nowait())
+
+            for worker in idle:
+                if await self._ping(worker):
+                    self._idle.put_nowait(worker)
+                else:
+                    await self._replace(worker, reason="failed health check")
+
+    async def _ping(self, worker: _Worker) -> bool:
+        if not worker.alive:
+            return False
+        try:
+            await worker.send({"type": "ping", "id": 0})
+            frame = await asyncio.wait_for(worker.receive(), timeout=self.ping_timeout)
+        except (asyncio.TimeoutError, ConnectionError, ProtocolError):
+            return False
+        return frame is not None and frame[0].get("type") == "pong"
+
+    def _track(self, task: asyncio.Task):
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
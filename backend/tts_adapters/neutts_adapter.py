@@ -1,10 +1,25 @@
+import fcntl
+import gc
+import os
 import sys
+import json
+import asyncio
+import threading
+import re
+import time
+import logging
+import statistics
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Tuple, AsyncIterator, Optional, Callable
 import uuid
-import torchaudio
+import numpy as np
+
+from serving import span, record_stage
 
 from .base_adapter import TTSAdapter
+from .neutts_runtime import CALIBRATION_TEXT, CalibrationStore, RuntimeChoice, candidates, resolve_runtime
+from .reference_store import ReferenceCodeStore
 
 # Add monorepo root to path for neuttsair import
 MONOREPO_ROOT = Path(__file__).parent.parent.parent
@@ -12,49 +27,124 @@ sys.path.insert(0, str(MONOREPO_ROOT))
 
 NEUTTS_PATH = MONOREPO_ROOT / "models" / "neutts-air"
 
+BACKEND_DIR = Path(__file__).parent.parent
+CALIBRATION_PATH = BACKEND_DIR / "temp" / "neutts_calibration.json"
+
+DEFAULT_REF_TEXT = "This is a sample reference text."
+VOICE_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+logger = logging.getLogger(__name__)
+
 class NeuTTSAdapter(TTSAdapter):
     """Adapter for NeuTTS Air model"""
     
     def __init__(self, model_config: Dict[str, Any]):
         super().__init__("neutts-air", model_config)
+        self.sample_rate = 24000
         self.output_dir = Path(__file__).parent.parent / "temp" / "audio"
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Bundled samples are read-only; enrolled voices are user data and live apart
         self.samples_dir = NEUTTS_PATH / "samples"
+        self.voices_dir = BACKEND_DIR / model_config.get("voicesDir", "temp/voices/neutts-air")
+        self.voices_dir.mkdir(parents=True, exist_ok=True)
+        self.custom_voices_path = self.voices_dir / "custom_voices.json"
+        self._custom_voices_mtime = None
+        self.custom_voices = self._load_custom_voices()
+        self._index_voices()
+        
+        cache_config = model_config.get("referenceCodeCache", {})
+        self.reference_store = ReferenceCodeStore(
+            Path(__file__).parent.parent / "temp" / "reference_codes",
+            max_entries=cache_config.get("maxEntries", 64),
+            namespace=self.model_id
+        )
+        self.calibration_store = CalibrationStore(CALIBRATION_PATH)
+        self.runtime: Optional[RuntimeChoice] = None
         
     async def initialize(self) -> bool:
         """Initialize NeuTTS model"""
         try:
-            # NeuTTS is installed via pip in the virtual environment
-            from neuttsair.neutts import NeuTTSAir
-            import torch
-            
-            # Auto-detect best device: MPS (Mac GPU) > CUDA (NVIDIA) > CPU
-            if torch.backends.mps.is_available():
-                device = "mps"
+            # The first torch import alone takes a while
+            device = await self.run_blocking(_detect_device)
+            if device == "mps":
                 print(f"🚀 Using Apple Metal (MPS) GPU acceleration")
-            elif torch.cuda.is_available():
-                device = "cuda"
+            elif device == "cuda":
                 print(f"🚀 Using NVIDIA CUDA GPU acceleration")
             else:
-                device = "cpu"
                 print(f"⚠️ Using CPU (slower)")
             
-            self.model = NeuTTSAir(
-                backbone_repo="neuphonic/neutts-air",
-                backbone_device=device,
-                codec_repo="neuphonic/neucodec",
-                codec_device=device
+            runtime = self.model_config.get("runtime", {})
+            choice = self._choose_runtime(runtime, device)
+            # Loading weights blocks for seconds (every candidate's when calibrating);
+            # models load on the request path, so keep it off the event loop
+            if choice is None:
+                self.model, choice = await self.run_blocking(self._calibrate, runtime, device)
+            else:
+                self.model = await self.run_blocking(self._build_model, choice, device)
+            self.runtime = choice
+            logger.info(
+                f"NeuTTS runtime ({choice.source}): backbone {choice.backbone.name}, "
+                f"codec {choice.codec.name}"
             )
+            self.model.stage_hook = record_stage
+            
+            # Concurrent requests share backbone and codec passes
+            batching = self.model_config.get("batching", {})
+            if batching.get("enabled", False):
+                self.model.enable_batching(
+                    max_batch_size=batching.get("maxBatchSize", self.limiter.max_concurrent),
+                    max_wait_ms=batching.get("maxWaitMs", 5),
+                    # `padDecode: true` from older configs pads any lengths together
+                    decode_pad_ratio=batching.get("decodePadRatio", 1.0 if batching.get("padDecode") else 0.1)
+                )
+            
+            await self.run_blocking(self._precompute_reference_codes)
             
             return True
         except Exception as e:
             raise RuntimeError(f"Failed to initialize NeuTTS: {str(e)}")
     
+    @classmethod
+    def preload_weights(cls, model_config: Dict[str, Any]) -> List[str]:
+        """Load the CPU backbone and codec for forked workers to share"""
+        import torch
+        from neuttsair.neutts import preload_weights
+        
+        device = _detect_device()
+        if device != "cpu":
+            # CUDA and MPS do not survive fork; each worker loads its own copy
+            logger.warning(f"Not preloading NeuTTS weights on {device}")
+            return []
+        # An OpenMP pool started here would be unusable in the forked workers
+        torch.set_num_threads(1)
+        choice = cls._choose_runtime(model_config.get("runtime", {}), device)
+        if choice is None:
+            # Calibration runs in a worker; they load their own copy this time
+            logger.warning("Not preloading NeuTTS weights before calibration has run")
+            return []
+        return preload_weights(choice.backbone.repo, choice.codec.repo, device, choice.dtype)
+    
+    async def unload(self):
+        """Stop the batching workers and phonemizer pool and free the weights"""
+        if self.model is None:
+            return
+        model, self.model = self.model, None
+        # Joining the batching threads and collecting can take a while
+        await self.run_blocking(model.close)
+        del model
+        await self.run_blocking(_free_memory)
+    
+    async def shutdown(self):
+        """Unload the model, then stop the executor"""
+        await self.unload()
+        await super().shutdown()
+    
     async def generate(
         self,
         text: str,
         voice_id: str,
-        settings: Dict[str, Any]
+        settings: Dict[str, Any],
+        progress: Optional[Callable[[int, int], None]] = None
     ) -> Path:
         """Generate speech using NeuTTS"""
         if not self.is_initialized():
@@ -62,37 +152,368 @@ class NeuTTSAdapter(TTSAdapter):
         
         validated_settings = self.validate_settings(settings)
         
-        ref_audio_path = self.samples_dir / f"{voice_id}.wav"
-        ref_text_path = self.samples_dir / f"{voice_id}.txt"
+        ref_audio_path, ref_text = self._resolve_reference(voice_id)
         
-        if not ref_audio_path.exists():
-            raise ValueError(f"Reference audio not found for voice: {voice_id}")
+        # Inference runs on the executor; the event lets a cancelled request stop it
+        cancel_event = threading.Event()
         
-        if ref_text_path.exists():
-            ref_text = ref_text_path.read_text(encoding="utf-8").strip()
-        else:
-            ref_text = "This is a sample reference text."
+        # Segment progress is reported from the inference thread
+        report = None
+        if progress is not None:
+            loop = asyncio.get_running_loop()
+            report = lambda done, total: loop.call_soon_threadsafe(progress, done, total)
         
+        try:
+            return await self.run_blocking(
+                self._synthesize, text, ref_audio_path, ref_text, cancel_event,
+                seed=validated_settings.get("seed"), progress=report
+            )
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+    
+    async def generate_stream(
+        self,
+        text: str,
+        voice_id: str,
+        settings: Dict[str, Any]
+    ) -> AsyncIterator[np.ndarray]:
+        """Stream speech sentence by sentence as each segment is decoded"""
+        if not self.is_initialized():
+            await self.initialize()
+        
+        validated_settings = self.validate_settings(settings)
+        ref_audio_path, ref_text = self._resolve_reference(voice_id)
+        
+        def segments(cancel_event: threading.Event):
+            ref_codes = self.reference_store.get_or_encode(
+                ref_audio_path, ref_text, self._encode_reference
+            )
+            return self.model.infer_stream(
+                text, ref_codes, ref_text, cancel_event=cancel_event,
+                seed=validated_settings.get("seed"), watermark=False
+            )
+        
+        async for waveform in self.iterate_blocking(segments):
+            yield waveform
+    
+    def _synthesize(
+        self,
+        text: str,
+        ref_audio_path: Path,
+        ref_text: str,
+        cancel_event: threading.Event,
+        seed: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Path:
+        """Blocking synthesis path, run on the inference executor"""
         output_filename = f"neutts_{uuid.uuid4().hex[:8]}.wav"
         output_path = self.output_dir / output_filename
         
-        # Encode reference audio
-        ref_codes = self.model.encode_reference(str(ref_audio_path))
+        # Reference codes are encoded once per distinct audio/transcript pair
+        with span("reference"):
+            ref_codes = self.reference_store.get_or_encode(
+                ref_audio_path, ref_text, self._encode_reference
+            )
         
-        # Generate audio
-        waveform = self.model.infer(text, ref_codes, ref_text)
+        # Generate audio; text beyond one context window is pipelined segment by segment
+        waveform = self.model.infer_long(
+            text, ref_codes, ref_text, cancel_event=cancel_event,
+            seed=seed, progress=progress, watermark=False
+        )
         
         # Save using soundfile (since waveform is already numpy array)
         import soundfile as sf
-        sf.write(str(output_path), waveform, 24000)
+        with span("write"):
+            sf.write(str(output_path), waveform, 24000, subtype="PCM_16")
         
         return output_path
     
+    async def add_voice(
+        self,
+        voice_id: str,
+        audio_bytes: bytes,
+        transcript: str,
+        metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Enroll a voice: store the sample and encode its reference codes once
+        
+        The model must be loaded; callers hold it through the ModelManager.
+        """
+        if not VOICE_ID_PATTERN.match(voice_id):
+            raise ValueError(
+                "Voice id must be lowercase letters, digits, '-' or '_' (max 64 chars)"
+            )
+        
+        if self.validate_voice(voice_id) or (self.samples_dir / f"{voice_id}.wav").exists():
+            raise ValueError(f"Voice {voice_id} already exists")
+        
+        transcript = transcript.strip()
+        if not transcript:
+            raise ValueError("Transcript cannot be empty")
+        
+        audio_path = self.voices_dir / f"{voice_id}.wav"
+        try:
+            # Exclusive create, so two workers cannot enroll the same id
+            with open(audio_path, "xb") as audio_file:
+                audio_file.write(audio_bytes)
+        except FileExistsError:
+            raise ValueError(f"Voice {voice_id} already exists")
+        
+        try:
+            codes = await self.run_blocking(self._encode_reference, audio_path)
+        except Exception as e:
+            audio_path.unlink(missing_ok=True)
+            raise ValueError(f"Could not encode reference audio: {str(e)}")
+        
+        (self.voices_dir / f"{voice_id}.txt").write_text(transcript, encoding="utf-8")
+        self.reference_store.put(self.reference_store.compute_key(audio_bytes, transcript), codes)
+        
+        voice = {
+            "id": voice_id,
+            "name": metadata.get("name") or voice_id,
+            "description": metadata.get("description") or "Enrolled voice",
+            "gender": metadata.get("gender") or "neutral",
+            "language": metadata.get("language") or "en-US",
+            "custom": True
+        }
+        # Other worker processes enroll voices too; read-modify-write under their shared lock
+        with self._custom_voices_lock():
+            self.custom_voices = self._load_custom_voices()
+            self.custom_voices.append(voice)
+            self._save_custom_voices()
+        self._index_voices()
+        
+        return voice
+    
     def get_voices(self) -> List[Dict[str, Any]]:
         """Get available voices"""
-        return self.model_config.get("voices", [])
+        self._refresh_custom_voices()
+        return self.model_config.get("voices", []) + self.custom_voices
+    
+    def get_voice(self, voice_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a voice by id, including ones enrolled by other workers"""
+        self._refresh_custom_voices()
+        return self._voice_index.get(voice_id)
+    
+    def voices_version(self) -> int:
+        self._refresh_custom_voices()
+        return self.voices_generation
     
     def get_settings_schema(self) -> Dict[str, Any]:
         """Get settings schema"""
         return self.model_config.get("settings", {})
+    
+    def validate_settings(self, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate settings, including the optional sampling seed"""
+        validated = super().validate_settings(settings)
+        
+        seed = settings.get("seed")
+        if seed is not None:
+            # Segment i of a long text is sampled with seed + i
+            if isinstance(seed, bool) or not isinstance(seed, int) or not 0 <= seed < 2**63:
+                raise ValueError("Seed must be an integer between 0 and 2^63 - 1")
+            validated["seed"] = seed
+        
+        return validated
+    
+    def runtime_info(self) -> Dict[str, Any]:
+        """Backbone and codec variants the model was loaded with"""
+        return self.runtime.describe() if self.runtime is not None else {}
+    
+    def watermarker(self) -> Optional[Callable[[np.ndarray, int], np.ndarray]]:
+        """Perth watermark of the loaded model, if Perth is installed"""
+        if self.model is None or self.model.watermarker is None:
+            return None
+        return self.model.apply_watermark
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Phoneme and prompt-prefix cache counters of the loaded model"""
+        if self.model is None:
+            return {}
+        prefix = self.model.prefix_cache.stats()
+        return {
+            "phonemizer": {"hits": self.model.phonemizer.hits, "misses": self.model.phonemizer.misses},
+            "prefix": {"hits": prefix["hits"], "misses": prefix["misses"]}
+        }
 
+    
+    @staticmethod
+    def _choose_runtime(runtime: Dict[str, Any], device: str) -> Optional[RuntimeChoice]:
+        """Variants to load, or None when calibration is on and has no stored result"""
+        calibration = runtime.get("calibration", {})
+        if not calibration.get("enabled", False):
+            return resolve_runtime(runtime, device)
+        
+        key = CalibrationStore.make_key(runtime, device, calibration.get("text", CALIBRATION_TEXT))
+        result = CalibrationStore(CALIBRATION_PATH).get(key)
+        if result is None:
+            return None
+        return resolve_runtime(runtime, device, calibrated=result)
+    
+    def _build_model(self, choice: RuntimeChoice, device: str):
+        # NeuTTS is installed via pip in the virtual environment
+        from neuttsair.neutts import NeuTTSAir
+        
+        if choice.threads:
+            import torch
+            torch.set_num_threads(choice.threads)
+        return NeuTTSAir(
+            backbone_repo=choice.backbone.repo,
+            backbone_device=choice.backbone.device_for(device),
+            codec_repo=choice.codec.repo,
+            codec_device=choice.codec.device_for(device),
+            phonemizer_processes=self.model_config.get("phonemizerProcesses", 0),
+            prefix_cache_mb=self.model_config.get("prefixCacheMB", 256),
+            backbone_dtype=choice.dtype,
+            num_threads=choice.threads
+        )
+    
+    def _calibrate(self, runtime: Dict[str, Any], device: str):
+        """
+        Time every candidate on a fixed utterance and keep the fastest
+        
+        Each candidate synthesizes once to warm up, then `runs` more times; the
+        median real-time factor decides. Returns the fastest model, already
+        loaded, and its choice. The result is stored so later loads skip this.
+        """
+        calibration = runtime.get("calibration", {})
+        text = calibration.get("text", CALIBRATION_TEXT)
+        runs = max(1, calibration.get("runs", 2))
+        ref_audio_path, ref_text = self._resolve_reference(calibration.get("voice", "dave"))
+        
+        best = None
+        results = []
+        for backbone, codec in candidates(runtime, device):
+            choice = RuntimeChoice(backbone, codec, runtime.get("dtype"), runtime.get("threads", 0), "calibration")
+            try:
+                model = self._build_model(choice, device)
+            except Exception as e:
+                logger.warning(f"Calibration skipped {backbone.name}/{codec.name}: {e}")
+                continue
+            
+            try:
+                ref_codes = self.reference_store.get_or_encode(
+                    ref_audio_path, ref_text, lambda path: model.encode_reference(str(path))
+                )
+                model.infer(text, ref_codes, ref_text, seed=0, watermark=False)
+                timings = []
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    waveform = model.infer(text, ref_codes, ref_text, seed=0, watermark=False)
+                    timings.append(time.perf_counter() - started)
+            except Exception as e:
+                logger.warning(f"Calibration skipped {backbone.name}/{codec.name}: {e}")
+                model.close()
+                continue
+            
+            factor = statistics.median(timings) / max(len(waveform) / self.sample_rate, 1e-6)
+            results.append({"backbone": backbone.name, "codec": codec.name, "realTimeFactor": round(factor, 4)})
+            logger.info(f"Calibration: {backbone.name}/{codec.name} runs at {factor:.3f}x real time")
+            if best is None or factor < best[0]:
+                if best is not None:
+                    best[1].close()
+                best = (factor, model, choice)
+            else:
+                model.close()
+        
+        if best is None:
+            raise RuntimeError("No NeuTTS variant could be calibrated")
+        _, model, choice = best
+        self.calibration_store.put(
+            CalibrationStore.make_key(runtime, device, text),
+            {"backbone": choice.backbone.name, "codec": choice.codec.name, "results": results}
+        )
+        gc.collect()
+        return model, choice
+    
+    def _resolve_reference(self, voice_id: str) -> Tuple[Path, str]:
+        """Locate the reference audio and transcript for a bundled or enrolled voice"""
+        for directory in (self.samples_dir, self.voices_dir):
+            ref_audio_path = directory / f"{voice_id}.wav"
+            if ref_audio_path.exists():
+                break
+        else:
+            raise ValueError(f"Reference audio not found for voice: {voice_id}")
+        ref_text_path = ref_audio_path.with_suffix(".txt")
+        
+        if ref_text_path.exists():
+            ref_text = ref_text_path.read_text(encoding="utf-8").strip()
+        else:
+            ref_text = DEFAULT_REF_TEXT
+        
+        return ref_audio_path, ref_text
+    
+    def _encode_reference(self, audio_path: Path):
+        return self.model.encode_reference(str(audio_path))
+    
+    def _precompute_reference_codes(self):
+        """Encode every bundled sample and enrolled voice so first requests skip the encoder"""
+        audio_paths = sorted(self.samples_dir.glob("*.wav")) + sorted(self.voices_dir.glob("*.wav"))
+        for audio_path in audio_paths:
+            ref_text_path = audio_path.with_suffix(".txt")
+            if ref_text_path.exists():
+                ref_text = ref_text_path.read_text(encoding="utf-8").strip()
+            else:
+                ref_text = DEFAULT_REF_TEXT
+            
+            try:
+                self.reference_store.get_or_encode(audio_path, ref_text, self._encode_reference)
+            except Exception as e:
+                logger.warning(f"Could not precompute reference codes for {audio_path.name}: {e}")
+    
+    def _load_custom_voices(self) -> List[Dict[str, Any]]:
+        if not self.custom_voices_path.exists():
+            return []
+        try:
+            self._custom_voices_mtime = self.custom_voices_path.stat().st_mtime_ns
+            return json.loads(self.custom_voices_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {self.custom_voices_path.name}: {e}")
+            return []
+    
+    def _refresh_custom_voices(self):
+        """Reload the enrolled voices if the file changed, e.g. in another worker"""
+        try:
+            mtime = self.custom_voices_path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._custom_voices_mtime:
+            self.custom_voices = self._load_custom_voices()
+            self._index_voices()
+    
+    @contextmanager
+    def _custom_voices_lock(self) -> Iterator[None]:
+        with open(self.voices_dir / "custom_voices.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _save_custom_voices(self):
+        tmp_path = self.custom_voices_path.with_suffix(f".json.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self.custom_voices, indent=2), encoding="utf-8")
+        tmp_path.replace(self.custom_voices_path)
+        self._custom_voices_mtime = self.custom_voices_path.stat().st_mtime_ns
+
+
+def _free_memory():
+    """Collect dropped model objects and return cached GPU memory"""
+    gc.collect()
+    
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def _detect_device() -> str:
+    """Best available device: MPS (Mac GPU) > CUDA (NVIDIA) > CPU"""
+    import torch
+    
+    if torch.backends.mps.is_available():
+        return "mps"
+    if torch.cuda.is_available():
+        return "cuda"
+    return "cpu"
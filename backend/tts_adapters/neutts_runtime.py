@@ -0,0 +1,198 @@
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import platform
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ordered from lowest to highest
+QUALITY_LEVELS = ("draft", "high", "full")
+
+ONNX_DECODER_REPO = "neuphonic/neucodec-onnx-decoder"
+
+DEFAULT_BACKBONES = {
+    "torch": {"repo": "neuphonic/neutts-air", "quality": "full"}
+}
+DEFAULT_CODECS = {
+    "torch": {"repo": "neuphonic/neucodec", "quality": "full"}
+}
+
+CALIBRATION_TEXT = "The quick brown fox jumps over the lazy dog near the riverbank."
+
+
+@dataclass(frozen=True)
+class Variant:
+    """One way to load the backbone or the codec"""
+
+    name: str
+    repo: str
+    quality: str
+
+    @property
+    def kind(self) -> str:
+        if self.repo.endswith("gguf"):
+            return "gguf"
+        if self.repo == ONNX_DECODER_REPO:
+            return "onnx"
+        return "torch"
+
+    def available(self, device: str) -> bool:
+        """Whether this variant's runtime is installed and supports `device`"""
+        if self.kind == "gguf":
+            return importlib.util.find_spec("llama_cpp") is not None
+        if self.kind == "onnx":
+            return device == "cpu" and importlib.util.find_spec("onnxruntime") is not None
+        return True
+
+    def device_for(self, device: str) -> str:
+        # llama.cpp offloads to whichever GPU it was built for
+        if self.kind == "gguf" and device != "cpu":
+            return "gpu"
+        return device
+
+
+@dataclass(frozen=True)
+class RuntimeChoice:
+    """The backbone and codec variants a NeuTTS model is loaded with"""
+
+    backbone: Variant
+    codec: Variant
+    dtype: Optional[str]
+    threads: int
+    # "config", "auto" or "calibration"
+    source: str
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "backbone": self.backbone.name,
+            "codec": self.codec.name,
+            "dtype": self.dtype,
+            "threads": self.threads,
+            "source": self.source
+        }
+
+
+def parse_variants(runtime: Dict[str, Any], kind: str) -> Dict[str, Variant]:
+    """Backbone or codec variants from a model's `runtime` config"""
+    defaults = DEFAULT_BACKBONES if kind == "backbone" else DEFAULT_CODECS
+    variants = {}
+    for name, spec in runtime.get("variants", {}).get(kind, defaults).items():
+        quality = spec.get("quality", "full")
+        if quality not in QUALITY_LEVELS:
+            raise ValueError(f"Quality of {kind} variant '{name}' must be one of: {', '.join(QUALITY_LEVELS)}")
+        variants[name] = Variant(name, spec["repo"], quality)
+    if not variants:
+        raise ValueError(f"No {kind} variants configured")
+    return variants
+
+
+def candidates(runtime: Dict[str, Any], device: str) -> List[Tuple[Variant, Variant]]:
+    """
+    Available (backbone, codec) pairs that meet `minQuality`, in config order
+
+    A backbone or codec named explicitly (not "auto") is the only candidate
+    for its part.
+    """
+    min_quality = runtime.get("minQuality", "draft")
+    if min_quality not in QUALITY_LEVELS:
+        raise ValueError(f"minQuality must be one of: {', '.join(QUALITY_LEVELS)}")
+    floor = QUALITY_LEVELS.index(min_quality)
+
+    parts = []
+    for kind in ("backbone", "codec"):
+        variants = parse_variants(runtime, kind)
+        selected = runtime.get(kind, "auto")
+        if selected != "auto":
+            if selected not in variants:
+                raise ValueError(f"Unknown {kind} variant '{selected}'; one of: {', '.join(variants)}")
+            parts.append([variants[selected]])
+            continue
+        parts.append([
+            variant for variant in variants.values()
+            if QUALITY_LEVELS.index(variant.quality) >= floor and variant.available(device)
+        ])
+    return [(backbone, codec) for backbone in parts[0] for codec in parts[1]]
+
+
+def resolve_runtime(
+    runtime: Dict[str, Any],
+    device: str,
+    calibrated: Optional[Dict[str, str]] = None
+) -> RuntimeChoice:
+    """
+    Pick variants without running anything: a calibration result if it is
+    still a candidate, else the first candidate
+    """
+    pairs = candidates(runtime, device)
+    if not pairs:
+        raise ValueError(f"No backbone and codec variants are available on {device} at the configured minQuality")
+
+    dtype = runtime.get("dtype")
+    threads = runtime.get("threads", 0)
+    if calibrated is not None:
+        for backbone, codec in pairs:
+            if backbone.name == calibrated.get("backbone") and codec.name == calibrated.get("codec"):
+                return RuntimeChoice(backbone, codec, dtype, threads, "calibration")
+
+    backbone, codec = pairs[0]
+    explicit = runtime.get("backbone", "auto") != "auto" and runtime.get("codec", "auto") != "auto"
+    return RuntimeChoice(backbone, codec, dtype, threads, "config" if explicit else "auto")
+
+
+class CalibrationStore:
+    """
+    Calibration results on disk, keyed by everything that affects the timings
+
+    The key covers the candidates, dtype, threads, device, utterance and the
+    host's CPU, so changing any of them calibrates again.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(runtime: Dict[str, Any], device: str, text: str) -> str:
+        pairs = [
+            [backbone.name, backbone.repo, codec.name, codec.repo]
+            for backbone, codec in candidates(runtime, device)
+        ]
+        payload = json.dumps({
+            "pairs": pairs,
+            "dtype": runtime.get("dtype"),
+            "threads": runtime.get("threads", 0),
+            "device": device,
+            "text": text,
+            "cpus": os.cpu_count(),
+            "machine": platform.machine(),
+            "processor": platform.processor()
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._read().get(key)
+
+    def put(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            results = self._read()
+            results[key] = result
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".json.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+            tmp_path.replace(self.path)
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {self.path.name}: {e}")
+            return {}
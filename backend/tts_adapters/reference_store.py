@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceCodeStore:
+    """
+    Content-addressed store for encoded voice reference codes
+
+    Codes are keyed by a hash of the reference audio bytes and its transcript,
+    kept in an in-memory LRU and persisted as `.npy` files so the codec
+    encoder only ever runs once per distinct reference.
+    """
+
+    def __init__(self, cache_dir: Path, max_entries: int = 64, namespace: str = ""):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # (path, transcript) -> (mtime_ns, size, key), so unchanged files are not re-hashed
+        self._path_keys: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compute_key(self, audio_bytes: bytes, ref_text: str) -> str:
+        """Hash reference audio and transcript into a store key"""
+        digest = hashlib.sha256()
+        digest.update(self.namespace.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(audio_bytes)
+        digest.update(b"\0")
+        digest.update(ref_text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def key_for_file(self, audio_path: Path, ref_text: str) -> str:
+        """Store key for a reference file, memoized on path, mtime and size"""
+        stat = audio_path.stat()
+        path_key = f"{audio_path.resolve()}\0{ref_text}"
+        with self._lock:
+            entry = self._path_keys.get(path_key)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._path_keys.move_to_end(path_key)
+                return entry[2]
+
+        key = self.compute_key(audio_path.read_bytes(), ref_text)
+        with self._lock:
+            # Replaces the entry of an older version of the file
+            self._path_keys[path_key] = (stat.st_mtime_ns, stat.st_size, key)
+            self._path_keys.move_to_end(path_key)
+            while len(self._path_keys) > self.max_entries:
+                self._path_keys.popitem(last=False)
+        return key
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Look up codes in memory, falling back to the on-disk copy"""
+        with self._lock:
+            codes = self._memory.get(key)
+            if codes is not None:
+                self._memory.move_to_end(key)
+                return codes
+
+        disk_path = self._disk_path(key)
+        if not disk_path.exists():
+            return None
+
+        try:
+            codes = np.load(disk_path, allow_pickle=False)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable reference codes {disk_path.name}: {e}")
+            disk_path.unlink(missing_ok=True)
+            return None
+
+        self._remember(key, codes)
+        return codes
+
+    def put(self, key: str, codes: Any) -> np.ndarray:
+        """Store codes in memory and persist them to disk"""
+        codes = self._to_array(codes)
+
+        disk_path = self._disk_path(key)
+        # Unique per writer: workers and threads may store the same key at once
+        tmp_path = disk_path.with_name(f"{disk_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npy")
+        np.save(tmp_path, codes, allow_pickle=False)
+        tmp_path.replace(disk_path)
+
+        self._remember(key, codes)
+        return codes
+
+    def get_or_encode(
+        self,
+        audio_path: Path,
+        ref_text: str,
+        encoder: Callable[[Path], Any]
+    ) -> np.ndarray:
+        """
+        Return cached codes for a reference, encoding it on a miss
+
+        Args:
+            audio_path: Reference audio file
+            ref_text: Transcript of the reference audio
+            encoder: Callable producing codes from an audio path
+
+        Returns:
+            Reference codes as a 1-D int32 array
+        """
+        key = self.key_for_file(audio_path, ref_text)
+        codes = self.get(key)
+        if codes is None:
+            codes = self.put(key, encoder(audio_path))
+        return codes
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self._disk_path(key).exists()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memory)
+
+    def _remember(self, key: str, codes: np.ndarray):
+        with self._lock:
+            self._memory[key] = codes
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npy"
+
+    @staticmethod
+    def _to_array(codes: Any) -> np.ndarray:
+        if hasattr(codes, "detach"):
+            codes = codes.detach().cpu().numpy()
+        return np.ascontiguousarray(np.asarray(codes).reshape(-1), dtype=np.int32)
@@ -1,4 +1,46 @@
-from .file_extraction import extract_text_from_file, chunk_text
-
-__all__ = ["extract_text_from_file", "chunk_text"]
+from .file_extraction import (
+    extract_text_from_file,
+    iter_document,
+    collect_document,
+    configure_extraction_pool,
+    shutdown_extraction_pool,
+    chunk_text,
+    iter_chunks
+)
+from .uploads import spool_upload, UploadTooLarge
+from .audio_stream import wav_stream_header, float_to_pcm16
+from .audio_formats import AUDIO_FORMATS, AudioFormat, format_for_file, transcode
+from .phrases import PhraseBuffer
+from .audio_processing import (
+    PROCESSING_STAGES,
+    ProcessingParam,
+    register_stage,
+    parse_chain,
+    run_chain,
+    integrated_loudness
+)
 
+__all__ = [
+    "extract_text_from_file",
+    "iter_document",
+    "collect_document",
+    "configure_extraction_pool",
+    "shutdown_extraction_pool",
+    "chunk_text",
+    "iter_chunks",
+    "spool_upload",
+    "UploadTooLarge",
+    "wav_stream_header",
+    "float_to_pcm16",
+    "AUDIO_FORMATS",
+    "AudioFormat",
+    "format_for_file",
+    "transcode",
+    "PROCESSING_STAGES",
+    "ProcessingParam",
+    "register_stage",
+    "parse_chain",
+    "run_chain",
+    "integrated_loudness",
+    "PhraseBuffer"
+]
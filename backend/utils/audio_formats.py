@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import soundfile as sf
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    extension: str
+    media_type: str
+    container: str
+    subtype: str
+    # Sample rates the encoder accepts; empty means any
+    sample_rates: Tuple[int, ...] = ()
+
+
+AUDIO_FORMATS: Dict[str, AudioFormat] = {
+    "wav": AudioFormat(".wav", "audio/wav", "WAV", "PCM_16"),
+    "flac": AudioFormat(".flac", "audio/flac", "FLAC", "PCM_16"),
+    "opus": AudioFormat(".opus", "audio/ogg", "OGG", "OPUS", (8000, 12000, 16000, 24000, 48000)),
+    "mp3": AudioFormat(".mp3", "audio/mpeg", "MP3", "MPEG_LAYER_III"),
+}
+
+
+def format_for_file(path: Path) -> Optional[str]:
+    """Format id for a file extension, or None if it is not an output format"""
+    suffix = path.suffix.lower()
+    for format_id, audio_format in AUDIO_FORMATS.items():
+        if audio_format.extension == suffix:
+            return format_id
+    return None
+
+
+def transcode(source: Path, target: Path, format_id: str):
+    """
+    Encode an audio file into one of AUDIO_FORMATS
+
+    Blocking; run it off the event loop. Audio is resampled to the nearest
+    supported rate when the encoder does not accept the source rate.
+    """
+    audio_format = AUDIO_FORMATS[format_id]
+    data, sample_rate = sf.read(str(source), dtype="float32", always_2d=True)
+
+    if audio_format.sample_rates and sample_rate not in audio_format.sample_rates:
+        import librosa
+
+        higher = [rate for rate in audio_format.sample_rates if rate >= sample_rate]
+        target_rate = min(higher) if higher else max(audio_format.sample_rates)
+        data = librosa.resample(data.T, orig_sr=sample_rate, target_sr=target_rate).T
+        sample_rate = target_rate
+
+    sf.write(
+        str(target),
+        data,
+        sample_rate,
+        format=audio_format.container,
+        subtype=audio_format.subtype
+    )
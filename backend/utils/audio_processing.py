@@ -0,0 +1,280 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# A stage maps (mono float32 waveform, sample rate, **params) to a new waveform and rate
+StageFunction = Callable[..., Tuple[np.ndarray, int]]
+Chain = List[Tuple[str, Dict[str, float]]]
+
+# The model's watermark goes after level and rate changes, before fades
+WATERMARK_ORDER = 40
+
+# ITU-R BS.1770 K-weighting: a high shelf then a high pass
+_SHELF_GAIN_DB = 3.99984385397
+_SHELF_Q = 0.7071752369554193
+_SHELF_HZ = 1681.9744509555319
+_HIGHPASS_Q = 0.5003270373253953
+_HIGHPASS_HZ = 38.13547087613982
+_BLOCK_SECONDS = 0.4
+_BLOCK_HOP_SECONDS = 0.1
+_ABSOLUTE_GATE_LUFS = -70.0
+_RELATIVE_GATE_LU = -10.0
+
+
+@dataclass(frozen=True)
+class ProcessingParam:
+    default: Optional[float]
+    min: float
+    max: float
+    integer: bool = False
+
+
+@dataclass(frozen=True)
+class ProcessingStage:
+    name: str
+    apply: StageFunction
+    order: int
+    params: Dict[str, ProcessingParam]
+
+
+PROCESSING_STAGES: Dict[str, ProcessingStage] = {}
+
+
+def register_stage(name: str, order: int, **params: ProcessingParam):
+    """
+    Add a post-processing stage that requests can enable by name
+
+    Stages always run in `order`, whatever order a request lists them in.
+    A param whose default is None is required.
+    """
+    def register(apply: StageFunction) -> StageFunction:
+        PROCESSING_STAGES[name] = ProcessingStage(name, apply, order, params)
+        return apply
+    return register
+
+
+def parse_chain(options: Optional[Dict[str, Any]]) -> Chain:
+    """
+    Validate a request's post-processing options into an ordered chain
+
+    `options` maps stage names to `true` (all defaults), `false`/`null` (off)
+    or an object of camelCase params. Raises ValueError for unknown stages or
+    params and for values out of range.
+    """
+    chain = []
+    for name, value in (options or {}).items():
+        stage = PROCESSING_STAGES.get(name)
+        if stage is None:
+            raise ValueError(f"Unknown post-processing stage '{name}'; one of: {', '.join(PROCESSING_STAGES)}")
+        if value is None or value is False:
+            continue
+        given = {} if value is True else value
+        if not isinstance(given, dict):
+            raise ValueError(f"Post-processing stage '{name}' takes true or an object of params")
+
+        unknown = set(given) - set(stage.params)
+        if unknown:
+            raise ValueError(f"Unknown params for '{name}': {', '.join(sorted(unknown))}")
+        params = {}
+        for param_name, param in stage.params.items():
+            raw = given.get(param_name, param.default)
+            if raw is None:
+                raise ValueError(f"Post-processing stage '{name}' requires '{param_name}'")
+            if isinstance(raw, bool) or not isinstance(raw, (int, float)):
+                raise ValueError(f"'{name}.{param_name}' must be a number")
+            if not param.min <= raw <= param.max:
+                raise ValueError(f"'{name}.{param_name}' must be between {param.min:g} and {param.max:g}")
+            params[param_name] = int(round(raw)) if param.integer else float(raw)
+        chain.append((name, params))
+    return sorted(chain, key=lambda item: PROCESSING_STAGES[item[0]].order)
+
+
+def run_chain(
+    waveform: np.ndarray,
+    sample_rate: int,
+    chain: Chain,
+    watermark: Optional[Callable[[np.ndarray, int], np.ndarray]] = None,
+    on_stage: Optional[Callable[[str], Any]] = None
+) -> Tuple[np.ndarray, int]:
+    """
+    Apply a parsed chain, inserting `watermark` at WATERMARK_ORDER
+
+    `on_stage(name)` may return a context manager that wraps each stage, e.g.
+    a timing span.
+    """
+    waveform = np.asarray(waveform, dtype=np.float32).reshape(-1)
+
+    def run(name: str, apply: Callable[[], Tuple[np.ndarray, int]]) -> Tuple[np.ndarray, int]:
+        if on_stage is None:
+            return apply()
+        with on_stage(name):
+            return apply()
+
+    for name, params in chain:
+        stage = PROCESSING_STAGES[name]
+        if watermark is not None and stage.order > WATERMARK_ORDER:
+            waveform = np.asarray(watermark(waveform, sample_rate), dtype=np.float32)
+            watermark = None
+        waveform, sample_rate = run(name, lambda: stage.apply(waveform, sample_rate, **params))
+    if watermark is not None:
+        waveform = np.asarray(watermark(waveform, sample_rate), dtype=np.float32)
+    return waveform, sample_rate
+
+
+@register_stage(
+    "trim",
+    order=10,
+    thresholdDb=ProcessingParam(-50.0, -120.0, 0.0),
+    padMs=ProcessingParam(30.0, 0.0, 2000.0)
+)
+def trim_silence(waveform: np.ndarray, sample_rate: int, thresholdDb: float, padMs: float):
+    """Cut leading and trailing 10 ms frames quieter than `thresholdDb` RMS, keeping `padMs`"""
+    frame = max(1, sample_rate // 100)
+    frames = len(waveform) // frame
+    if frames == 0:
+        return waveform, sample_rate
+
+    rms = np.sqrt(np.mean(np.square(waveform[:frames * frame].reshape(frames, frame)), axis=1))
+    loud = np.flatnonzero(rms > 10 ** (thresholdDb / 20))
+    if len(loud) == 0:
+        return waveform, sample_rate
+
+    pad = int(sample_rate * padMs / 1000)
+    start = max(0, loud[0] * frame - pad)
+    end = len(waveform) if loud[-1] == frames - 1 else min(len(waveform), (loud[-1] + 1) * frame + pad)
+    return waveform[start:end], sample_rate
+
+
+@register_stage(
+    "normalize",
+    order=20,
+    lufs=ProcessingParam(-16.0, -60.0, 0.0),
+    peakDb=ProcessingParam(-1.0, -30.0, 0.0)
+)
+def normalize_loudness(waveform: np.ndarray, sample_rate: int, lufs: float, peakDb: float):
+    """Scale to `lufs` integrated loudness, then down to `peakDb` if that would clip"""
+    loudness = integrated_loudness(waveform, sample_rate)
+    if not np.isfinite(loudness):
+        return waveform, sample_rate
+
+    output = waveform * np.float32(10 ** ((lufs - loudness) / 20))
+    peak = float(np.max(np.abs(output))) if len(output) else 0.0
+    ceiling = 10 ** (peakDb / 20)
+    if peak > ceiling:
+        output *= np.float32(ceiling / peak)
+    return output, sample_rate
+
+
+@register_stage(
+    "resample",
+    order=30,
+    sampleRate=ProcessingParam(None, 8000, 48000, integer=True)
+)
+def resample(waveform: np.ndarray, sample_rate: int, sampleRate: int):
+    """Band-limited resampling in the frequency domain"""
+    if sampleRate == sample_rate or len(waveform) == 0:
+        return waveform, sample_rate
+
+    # Reflected edges keep the FFT's wrap-around away from the audio itself. The
+    # padding is in whole steps of the rate ratio, so the output starts exactly
+    # on an output sample and keeps the exact rate.
+    step = sample_rate // math.gcd(sample_rate, sampleRate)
+    pad = -(-(sample_rate // 20) // step) * step
+    tail = pad + (-len(waveform)) % step
+    padded = np.pad(waveform, (pad, tail), mode="reflect")
+    n_out = len(padded) * sampleRate // sample_rate
+    spectrum = np.fft.rfft(padded)
+    resampled = np.zeros(n_out // 2 + 1, dtype=spectrum.dtype)
+    bins = min(len(spectrum), len(resampled))
+    resampled[:bins] = spectrum[:bins]
+    output = np.fft.irfft(resampled, n_out) * (n_out / len(padded))
+
+    out_pad = pad * sampleRate // sample_rate
+    length = int(round(len(waveform) * sampleRate / sample_rate))
+    return output[out_pad:out_pad + length].astype(np.float32), sampleRate
+
+
+@register_stage(
+    "fade",
+    order=50,
+    inMs=ProcessingParam(10.0, 0.0, 10000.0),
+    outMs=ProcessingParam(10.0, 0.0, 10000.0)
+)
+def fade(waveform: np.ndarray, sample_rate: int, inMs: float, outMs: float):
+    """Linear fade-in and fade-out"""
+    output = waveform.copy()
+    fade_in = min(len(output), int(sample_rate * inMs / 1000))
+    fade_out = min(len(output), int(sample_rate * outMs / 1000))
+    if fade_in:
+        output[:fade_in] *= np.linspace(0.0, 1.0, fade_in, endpoint=False, dtype=np.float32)
+    if fade_out:
+        output[len(output) - fade_out:] *= np.linspace(1.0, 0.0, fade_out, dtype=np.float32)
+    return output, sample_rate
+
+
+def integrated_loudness(waveform: np.ndarray, sample_rate: int) -> float:
+    """
+    Integrated loudness in LUFS per ITU-R BS.1770 (mono), -inf for silence
+
+    The K-weighting filter is applied as one FFT multiply and the gating
+    blocks' mean squares come from a cumulative sum, so there is no per-sample
+    Python loop.
+    """
+    if len(waveform) == 0:
+        return float("-inf")
+
+    # Zero padding absorbs the filter's tail instead of wrapping it onto the start
+    n_fft = 1 << int(np.ceil(np.log2(len(waveform) + sample_rate // 10)))
+    weighted = np.fft.irfft(np.fft.rfft(waveform, n_fft) * _k_weighting(n_fft, sample_rate), n_fft)
+    power = np.square(weighted[:len(waveform)])
+
+    block = int(sample_rate * _BLOCK_SECONDS)
+    if len(power) < block:
+        blocks = np.array([power.mean()])
+    else:
+        cumulative = np.concatenate(([0.0], np.cumsum(power)))
+        starts = np.arange(0, len(power) - block + 1, int(sample_rate * _BLOCK_HOP_SECONDS))
+        blocks = (cumulative[starts + block] - cumulative[starts]) / block
+
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[block_loudness > _ABSOLUTE_GATE_LUFS]
+    if len(gated) == 0:
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + _RELATIVE_GATE_LU
+    gated = blocks[(block_loudness > _ABSOLUTE_GATE_LUFS) & (block_loudness > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def _k_weighting(n_fft: int, sample_rate: int) -> np.ndarray:
+    """Frequency response of the K-weighting filter at the rfft bins (libebur128's design)"""
+    z = np.exp(-1j * np.pi * np.arange(n_fft // 2 + 1) / (n_fft // 2))
+
+    k = np.tan(np.pi * _SHELF_HZ / sample_rate)
+    shelf_gain = 10 ** (_SHELF_GAIN_DB / 20)
+    band_gain = shelf_gain ** 0.4996667741545416
+    a0 = 1 + k / _SHELF_Q + k * k
+    shelf = _biquad_response(
+        z,
+        (
+            (shelf_gain + band_gain * k / _SHELF_Q + k * k) / a0,
+            2 * (k * k - shelf_gain) / a0,
+            (shelf_gain - band_gain * k / _SHELF_Q + k * k) / a0
+        ),
+        (1.0, 2 * (k * k - 1) / a0, (1 - k / _SHELF_Q + k * k) / a0)
+    )
+
+    k = np.tan(np.pi * _HIGHPASS_HZ / sample_rate)
+    a0 = 1 + k / _HIGHPASS_Q + k * k
+    highpass = _biquad_response(
+        z,
+        (1.0, -2.0, 1.0),
+        (1.0, 2 * (k * k - 1) / a0, (1 - k / _HIGHPASS_Q + k * k) / a0)
+    )
+    return shelf * highpass
+
+
+def _biquad_response(z: np.ndarray, b: Tuple[float, ...], a: Tuple[float, ...]) -> np.ndarray:
+    return (b[0] + b[1] * z + b[2] * z ** 2) / (a[0] + a[1] * z + a[2] * z ** 2)
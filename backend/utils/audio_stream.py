@@ -0,0 +1,32 @@
+import struct
+
+import numpy as np
+
+# RIFF/data sizes used when the total length is unknown up front
+STREAMING_SIZE = 0xFFFFFFFF
+
+
+def wav_stream_header(sample_rate: int, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """
+    WAV header for a stream of unknown length
+
+    Both size fields are set to the maximum value, which players treat as
+    "read until end of stream".
+    """
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return (
+        b"RIFF"
+        + struct.pack("<I", STREAMING_SIZE)
+        + b"WAVE"
+        + b"fmt "
+        + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample)
+        + b"data"
+        + struct.pack("<I", STREAMING_SIZE)
+    )
+
+
+def float_to_pcm16(waveform: np.ndarray) -> bytes:
+    """Convert a float waveform in [-1, 1] to little-endian 16-bit PCM bytes"""
+    clipped = np.clip(np.asarray(waveform, dtype=np.float32).reshape(-1), -1.0, 1.0)
+    return (clipped * 32767.0).astype("<i2").tobytes()
@@ -1,115 +1,236 @@
-import io
+import asyncio
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
-import PyPDF2
-import docx
+from typing import Dict, Any, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
 
-async def extract_text_from_file(file_content: bytes, filename: str) -> Dict[str, Any]:
+_PARAGRAPH_BOUNDARY = re.compile(r"\n\s*\n")
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+")
+
+# PDF pages are extracted in ranges of this size, one range per pool task
+PAGES_PER_TASK = 8
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_processes = 0
+
+
+def configure_extraction_pool(processes: int = 0, pages_per_task: int = PAGES_PER_TASK):
+    """Set the PDF extraction pool size (0 = one process per CPU) and task granularity"""
+    global _pool_processes, PAGES_PER_TASK
+    _pool_processes = processes
+    PAGES_PER_TASK = max(1, pages_per_task)
+
+
+def shutdown_extraction_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_pool_processes or os.cpu_count())
+    return _pool
+
+
+# PyPDF2 and python-docx are imported on first use; they add noticeably to server startup
+def _pdf_page_count(path: str) -> int:
+    import PyPDF2
+
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def _extract_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(path)
+    return [reader.pages[index].extract_text() for index in range(start, stop)]
+
+
+def _extract_docx(path: str) -> Tuple[str, int]:
+    import docx
+
+    doc = docx.Document(path)
+    text_parts = [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
+    return "\n\n".join(text_parts), len(doc.paragraphs)
+
+
+def _metadata(filename: str, file_format: str, text_length: int, word_count: int, **extra) -> Dict[str, Any]:
+    return {
+        "filename": filename,
+        "format": file_format,
+        **extra,
+        "wordCount": word_count,
+        "characterCount": text_length
+    }
+
+
+async def iter_document(path: Path, filename: str) -> AsyncIterator[Dict[str, Any]]:
     """
-    Extract text from uploaded file
+    Extract a document as a sequence of records, without blocking the event loop
+    
+    PDFs yield one `{"type": "page", "page": n, "text": ...}` record per page, in
+    order, as the process pool finishes each page range. Text and Word files
+    yield a single `{"type": "text", ...}` record. The last record is
+    `{"type": "done", "metadata": {...}}`.
     
     Args:
-        file_content: File content as bytes
-        filename: Original filename
-        
-    Returns:
-        Dict with extracted text and metadata
+        path: File on disk
+        filename: Original filename, used for the format and metadata
     """
     file_extension = Path(filename).suffix.lower()
+    loop = asyncio.get_running_loop()
     
     if file_extension == ".txt":
-        text = file_content.decode("utf-8")
-        word_count = len(text.split())
-        
-        return {
-            "text": text,
-            "metadata": {
-                "filename": filename,
-                "format": "txt",
-                "wordCount": word_count,
-                "characterCount": len(text)
-            }
-        }
+        try:
+            text = await asyncio.to_thread(path.read_text, encoding="utf-8")
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Failed to decode text file: {str(e)}")
+        yield {"type": "text", "text": text}
+        yield {"type": "done", "metadata": _metadata(filename, "txt", len(text), len(text.split()))}
     
     elif file_extension == ".pdf":
+        pool = _get_pool()
+        futures = []
         try:
-            pdf_file = io.BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            page_count = await loop.run_in_executor(pool, _pdf_page_count, str(path))
+            futures = [
+                asyncio.wrap_future(pool.submit(_extract_pdf_pages, str(path), start, min(start + PAGES_PER_TASK, page_count)))
+                for start in range(0, page_count, PAGES_PER_TASK)
+            ]
             
-            text_parts = []
-            for page in pdf_reader.pages:
-                text_parts.append(page.extract_text())
-            
-            text = "\n\n".join(text_parts)
-            word_count = len(text.split())
-            
-            return {
-                "text": text,
-                "metadata": {
-                    "filename": filename,
-                    "format": "pdf",
-                    "pages": len(pdf_reader.pages),
-                    "wordCount": word_count,
-                    "characterCount": len(text)
-                }
-            }
+            characters = 0
+            words = 0
+            page_number = 0
+            for future in futures:
+                for page_text in await future:
+                    page_number += 1
+                    # Pages are joined with a blank line, as in the full text
+                    characters += len(page_text) + (2 if page_number > 1 else 0)
+                    words += len(page_text.split())
+                    yield {"type": "page", "page": page_number, "text": page_text}
         except Exception as e:
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+        finally:
+            for future in futures:
+                future.cancel()
+        
+        yield {"type": "done", "metadata": _metadata(filename, "pdf", characters, words, pages=page_count)}
     
     elif file_extension in [".docx", ".doc"]:
         try:
-            docx_file = io.BytesIO(file_content)
-            doc = docx.Document(docx_file)
-            
-            text_parts = [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
-            text = "\n\n".join(text_parts)
-            word_count = len(text.split())
-            
-            return {
-                "text": text,
-                "metadata": {
-                    "filename": filename,
-                    "format": "docx",
-                    "paragraphs": len(doc.paragraphs),
-                    "wordCount": word_count,
-                    "characterCount": len(text)
-                }
-            }
+            text, paragraphs = await loop.run_in_executor(None, _extract_docx, str(path))
         except Exception as e:
             raise ValueError(f"Failed to extract text from DOCX: {str(e)}")
+        yield {"type": "text", "text": text}
+        yield {
+            "type": "done",
+            "metadata": _metadata(filename, "docx", len(text), len(text.split()), paragraphs=paragraphs)
+        }
     
     else:
         raise ValueError(f"Unsupported file format: {file_extension}")
 
 
-def chunk_text(text: str, max_chars: int = 4000) -> list[str]:
+def collect_document(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Join extraction records into the `{"text", "metadata"}` result"""
+    text = "\n\n".join(record["text"] for record in records if record["type"] in ("page", "text"))
+    metadata = next(record["metadata"] for record in records if record["type"] == "done")
+    return {"text": text, "metadata": metadata}
+
+
+async def extract_text_from_file(file_content: bytes, filename: str) -> Dict[str, Any]:
     """
-    Split text into chunks for processing
+    Extract text from uploaded file
     
     Args:
-        text: Text to split
-        max_chars: Maximum characters per chunk
+        file_content: File content as bytes
+        filename: Original filename
         
     Returns:
-        List of text chunks
+        Dict with extracted text and metadata
     """
+    with tempfile.NamedTemporaryFile(suffix=Path(filename).suffix, delete=False) as f:
+        f.write(file_content)
+        path = Path(f.name)
+    try:
+        return collect_document([record async for record in iter_document(path, filename)])
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def _split_long(text: str, max_chars: int) -> Iterator[str]:
+    """Break text longer than `max_chars` at sentence, then word boundaries"""
     if len(text) <= max_chars:
-        return [text]
+        yield text
+        return
+    
+    for sentence in _SENTENCE_BOUNDARY.split(text):
+        if len(sentence) <= max_chars:
+            yield sentence
+            continue
+        for word in sentence.split():
+            # A single word longer than a chunk is cut hard
+            for start in range(0, len(word), max_chars):
+                yield word[start:start + max_chars]
+
+
+def iter_chunks(texts: Iterable[str], max_chars: int = 4000) -> Iterator[str]:
+    """
+    Lazily split text into chunks of at most `max_chars` characters
     
-    chunks = []
-    paragraphs = text.split("\n\n")
-    current_chunk = ""
+    Paragraphs (separated by blank lines) are packed together while they fit.
+    Longer paragraphs are split at sentence boundaries, and sentences at word
+    boundaries, so no chunk exceeds the limit. Only the chunk being built is
+    kept in memory.
     
-    for para in paragraphs:
-        if len(current_chunk) + len(para) + 2 <= max_chars:
-            current_chunk += para + "\n\n"
-        else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = para + "\n\n"
+    Args:
+        texts: Text pieces, e.g. extracted pages; piece boundaries count as
+            paragraph breaks
+        max_chars: Maximum characters per chunk
+        
+    Yields:
+        Text chunks
+    """
+    parts: List[str] = []
+    length = 0
+    separator = ""
     
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+    for text in texts:
+        for paragraph in _PARAGRAPH_BOUNDARY.split(text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            # Paragraphs are joined with a blank line, pieces of one paragraph with a space
+            separator = "\n\n"
+            for piece in _split_long(paragraph, max_chars):
+                if parts and length + len(separator) + len(piece) > max_chars:
+                    yield "".join(parts)
+                    parts, length = [], 0
+                if parts:
+                    parts.append(separator)
+                    length += len(separator)
+                parts.append(piece)
+                length += len(piece)
+                separator = " "
     
-    return chunks
+    if parts:
+        yield "".join(parts)
+
 
+def chunk_text(text: str, max_chars: int = 4000) -> list[str]:
+    """
+    Split text into chunks for processing
+    
+    Args:
+        text: Text to split
+        max_chars: Maximum characters per chunk
+        
+    Returns:
+        List of text chunks
+    """
+    return list(iter_chunks([text], max_chars))
@@ -0,0 +1,86 @@
+import re
+from typing import List, Optional
+
+# Sentence ends and line breaks; the whitespace after them confirms the boundary
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*\s+|\n+")
+# Clause breaks, used once a phrase is long enough that waiting costs latency
+_CLAUSE_END = re.compile(r"[,;:]\s+|\s+[–—-]+\s+")
+# A period after these is not a sentence end
+_ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "no", "approx"
+})
+
+
+class PhraseBuffer:
+    """
+    Collects text as it arrives in small deltas and releases whole phrases
+
+    A phrase ends at a sentence boundary once it has `min_chars`, at a clause
+    boundary (comma, semicolon, dash) once it has `clause_chars`, or at the
+    last space before `max_chars` when no boundary comes. A boundary only
+    counts once the whitespace after it has arrived, so "3." followed by
+    "14" is not split.
+    """
+
+    def __init__(self, min_chars: int = 8, clause_chars: int = 60, max_chars: int = 300):
+        self.min_chars = min_chars
+        self.clause_chars = clause_chars
+        self.max_chars = max_chars
+        self._text = ""
+
+    def push(self, delta: str) -> List[str]:
+        """Add a text delta and return the phrases it completed"""
+        self._text += delta
+        phrases = []
+        while True:
+            cut = self._next_cut()
+            if cut is None:
+                return phrases
+            phrase = self._text[:cut].strip()
+            self._text = self._text[cut:]
+            if phrase:
+                phrases.append(phrase)
+
+    def flush(self) -> Optional[str]:
+        """Release whatever is buffered as a phrase"""
+        phrase = self._text.strip()
+        self._text = ""
+        return phrase or None
+
+    def clear(self):
+        self._text = ""
+
+    def __len__(self) -> int:
+        return len(self._text)
+
+    def _next_cut(self) -> Optional[int]:
+        text = self._text
+        # Leading whitespace is not part of the phrase
+        offset = len(text) - len(text.lstrip())
+
+        for match in _SENTENCE_END.finditer(text, offset):
+            if match.end() - offset > self.max_chars:
+                break
+            if match.start() - offset >= self.min_chars and not self._is_abbreviation(match.start()):
+                return match.end()
+
+        for match in _CLAUSE_END.finditer(text, offset):
+            if match.end() - offset > self.max_chars:
+                break
+            if match.start() - offset >= self.clause_chars:
+                return match.end()
+
+        if len(text) - offset > self.max_chars:
+            limit = offset + self.max_chars
+            space = text.rfind(" ", offset, limit)
+            return space + 1 if space > offset else limit
+        return None
+
+    def _is_abbreviation(self, end: int) -> bool:
+        text = self._text
+        if not text.startswith(".", end):
+            return False
+        start = end
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+        return text[start:end].lower() in _ABBREVIATIONS
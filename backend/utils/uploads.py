@@ -0,0 +1,46 @@
+import hashlib
+import uuid
+from pathlib import Path
+from typing import Tuple
+
+from fastapi import UploadFile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds its size limit"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes / (1024 * 1024):g} MB limit")
+        self.max_bytes = max_bytes
+
+
+async def spool_upload(upload: UploadFile, directory: Path, max_bytes: int) -> Tuple[Path, str]:
+    """
+    Copy an upload to disk in chunks, enforcing a size limit
+
+    Args:
+        upload: Incoming multipart file
+        directory: Where to write the spooled copy
+        max_bytes: Largest accepted upload
+
+    Returns:
+        Path of the spooled file (the caller deletes it) and its SHA-256 hex digest
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"upload_{uuid.uuid4().hex}{Path(upload.filename or '').suffix.lower()}"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path, digest.hexdigest()
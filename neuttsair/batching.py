@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+@dataclass
+class _Job:
+    payload: Any
+    cancel_event: threading.Event | None = None
+    future: Future = field(default_factory=Future)
+
+
+class BatchScheduler:
+    """
+    Dynamic micro-batching of backbone generation and codec decode.
+
+    Calls from many request threads are queued. A worker per stage takes the first
+    waiting job, keeps collecting for up to `max_wait_ms` or until `max_batch_size`
+    jobs are waiting, and runs them as one batch. Generation and decode have separate
+    workers, so one batch decodes while the next one generates.
+
+    Seeded generations are not batched so they stay reproducible; callers run them
+    directly instead of queueing them behind batches. The codec decoder attends over
+    the whole sequence, so padding changes the decoded audio slightly. A code sequence
+    only shares a decode batch with ones at most `decode_pad_ratio` longer than it
+    (0 for equal lengths only, 1 for any), which bounds the padding.
+    """
+
+    def __init__(self, tts, max_batch_size: int = 8, max_wait_ms: float = 5.0, decode_pad_ratio: float = 0.1):
+        self.tts = tts
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.decode_pad_ratio = min(max(0.0, decode_pad_ratio), 1.0)
+        self.batches = 0
+        self.batched_jobs = 0
+
+        self._closed = False
+        self._generate_queue: queue.Queue[_Job | None] = queue.Queue()
+        self._decode_queue: queue.Queue[_Job | None] = queue.Queue()
+        self._workers = [
+            threading.Thread(
+                target=self._run, args=(self._generate_queue, self._generate_batch),
+                name="neutts-batch-generate", daemon=True,
+            ),
+            threading.Thread(
+                target=self._run, args=(self._decode_queue, self._decode_batch),
+                name="neutts-batch-decode", daemon=True,
+            ),
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def generate(self, prompt, cancel_event: threading.Event | None = None):
+        """Generate one unseeded prompt, batched with whatever else is waiting."""
+        return self._submit(self._generate_queue, _Job(prompt, cancel_event))
+
+    def decode(self, codes):
+        """Decode one code sequence to a waveform, batched with other decodes."""
+        return self._submit(self._decode_queue, _Job(codes))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._generate_queue.put(None)
+        self._decode_queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "jobs": self.batched_jobs,
+            "mean_batch_size": self.batched_jobs / self.batches if self.batches else 0.0,
+            "waiting": self._generate_queue.qsize() + self._decode_queue.qsize(),
+        }
+
+    def _submit(self, jobs: queue.Queue, job: _Job):
+        if self._closed:
+            raise RuntimeError("Batch scheduler is closed.")
+        jobs.put(job)
+        return job.future.result()
+
+    def _run(self, jobs: queue.Queue, process: Callable[[list[_Job]], None]):
+        stopping = False
+        while not stopping:
+            job = jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    job = jobs.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+
+            batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            if batch:
+                self.batches += 1
+                self.batched_jobs += len(batch)
+                process(batch)
+
+        # Fail whatever arrived after close() instead of leaving callers blocked
+        while True:
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None and job.future.set_running_or_notify_cancel():
+                job.future.set_exception(RuntimeError("Batch scheduler is closed."))
+
+    def _generate_batch(self, batch: list[_Job]):
+        pending = []
+        for job in batch:
+            if job.cancel_event is not None and job.cancel_event.is_set():
+                # The caller raises GenerationCancelled when it sees the event
+                job.future.set_result(None)
+            else:
+                pending.append(job)
+
+        if len(pending) == 1:
+            # A lone request keeps the prefix-cache path
+            job = pending[0]
+            self._resolve(pending, lambda: [self.tts._generate_unbatched(job.payload, job.cancel_event)])
+        elif pending:
+            self._resolve(pending, lambda: self.tts._infer_torch_batch(
+                [job.payload.content for job in pending], [job.cancel_event for job in pending]
+            ))
+
+    def _decode_batch(self, batch: list[_Job]):
+        # Longest first; each group takes the sequences within the ratio of its longest
+        groups = []
+        for job in sorted(batch, key=lambda job: len(job.payload), reverse=True):
+            if groups and len(job.payload) >= (1 - self.decode_pad_ratio) * len(groups[-1][0].payload):
+                groups[-1].append(job)
+            else:
+                groups.append([job])
+
+        for group in groups:
+            self._resolve(group, lambda group=group: self.tts._decode_codes_batch(
+                [job.payload for job in group]
+            ))
+
+    @staticmethod
+    def _resolve(jobs: list[_Job], run: Callable[[], list]):
+        try:
+            results = run()
+        except BaseException as e:
+            for job in jobs:
+                job.future.set_exception(e)
+            return
+        for job, result in zip(jobs, results):
+            job.future.set_result(result)
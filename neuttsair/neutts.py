@@ -2,21 +2,241 @@ from phonemizer.backend.espeak.wrapper import EspeakWrapper
 _ESPEAK_LIBRARY = '/opt/homebrew/Cellar/espeak/1.48.04_1/lib/libespeak.1.1.48.dylib'  #use the Path to the library.
 EspeakWrapper.set_library(_ESPEAK_LIBRARY)
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-import librosa
+from typing import Callable, Generator
+import contextvars
+import copy
+import threading
+import time
 import numpy as np
 import torch
 import re
-try:
-    import perth
-    PERTH_AVAILABLE = True
-except ImportError:
-    PERTH_AVAILABLE = False
-    print("⚠️  Perth watermarking not available (optional feature)")
-from neucodec import NeuCodec, DistillNeuCodec
-from phonemizer.backend import EspeakBackend
-from transformers import AutoTokenizer, AutoModelForCausalLM
+# librosa, neucodec and perth are imported where they are used, so only the
+# pieces a configuration needs are loaded
+from .batching import BatchScheduler
+from .phonemes import CachedPhonemizer
+from .prefix_cache import PrefixCache
+from transformers import (
+    AutoTokenizer, AutoModelForCausalLM, LogitsProcessor, LogitsProcessorList, StoppingCriteria,
+    StoppingCriteriaList,
+)
+
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+|\n+")
+
+
+def split_sentences(text: str, min_chars: int = 20) -> list[str]:
+    """
+    Split text on sentence boundaries, merging fragments shorter than `min_chars`
+    into the following sentence so each segment is worth a backbone pass.
+    """
+    sentences = []
+    pending = ""
+    for part in _SENTENCE_BOUNDARY.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        pending = f"{pending} {part}" if pending else part
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+_SPEECH_TOKEN = re.compile(r"<\|speech_(\d+)\|>")
+_SPEECH_TOKEN_EXACT = re.compile(r"^<\|speech_(\d+)\|>$")
+
+# Template tokens around the phonemes and reference codes in a prompt, rounded up
+PROMPT_OVERHEAD_TOKENS = 32
+
+
+def _split_to_length(sentence: str, max_chars: int) -> list[str]:
+    """Break a sentence longer than `max_chars` at word boundaries."""
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    pieces = []
+    current = ""
+    for word in sentence.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def crossfade_concat(segments: list[np.ndarray], fade_samples: int) -> np.ndarray:
+    """Concatenate waveforms, overlapping each boundary with a linear crossfade."""
+    if not segments:
+        return np.zeros(0, dtype=np.float32)
+
+    total = sum(len(seg) for seg in segments)
+    fades = [
+        min(fade_samples, len(prev), len(cur)) for prev, cur in zip(segments, segments[1:])
+    ]
+    out = np.zeros(total - sum(fades), dtype=np.result_type(*segments, np.float32))
+
+    pos = 0
+    for i, seg in enumerate(segments):
+        fade = fades[i - 1] if i > 0 else 0
+        start = pos - fade
+        if fade:
+            ramp = np.linspace(0.0, 1.0, fade, endpoint=False, dtype=out.dtype)
+            out[start:pos] = out[start:pos] * (1.0 - ramp) + seg[:fade] * ramp
+        out[pos:pos + len(seg) - fade] = seg[fade:]
+        pos += len(seg) - fade
+    return out
+
+
+# Torch modules loaded by preload_weights(), keyed by (kind, repo, device, dtype)
+_PRELOADED: dict[tuple[str, str, str, str | None], object] = {}
+
+_TORCH_CODECS = ("neuphonic/neucodec", "neuphonic/distill-neucodec")
+
+# Codec used to encode references when the configured codec can only decode
+DEFAULT_ENCODER_REPO = "neuphonic/neucodec"
+
+BACKBONE_DTYPES = ("float32", "bfloat16", "float16")
+
+
+def preload_weights(
+    backbone_repo: str, codec_repo: str, device: str = "cpu", backbone_dtype: str | None = None
+) -> list[str]:
+    """
+    Load the torch backbone and codec before any NeuTTSAir is constructed.
+
+    Instances created afterwards with the same repos and device reuse these
+    modules instead of loading their own copy, so loading them in a parent
+    process before forking workers lets every worker share the weight pages
+    copy-on-write. GGUF backbones are already memory-mapped by llama.cpp and
+    the ONNX decoder owns a native session, so neither is preloaded.
+
+    Returns the repos that were preloaded.
+    """
+    preloaded = []
+    if not backbone_repo.endswith("gguf"):
+        key = ("backbone", backbone_repo, device, backbone_dtype)
+        if key not in _PRELOADED:
+            _PRELOADED[key] = _load_torch_backbone(backbone_repo, device, backbone_dtype)
+        preloaded.append(backbone_repo)
+    if codec_repo in _TORCH_CODECS:
+        key = ("codec", codec_repo, device, None)
+        if key not in _PRELOADED:
+            _PRELOADED[key] = _load_torch_codec(codec_repo, device)
+        preloaded.append(codec_repo)
+    return preloaded
+
+
+def _load_torch_backbone(backbone_repo: str, device: str, dtype: str | None = None):
+    preloaded = _PRELOADED.get(("backbone", backbone_repo, device, dtype))
+    if preloaded is not None:
+        return preloaded
+    if dtype is not None and dtype not in BACKBONE_DTYPES:
+        raise ValueError(f"Backbone dtype must be one of: {', '.join(BACKBONE_DTYPES)}.")
+    tokenizer = AutoTokenizer.from_pretrained(backbone_repo)
+    backbone = AutoModelForCausalLM.from_pretrained(
+        backbone_repo, torch_dtype=getattr(torch, dtype) if dtype else None
+    ).to(torch.device(device))
+    return tokenizer, backbone
+
+
+def _load_torch_codec(codec_repo: str, device: str):
+    preloaded = _PRELOADED.get(("codec", codec_repo, device, None))
+    if preloaded is not None:
+        return preloaded
+    if codec_repo == "neuphonic/neucodec":
+        from neucodec import NeuCodec as codec_class
+    else:
+        from neucodec import DistillNeuCodec as codec_class
+    codec = codec_class.from_pretrained(codec_repo)
+    codec.eval().to(device)
+    return codec
+
+
+def _kv_cache_nbytes(cache) -> int:
+    """Size of a transformers KV cache across its layers."""
+    if hasattr(cache, "layers"):
+        tensors = [t for layer in cache.layers for t in (layer.keys, layer.values) if t is not None]
+    elif hasattr(cache, "key_cache"):
+        tensors = list(cache.key_cache) + list(cache.value_cache)
+    else:
+        tensors = [t for layer in cache for t in layer]
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+@dataclass
+class Prompt:
+    """A backbone prompt plus the voice-dependent prefix that can be served from cache."""
+
+    content: list[int] | str
+    prefix: list[int] | str
+
+
+class GenerationCancelled(Exception):
+    """Raised when inference is stopped through its cancel event."""
+
+
+class _CancelCriteria(StoppingCriteria):
+    """Stops `generate` as soon as the cancel event is set."""
+
+    def __init__(self, cancel_event: threading.Event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full(
+            (input_ids.shape[0],), self.cancel_event.is_set(), dtype=torch.bool, device=input_ids.device
+        )
+
+
+class _BatchCancelCriteria(StoppingCriteria):
+    """Stops each row of a batched `generate` once its own cancel event is set."""
+
+    def __init__(self, cancel_events: list[threading.Event | None]):
+        self.cancel_events = cancel_events
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.tensor(
+            [event is not None and event.is_set() for event in self.cancel_events],
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
+
+
+class _SeededSampler(LogitsProcessor):
+    """
+    Top-k sampling from a generator of its own, for use with greedy decoding.
 
+    The sampled token is the only one left with a finite score, so `generate`
+    picks it greedily. Seeded requests then neither reseed nor consume the
+    global RNG that concurrent generations sample from.
+    """
+
+    def __init__(self, seed: int, temperature: float = 1.0, top_k: int = 50):
+        self.seed = seed
+        self.temperature = temperature
+        self.top_k = top_k
+        self.generator: torch.Generator | None = None
+
+    def __call__(self, input_ids, scores):
+        if self.generator is None:
+            self.generator = torch.Generator(device=scores.device).manual_seed(self.seed)
+        top = torch.topk(scores / self.temperature, min(self.top_k, scores.shape[-1]), dim=-1)
+        probs = torch.softmax(top.values.float(), dim=-1)
+        choice = torch.multinomial(probs, 1, generator=self.generator)
+        tokens = top.indices.gather(-1, choice)
+        sampled = torch.full_like(scores, float("-inf"))
+        return sampled.scatter_(-1, tokens, 0.0)
 
 
 class NeuTTSAir:
@@ -27,6 +247,11 @@ class NeuTTSAir:
         backbone_device="cpu",
         codec_repo="neuphonic/neucodec",
         codec_device="cpu",
+        phonemizer_processes=0,
+        prefix_cache_mb=256,
+        backbone_dtype=None,
+        num_threads=0,
+        encoder_repo=None,
     ):
 
         # Consts
@@ -41,10 +266,35 @@ class NeuTTSAir:
         # HF tokenizer
         self.tokenizer = None
 
+        # Torch dtype of a transformers backbone, and CPU threads for llama.cpp and
+        # onnxruntime (0 leaves their defaults)
+        self.backbone_dtype = backbone_dtype
+        self.num_threads = num_threads
+
+        # An ONNX decoder cannot encode references; this codec is loaded for that on
+        # first use
+        self.encoder_repo = encoder_repo or DEFAULT_ENCODER_REPO
+        self._encoder = None
+        self._encoder_lock = threading.Lock()
+
+        # Backbone states for reference-voice prompt prefixes; llama.cpp is not thread-safe
+        self.prefix_cache = PrefixCache(int(prefix_cache_mb * 1024 * 1024))
+        self._ggml_lock = threading.Lock()
+
+        # Micro-batching scheduler, see enable_batching()
+        self.batcher = None
+
+        # Called as stage_hook(stage, seconds, details) after each inference stage
+        self.stage_hook: Callable[[str, float, dict], None] | None = None
+
         # Load phonemizer + models
         print("Loading phonemizer...")
-        self.phonemizer = EspeakBackend(
-            language="en-us", preserve_punctuation=True, with_stress=True
+        self.phonemizer = CachedPhonemizer(
+            language="en-us",
+            preserve_punctuation=True,
+            with_stress=True,
+            espeak_library=_ESPEAK_LIBRARY,
+            processes=phonemizer_processes,
         )
 
         self._load_backbone(backbone_repo, backbone_device)
@@ -52,10 +302,13 @@ class NeuTTSAir:
         self._load_codec(codec_repo, codec_device)
 
         # Load watermarker (optional)
-        if PERTH_AVAILABLE:
-            self.watermarker = perth.PerthImplicitWatermarker()
-        else:
+        try:
+            import perth
+        except ImportError:
+            print("⚠️  Perth watermarking not available (optional feature)")
             self.watermarker = None
+        else:
+            self.watermarker = perth.PerthImplicitWatermarker()
 
     def _load_backbone(self, backbone_repo, backbone_device):
         print(f"Loading backbone from: {backbone_repo} on {backbone_device} ...")
@@ -78,27 +331,24 @@ class NeuTTSAir:
                 verbose=False,
                 n_gpu_layers=-1 if backbone_device == "gpu" else 0,
                 n_ctx=self.max_context,
+                n_threads=self.num_threads or None,
                 mlock=True,
                 flash_attn=True if backbone_device == "gpu" else False,
             )
             self._is_quantized_model = True
 
         else:
-            self.tokenizer = AutoTokenizer.from_pretrained(backbone_repo)
-            self.backbone = AutoModelForCausalLM.from_pretrained(backbone_repo).to(
-                torch.device(backbone_device)
+            self.tokenizer, self.backbone = _load_torch_backbone(
+                backbone_repo, backbone_device, self.backbone_dtype
             )
+            self._init_token_ids()
 
     def _load_codec(self, codec_repo, codec_device):
 
         print(f"Loading codec from: {codec_repo} on {codec_device} ...")
         match codec_repo:
-            case "neuphonic/neucodec":
-                self.codec = NeuCodec.from_pretrained(codec_repo)
-                self.codec.eval().to(codec_device)
-            case "neuphonic/distill-neucodec":
-                self.codec = DistillNeuCodec.from_pretrained(codec_repo)
-                self.codec.eval().to(codec_device)
+            case "neuphonic/neucodec" | "neuphonic/distill-neucodec":
+                self.codec = _load_torch_codec(codec_repo, codec_device)
             case "neuphonic/neucodec-onnx-decoder":
 
                 if codec_device != "cpu":
@@ -113,6 +363,8 @@ class NeuTTSAir:
                     ) from e
 
                 self.codec = NeuCodecOnnxDecoder.from_pretrained(codec_repo)
+                if self.num_threads:
+                    self._limit_onnx_threads(codec_repo)
                 self._is_onnx_codec = True
 
             case _:
@@ -122,7 +374,46 @@ class NeuTTSAir:
                     " 'neuphonic/neucodec-onnx-decoder'."
                 )
 
-    def infer(self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str) -> np.ndarray:
+    def _limit_onnx_threads(self, codec_repo):
+        """Recreate the decoder's session with `num_threads` intra-op threads."""
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.num_threads
+        # Already downloaded by from_pretrained(), so this resolves from the local cache
+        onnx_path = hf_hub_download(repo_id=codec_repo, filename="model.onnx")
+        self.codec.session = onnxruntime.InferenceSession(onnx_path, sess_options=options)
+
+    def enable_batching(
+        self, max_batch_size: int = 8, max_wait_ms: float = 5.0, decode_pad_ratio: float = 0.1
+    ):
+        """
+        Route generation and codec decode through a micro-batching scheduler, so
+        concurrent `infer*` calls from different threads share backbone and codec passes.
+        GGUF backbones and seeded calls generate one request at a time; only their
+        decode is batched.
+        """
+        if self.batcher is None:
+            self.batcher = BatchScheduler(self, max_batch_size, max_wait_ms, decode_pad_ratio)
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+            self.batcher = None
+        self._encoder = None
+        self.phonemizer.close()
+
+    def infer(
+        self,
+        text: str,
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        cancel_event: threading.Event | None = None,
+        seed: int | None = None,
+        watermark: bool = True,
+    ) -> np.ndarray:
         """
         Perform inference to generate speech from text using the TTS model and reference audio.
 
@@ -130,49 +421,273 @@ class NeuTTSAir:
             text (str): Input text to be converted to speech.
             ref_codes (np.ndarray | torch.tensor): Encoded reference.
             ref_text (str): Reference text for reference audio. Defaults to None.
+            cancel_event (threading.Event | None): When set, token generation stops early
+                and GenerationCancelled is raised.
+            seed (int | None): Seed for sampling, for reproducible output.
+            watermark (bool): Apply the watermark here. Callers that post-process the
+                audio elsewhere pass False and call apply_watermark() themselves.
         Returns:
             np.ndarray: Generated speech waveform.
         """
 
         # Generate tokens
-        if self._is_quantized_model:
-            output_str = self._infer_ggml(ref_codes, ref_text, text)
-        else:
-            prompt_ids = self._apply_chat_template(ref_codes, ref_text, text)
-            output_str = self._infer_torch(prompt_ids)
+        prompt = self._build_prompt(ref_codes, ref_text, text)
+        output = self._generate(prompt, cancel_event, seed)
 
         # Decode
-        wav = self._decode(output_str)
-        
+        wav = self._decode(output)
+
         # Apply watermark if available
-        if self.watermarker is not None:
-            watermarked_wav = self.watermarker.apply_watermark(wav, sample_rate=24_000)
-            return watermarked_wav
-        else:
+        return self.apply_watermark(wav) if watermark else wav
+
+    def infer_long(
+        self,
+        text: str,
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        cancel_event: threading.Event | None = None,
+        crossfade_ms: float = 40.0,
+        seed: int | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        watermark: bool = True,
+    ) -> np.ndarray:
+        """
+        Generate speech for text longer than one context window.
+
+        The text is split on sentence boundaries into segments that fit the context
+        next to the reference prompt. Phonemization/prompt building, backbone generation
+        and codec decode of neighbouring segments run as a three-stage pipeline, and the
+        decoded segments are joined with short crossfades.
+
+        Args:
+            text (str): Input text to be converted to speech.
+            ref_codes (np.ndarray | torch.tensor): Encoded reference.
+            ref_text (str): Reference text for reference audio.
+            cancel_event (threading.Event | None): Stops generation between and within segments.
+            crossfade_ms (float): Overlap between consecutive segments.
+            seed (int | None): Seed for sampling; segment i is generated with `seed + i`.
+            progress (Callable | None): Called with (segments generated, total segments).
+            watermark (bool): Apply the watermark here, see infer().
+        Returns:
+            np.ndarray: Generated speech waveform.
+        """
+        segments = self.segment_text(text, ref_codes, ref_text)
+        if progress is not None:
+            progress(0, max(1, len(segments)))
+        if len(segments) <= 1:
+            wav = self.infer(
+                text, ref_codes, ref_text, cancel_event=cancel_event, seed=seed, watermark=watermark
+            )
+            if progress is not None:
+                progress(1, 1)
             return wav
 
+        # Stage 1 (phonemize + prompt) and stage 3 (decode) each get a thread so they
+        # overlap with stage 2 (generation) running on the calling thread.
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="neutts-prompt") as prompt_pool, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="neutts-decode") as decode_pool:
+            # Phonemize the remaining segments in one batched call right after the first
+            # prompt, so later prompt builds are cache hits
+            # Pool tasks run in a copy of the caller's context so stage_hook sees it
+            prompts = [prompt_pool.submit(
+                contextvars.copy_context().run, self._build_prompt, ref_codes, ref_text, segments[0]
+            )]
+            prompt_pool.submit(contextvars.copy_context().run, self._to_phones_batch, segments[1:])
+            prompts += [
+                prompt_pool.submit(
+                    contextvars.copy_context().run, self._build_prompt, ref_codes, ref_text, segment
+                )
+                for segment in segments[1:]
+            ]
+            decoded = []
+            try:
+                for index, prompt in enumerate(prompts):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise GenerationCancelled("Generation was cancelled.")
+                    segment_seed = None if seed is None else seed + index
+                    output = self._generate(prompt.result(), cancel_event, segment_seed)
+                    decoded.append(decode_pool.submit(contextvars.copy_context().run, self._decode, output))
+                    if progress is not None:
+                        progress(index + 1, len(segments))
+                wavs = [future.result() for future in decoded]
+            finally:
+                for future in prompts + decoded:
+                    future.cancel()
+
+        wav = crossfade_concat(wavs, int(self.sample_rate * crossfade_ms / 1000))
+        return self.apply_watermark(wav) if watermark else wav
+
+    def segment_text(
+        self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str, safety: float = 0.8
+    ) -> list[str]:
+        """
+        Group sentences into segments whose prompt and generated speech fit `max_context`.
+
+        The speech-token cost of a segment is estimated from the reference itself: its
+        ratio of speech codes to phoneme tokens, and of phoneme tokens to characters.
+        """
+        ref_phones = self._to_phones(ref_text)
+        ref_phone_tokens = max(1, self._count_tokens(ref_phones))
+        n_ref_codes = len(ref_codes)
+
+        available = self.max_context - PROMPT_OVERHEAD_TOKENS - ref_phone_tokens - n_ref_codes
+        speech_per_phone_token = n_ref_codes / ref_phone_tokens
+        phone_tokens_per_char = ref_phone_tokens / max(1, len(ref_text))
+        max_chars = int(safety * available / (1 + speech_per_phone_token) / phone_tokens_per_char)
+        if max_chars <= 0:
+            raise ValueError("Reference prompt leaves no room in the context for input text.")
+
+        segments = []
+        current = ""
+        for sentence in split_sentences(text, min_chars=0):
+            for piece in _split_to_length(sentence, max_chars):
+                if current and len(current) + 1 + len(piece) > max_chars:
+                    segments.append(current)
+                    current = piece
+                else:
+                    current = f"{current} {piece}" if current else piece
+        if current:
+            segments.append(current)
+        return segments
+
+    def infer_stream(
+        self,
+        text: str,
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        cancel_event: threading.Event | None = None,
+        seed: int | None = None,
+        watermark: bool = True,
+    ) -> Generator[np.ndarray, None, None]:
+        """
+        Generate speech sentence by sentence, yielding each waveform segment as soon as
+        its codec decode finishes.
+
+        Args:
+            text (str): Input text to be converted to speech.
+            ref_codes (np.ndarray | torch.tensor): Encoded reference.
+            ref_text (str): Reference text for reference audio.
+            cancel_event (threading.Event | None): Stops generation between and within segments.
+            seed (int | None): Seed for sampling; sentence i is generated with `seed + i`.
+            watermark (bool): Apply the watermark here, see infer().
+        Yields:
+            np.ndarray: Speech waveform for one sentence.
+        """
+        for index, sentence in enumerate(split_sentences(text)):
+            if cancel_event is not None and cancel_event.is_set():
+                raise GenerationCancelled("Generation was cancelled.")
+            sentence_seed = None if seed is None else seed + index
+            yield self.infer(
+                sentence, ref_codes, ref_text, cancel_event=cancel_event, seed=sentence_seed, watermark=watermark
+            )
+
+    def _build_prompt(
+        self, ref_codes: np.ndarray | torch.Tensor, ref_text: str, text: str
+    ) -> Prompt:
+        """Phonemize and assemble the backbone prompt (token ids, or a string for GGUF)."""
+        with self._stage("prompt"):
+            if self._is_quantized_model:
+                prefix = self._ggml_reference_prefix(ref_text)
+                return Prompt(self._ggml_prompt(ref_codes, ref_text, text, prefix), prefix)
+            prefix_ids = self._reference_prefix_ids(ref_text)
+            return Prompt(self._apply_chat_template(ref_codes, ref_text, text, prefix_ids), prefix_ids)
+
+    def _generate(
+        self, prompt: Prompt, cancel_event: threading.Event | None = None, seed: int | None = None
+    ) -> str | np.ndarray:
+        """Run the backbone: generated token ids for torch, generated text for GGUF."""
+        with self._stage("backbone"):
+            # Seeded calls run here, so they do not hold up the batch worker
+            if self.batcher is not None and not self._is_quantized_model and seed is None:
+                output = self.batcher.generate(prompt, cancel_event)
+            else:
+                output = self._generate_unbatched(prompt, cancel_event, seed)
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelled("Generation was cancelled.")
+        return output
+
+    def _generate_unbatched(
+        self, prompt: Prompt, cancel_event: threading.Event | None = None, seed: int | None = None
+    ) -> str | np.ndarray:
+        if self._is_quantized_model:
+            return self._infer_ggml(prompt.content, cancel_event, prefix=prompt.prefix, seed=seed)
+        return self._infer_torch(prompt.content, cancel_event, prefix_ids=prompt.prefix, seed=seed)
+
+    def apply_watermark(self, wav: np.ndarray, sample_rate: int | None = None) -> np.ndarray:
+        """Watermark a waveform with Perth, if it is installed."""
+        if self.watermarker is not None:
+            with self._stage("watermark"):
+                return self.watermarker.apply_watermark(wav, sample_rate=sample_rate or self.sample_rate)
+        return wav
+
+    @contextmanager
+    def _stage(self, stage: str):
+        """Time a block and report it to `stage_hook`; yields a dict for extra details."""
+        hook = self.stage_hook
+        details = {}
+        if hook is None:
+            yield details
+            return
+        start = time.perf_counter()
+        try:
+            yield details
+        finally:
+            hook(stage, time.perf_counter() - start, details)
+
+    def _count_tokens(self, text: str) -> int:
+        if self._is_quantized_model:
+            return len(self.backbone.tokenize(text.encode("utf-8"), add_bos=False, special=False))
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
     def encode_reference(self, ref_audio_path: str | Path):
-        wav, _ = librosa.load(ref_audio_path, sr=16000, mono=True)
-        wav_tensor = torch.from_numpy(wav).float().unsqueeze(0).unsqueeze(0)  # [1, 1, T]
-        ref_codes = self.codec.encode_code(audio_or_path=wav_tensor).squeeze(0).squeeze(0)
+        import librosa
+
+        with self._stage("encode_reference"):
+            wav, _ = librosa.load(ref_audio_path, sr=16000, mono=True)
+            wav_tensor = torch.from_numpy(wav).float().unsqueeze(0).unsqueeze(0)  # [1, 1, T]
+            encoder = self._reference_encoder()
+            ref_codes = encoder.encode_code(audio_or_path=wav_tensor).squeeze(0).squeeze(0)
         return ref_codes
 
-    def _decode(self, codes: str):
+    def _reference_encoder(self):
+        """The codec that encodes references: the loaded codec unless it is decode-only."""
+        if not self._is_onnx_codec:
+            return self.codec
+        with self._encoder_lock:
+            if self._encoder is None:
+                print(f"Loading reference encoder from: {self.encoder_repo} on cpu ...")
+                self._encoder = _load_torch_codec(self.encoder_repo, "cpu")
+        return self._encoder
+
+    def _decode(self, output: str | np.ndarray) -> np.ndarray:
+        """Decode backbone output (generated token ids, or GGUF text) to a waveform."""
+        with self._stage("decode") as details:
+            if isinstance(output, str):
+                # Extract speech token IDs using regex
+                speech_ids = np.array(
+                    [int(num) for num in _SPEECH_TOKEN.findall(output)], dtype=np.int64
+                )
+            else:
+                speech_ids = self._token_ids_to_codes(output)
 
-        # Extract speech token IDs using regex
-        speech_ids = [int(num) for num in re.findall(r"<\|speech_(\d+)\|>", codes)]
+            details["tokens"] = len(speech_ids)
+            return self._decode_codes(speech_ids)
 
+    def _decode_codes(self, speech_ids: np.ndarray) -> np.ndarray:
+        if len(speech_ids) > 0 and self.batcher is not None:
+            return self.batcher.decode(speech_ids)
         if len(speech_ids) > 0:
 
             # Onnx decode
             if self._is_onnx_codec:
-                codes = np.array(speech_ids, dtype=np.int32)[np.newaxis, np.newaxis, :]
+                codes = speech_ids.astype(np.int32)[np.newaxis, np.newaxis, :]
                 recon = self.codec.decode_code(codes)
 
             # Torch decode
             else:
                 with torch.no_grad():
-                    codes = torch.tensor(speech_ids, dtype=torch.long)[None, None, :].to(
+                    codes = torch.from_numpy(speech_ids.astype(np.int64))[None, None, :].to(
                         self.codec.device
                     )
                     recon = self.codec.decode_code(codes).cpu().numpy()
@@ -181,78 +696,265 @@ class NeuTTSAir:
         else:
             raise ValueError("No valid speech tokens found in the output.")
 
+    def _decode_codes_batch(self, codes_list: list[np.ndarray]) -> list[np.ndarray]:
+        """Decode several code sequences in one codec pass, right-padding shorter ones."""
+        lengths = [len(codes) for codes in codes_list]
+        max_len = max(lengths)
+        codes = np.stack(
+            [np.pad(codes, (0, max_len - len(codes)), mode="edge") for codes in codes_list]
+        )[:, np.newaxis, :]
+
+        if self._is_onnx_codec:
+            recon = self.codec.decode_code(codes.astype(np.int32))
+        else:
+            with torch.no_grad():
+                codes = torch.from_numpy(codes.astype(np.int64)).to(self.codec.device)
+                recon = self.codec.decode_code(codes).cpu().numpy()
+
+        # Trim each waveform back to the samples produced by its own codes
+        samples_per_code = recon.shape[-1] // max_len
+        return [
+            recon[row, 0, :] if length == max_len else recon[row, 0, : length * samples_per_code]
+            for row, length in enumerate(lengths)
+        ]
+
+    def _init_token_ids(self):
+        """Precompute special token ids, the chat template and the speech code table."""
+        tokenizer = self.tokenizer
+        speech_replace = tokenizer.convert_tokens_to_ids("<|SPEECH_REPLACE|>")
+        text_replace = tokenizer.convert_tokens_to_ids("<|TEXT_REPLACE|>")
+        self._speech_gen_start_id = tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_START|>")
+        self._speech_gen_end_id = tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_END|>")
+        text_prompt_start = tokenizer.convert_tokens_to_ids("<|TEXT_PROMPT_START|>")
+        text_prompt_end = tokenizer.convert_tokens_to_ids("<|TEXT_PROMPT_END|>")
+
+        # The prompt is <prefix> phonemes <middle> reference codes
+        chat = """user: Convert the text to speech:<|TEXT_REPLACE|>\nassistant:<|SPEECH_REPLACE|>"""
+        ids = tokenizer.encode(chat)
+        text_replace_idx = ids.index(text_replace)
+        speech_replace_idx = ids.index(speech_replace)
+        self._template_prefix_ids = ids[:text_replace_idx] + [text_prompt_start]
+        self._template_middle_ids = (
+            [text_prompt_end] + ids[text_replace_idx + 1 : speech_replace_idx] + [self._speech_gen_start_id]  # noqa
+        )
+
+        # Speech code <-> token id tables, reduced to a plain offset when ids are contiguous
+        pairs = sorted(
+            (int(match.group(1)), token_id)
+            for token, token_id in tokenizer.get_vocab().items()
+            if (match := _SPEECH_TOKEN_EXACT.match(token))
+        )
+        codes = np.array([code for code, _ in pairs], dtype=np.int64)
+        token_ids = np.array([token_id for _, token_id in pairs], dtype=np.int64)
+
+        self._speech_code_to_id = np.full(codes.max() + 1, -1, dtype=np.int64)
+        self._speech_code_to_id[codes] = token_ids
+        self._speech_id_to_code = np.full(token_ids.max() + 1, -1, dtype=np.int64)
+        self._speech_id_to_code[token_ids] = codes
+
+        offsets = token_ids - codes
+        contiguous = np.array_equal(codes, np.arange(len(codes)))
+        self._speech_token_offset = int(offsets[0]) if contiguous and np.all(offsets == offsets[0]) else None
+
+    def _codes_to_token_ids(self, codes: np.ndarray | torch.Tensor) -> np.ndarray:
+        if isinstance(codes, torch.Tensor):
+            codes = codes.detach().cpu().numpy()
+        codes = np.asarray(codes, dtype=np.int64).reshape(-1)
+        if self._speech_token_offset is not None:
+            return codes + self._speech_token_offset
+        return self._speech_code_to_id[codes]
+
+    def _token_ids_to_codes(self, token_ids: np.ndarray) -> np.ndarray:
+        """Map generated token ids to codec codes, dropping non-speech tokens."""
+        token_ids = np.asarray(token_ids, dtype=np.int64).reshape(-1)
+        table = self._speech_id_to_code
+        in_range = token_ids[(token_ids >= 0) & (token_ids < len(table))]
+        codes = table[in_range]
+        return codes[codes >= 0]
+
     def _to_phones(self, text: str) -> str:
-        phones = self.phonemizer.phonemize([text])
-        phones = phones[0].split()
-        phones = " ".join(phones)
-        return phones
+        with self._stage("phonemize"):
+            return self.phonemizer.phonemize(text)
+
+    def _to_phones_batch(self, texts: list[str]) -> list[str]:
+        with self._stage("phonemize"):
+            return self.phonemizer.phonemize_batch(texts)
+
+    def _reference_prefix_ids(self, ref_text: str) -> list[int]:
+        """Prompt ids up to and including the reference phonemes (shared per voice)."""
+        ref_phone_ids = self.tokenizer.encode(self._to_phones(ref_text), add_special_tokens=False)
+        return self._template_prefix_ids + ref_phone_ids
 
     def _apply_chat_template(
-        self, ref_codes: list[int], ref_text: str, input_text: str
+        self,
+        ref_codes: list[int],
+        ref_text: str,
+        input_text: str,
+        ref_prefix_ids: list[int] | None = None,
     ) -> list[int]:
 
-        input_text = self._to_phones(ref_text) + " " + self._to_phones(input_text)
-        speech_replace = self.tokenizer.convert_tokens_to_ids("<|SPEECH_REPLACE|>")
-        speech_gen_start = self.tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_START|>")
-        text_replace = self.tokenizer.convert_tokens_to_ids("<|TEXT_REPLACE|>")
-        text_prompt_start = self.tokenizer.convert_tokens_to_ids("<|TEXT_PROMPT_START|>")
-        text_prompt_end = self.tokenizer.convert_tokens_to_ids("<|TEXT_PROMPT_END|>")
+        # The reference part is tokenized on its own so it is an exact, cacheable prefix
+        if ref_prefix_ids is None:
+            ref_prefix_ids = self._reference_prefix_ids(ref_text)
+        input_ids = self.tokenizer.encode(" " + self._to_phones(input_text), add_special_tokens=False)
 
-        input_ids = self.tokenizer.encode(input_text, add_special_tokens=False)
-        chat = """user: Convert the text to speech:<|TEXT_REPLACE|>\nassistant:<|SPEECH_REPLACE|>"""
-        ids = self.tokenizer.encode(chat)
-
-        text_replace_idx = ids.index(text_replace)
-        ids = (
-            ids[:text_replace_idx]
-            + [text_prompt_start]
+        return (
+            ref_prefix_ids
             + input_ids
-            + [text_prompt_end]
-            + ids[text_replace_idx + 1 :]  # noqa
+            + self._template_middle_ids
+            + self._codes_to_token_ids(ref_codes).tolist()
         )
 
-        speech_replace_idx = ids.index(speech_replace)
-        codes_str = "".join([f"<|speech_{i}|>" for i in ref_codes])
-        codes = self.tokenizer.encode(codes_str, add_special_tokens=False)
-        ids = ids[:speech_replace_idx] + [speech_gen_start] + list(codes)
+    def _prefix_kv_cache(self, prefix_ids: list[int]):
+        """Fresh copy of the KV cache for a prompt prefix, or None when caching is off."""
+        if not self.prefix_cache.enabled or not prefix_ids:
+            return None
+
+        def prefill():
+            with torch.no_grad():
+                outputs = self.backbone(
+                    torch.tensor([prefix_ids], device=self.backbone.device), use_cache=True
+                )
+            return outputs.past_key_values, _kv_cache_nbytes(outputs.past_key_values)
 
-        return ids
+        cache = self.prefix_cache.get_or_create(PrefixCache.make_key(prefix_ids), prefill)
+        # generate() extends the cache in place, so every request gets its own copy
+        return copy.deepcopy(cache)
 
-    def _infer_torch(self, prompt_ids: list[int]) -> str:
+    def _infer_torch(
+        self,
+        prompt_ids: list[int],
+        cancel_event: threading.Event | None = None,
+        prefix_ids: list[int] | None = None,
+        seed: int | None = None,
+    ) -> np.ndarray:
         prompt_tensor = torch.tensor(prompt_ids).unsqueeze(0).to(self.backbone.device)
-        speech_end_id = self.tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_END|>")
+        stopping_criteria = None
+        if cancel_event is not None:
+            stopping_criteria = StoppingCriteriaList([_CancelCriteria(cancel_event)])
+        if seed is None:
+            sampling = {"do_sample": True, "temperature": 1.0, "top_k": 50}
+        else:
+            # Same distribution as above, drawn from a per-request generator
+            sampling = {
+                "do_sample": False,
+                "logits_processor": LogitsProcessorList([_SeededSampler(int(seed), temperature=1.0, top_k=50)]),
+            }
+        past_key_values = self._prefix_kv_cache(prefix_ids) if prefix_ids else None
         with torch.no_grad():
             output_tokens = self.backbone.generate(
                 prompt_tensor,
+                past_key_values=past_key_values,
                 max_length=self.max_context,
-                eos_token_id=speech_end_id,
+                eos_token_id=self._speech_gen_end_id,
+                use_cache=True,
+                min_new_tokens=50,
+                stopping_criteria=stopping_criteria,
+                **sampling,
+            )
+        input_length = prompt_tensor.shape[-1]
+        return output_tokens[0, input_length:].cpu().numpy()
+
+    def _infer_torch_batch(
+        self, prompts: list[list[int]], cancel_events: list[threading.Event | None]
+    ) -> list[np.ndarray]:
+        """
+        Generate several prompts together. Prompts are left-padded under an attention
+        mask and each row stops on its own `<|SPEECH_GENERATION_END|>`.
+        """
+        pad_id = self.tokenizer.pad_token_id
+        if pad_id is None:
+            pad_id = self._speech_gen_end_id
+
+        max_len = max(len(ids) for ids in prompts)
+        input_ids = torch.full((len(prompts), max_len), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(prompts), max_len), dtype=torch.long)
+        for row, ids in enumerate(prompts):
+            input_ids[row, max_len - len(ids):] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, max_len - len(ids):] = 1
+
+        stopping_criteria = None
+        if any(event is not None for event in cancel_events):
+            stopping_criteria = StoppingCriteriaList([_BatchCancelCriteria(cancel_events)])
+        with torch.no_grad():
+            output_tokens = self.backbone.generate(
+                input_ids.to(self.backbone.device),
+                attention_mask=attention_mask.to(self.backbone.device),
+                max_new_tokens=self.max_context - max_len,
+                eos_token_id=self._speech_gen_end_id,
+                pad_token_id=pad_id,
                 do_sample=True,
                 temperature=1.0,
                 top_k=50,
                 use_cache=True,
                 min_new_tokens=50,
+                stopping_criteria=stopping_criteria,
             )
-        input_length = prompt_tensor.shape[-1]
-        output_str = self.tokenizer.decode(
-            output_tokens[0, input_length:].cpu().numpy().tolist(), add_special_tokens=False
-        )
-        return output_str
 
-    def _infer_ggml(self, ref_codes: list[int], ref_text: str, input_text: str) -> str:
+        outputs = []
+        for row in output_tokens[:, max_len:].cpu().numpy():
+            # Finished rows are filled with padding after their end token
+            end = np.flatnonzero(row == self._speech_gen_end_id)
+            outputs.append(row[: end[0]] if end.size else row)
+        return outputs
+
+    def _ggml_reference_prefix(self, ref_text: str) -> str:
         ref_text = self._to_phones(ref_text)
+        return f"user: Convert the text to speech:<|TEXT_PROMPT_START|>{ref_text}"
+
+    def _ggml_prompt(
+        self, ref_codes: list[int], ref_text: str, input_text: str, prefix: str | None = None
+    ) -> str:
+        if prefix is None:
+            prefix = self._ggml_reference_prefix(ref_text)
         input_text = self._to_phones(input_text)
 
         codes_str = "".join([f"<|speech_{idx}|>" for idx in ref_codes])
         prompt = (
-            f"user: Convert the text to speech:<|TEXT_PROMPT_START|>{ref_text} {input_text}"
+            f"{prefix} {input_text}"
             f"<|TEXT_PROMPT_END|>\nassistant:<|SPEECH_GENERATION_START|>{codes_str}"
         )
-        output = self.backbone(
-            prompt,
-            max_tokens=self.max_context,
-            temperature=1.0,
-            top_k=50,
-            stop=["<|SPEECH_GENERATION_END|>"],
-        )
+        return prompt
+
+    def _ggml_prefix_state(self, prefix: str):
+        """Saved llama.cpp state after evaluating a prompt prefix. Call with _ggml_lock held."""
+
+        def prefill():
+            tokens = self.backbone.tokenize(prefix.encode("utf-8"), add_bos=True, special=True)
+            self.backbone.reset()
+            self.backbone.eval(tokens)
+            state = self.backbone.save_state()
+            return state, state.llama_state_size
+
+        return self.prefix_cache.get_or_create(PrefixCache.make_key(prefix), prefill)
+
+    def _infer_ggml(
+        self,
+        prompt: str,
+        cancel_event: threading.Event | None = None,
+        prefix: str | None = None,
+        seed: int | None = None,
+    ) -> str:
+        with self._ggml_lock:
+            # Restoring the prefix state lets llama.cpp skip re-evaluating the matching tokens
+            if prefix and self.prefix_cache.enabled:
+                self.backbone.load_state(self._ggml_prefix_state(prefix))
+            output = self.backbone(
+                prompt,
+                max_tokens=self.max_context,
+                temperature=1.0,
+                top_k=50,
+                seed=None if seed is None else int(seed),
+                stop=["<|SPEECH_GENERATION_END|>"],
+                stopping_criteria=self._ggml_cancel_criteria(cancel_event),
+            )
         output_str = output["choices"][0]["text"]
         return output_str
+
+    @staticmethod
+    def _ggml_cancel_criteria(cancel_event: threading.Event | None):
+        if cancel_event is None:
+            return None
+        from llama_cpp import StoppingCriteriaList as LlamaStoppingCriteriaList
+
+        return LlamaStoppingCriteriaList([lambda tokens, logits: cancel_event.is_set()])
@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from phonemizer.backend import EspeakBackend
+from phonemizer.backend.espeak.wrapper import EspeakWrapper
+
+# Per-process backend used by pool workers
+_worker_backend = None
+
+
+def _init_worker(espeak_library: str | None, backend_kwargs: dict):
+    global _worker_backend
+    if espeak_library:
+        EspeakWrapper.set_library(espeak_library)
+    _worker_backend = EspeakBackend(**backend_kwargs)
+
+
+def _phonemize_in_worker(texts: list[str]) -> list[str]:
+    return _worker_backend.phonemize(texts)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+class CachedPhonemizer:
+    """
+    espeak phonemization with a bounded LRU memo and batched backend calls.
+
+    Reference transcripts and frequent sentences are answered from the cache. Misses
+    are phonemized in a single espeak call, or spread across a process pool when a
+    document produces more than `process_threshold` of them.
+    """
+
+    def __init__(
+        self,
+        language: str = "en-us",
+        cache_size: int = 4096,
+        process_threshold: int = 512,
+        processes: int = 0,
+        espeak_library: str | None = None,
+        **backend_kwargs,
+    ):
+        self.cache_size = cache_size
+        self.process_threshold = process_threshold
+        self.processes = processes
+        self.espeak_library = espeak_library
+        self._backend_kwargs = {"language": language, **backend_kwargs}
+
+        self.backend = EspeakBackend(**self._backend_kwargs)
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # espeak keeps global state, so calls into the in-process backend are serialized
+        self._backend_lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def phonemize(self, text: str) -> str:
+        return self.phonemize_batch([text])[0]
+
+    def phonemize_batch(self, texts: list[str]) -> list[str]:
+        """Phonemize many segments, calling espeak once for all cache misses."""
+        keys = [_normalize(text) for text in texts]
+        results: dict[str, str] = {}
+        missing: dict[str, None] = {}
+
+        with self._cache_lock:
+            for key in keys:
+                if key in results:
+                    continue
+                phones = self._cache.get(key)
+                if phones is None:
+                    missing[key] = None
+                else:
+                    self._cache.move_to_end(key)
+                    results[key] = phones
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            missing = list(missing)
+            phonemized = [_normalize(phones) for phones in self._run_backend(missing)]
+            with self._cache_lock:
+                for key, phones in zip(missing, phonemized):
+                    results[key] = phones
+                    self._cache[key] = phones
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [results[key] for key in keys]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _run_backend(self, texts: list[str]) -> list[str]:
+        if self.processes > 1 and len(texts) >= self.process_threshold:
+            pool = self._get_pool()
+            chunk = -(-len(texts) // self.processes)
+            chunks = [texts[i:i + chunk] for i in range(0, len(texts), chunk)]
+            return [phones for part in pool.map(_phonemize_in_worker, chunks) for phones in part]
+
+        with self._backend_lock:
+            return self.backend.phonemize(texts)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    initializer=_init_worker,
+                    initargs=(self.espeak_library, self._backend_kwargs),
+                )
+            return self._pool
@@ -0,0 +1,72 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+class PrefixCache:
+    """
+    Memory-bounded LRU of backbone states for shared prompt prefixes.
+
+    Values are whatever the backbone needs to resume from a prefix (a torch KV cache
+    or a llama.cpp saved state), stored with their size in bytes. Entries are evicted
+    least recently used first once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(prefix: list[int] | str) -> str:
+        if isinstance(prefix, str):
+            data = prefix.encode("utf-8")
+        else:
+            data = ",".join(map(str, prefix)).encode("ascii")
+        return hashlib.sha1(data).hexdigest()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_or_create(self, key: str, create: Callable[[], tuple[Any, int]]) -> Any:
+        """Return the state for a prefix, computing it with `create` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        state, nbytes = create()
+        if nbytes > self.max_bytes:
+            return state
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (state, nbytes)
+                self._total_bytes += nbytes
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
+        return state
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }